@@ -0,0 +1,289 @@
+"""Price alert evaluation: fires price_alerts rows when a product's price crosses their threshold.
+
+An alert fires when a product's price moves across its alert_price between two consecutive
+observations (rising to at-or-above it, or falling to at-or-below it). Alerts are indexed per
+product in sorted threshold arrays, so each new price finds every crossed alert by bisection.
+
+    python alerts.py reevaluate [--csv commodity_price.csv] [--sink file:alerts.jsonl]
+re-evaluates every alert against the move between the last two months in the CSV.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from price_index import product_key
+
+
+class AlertIndex:
+    """Alerts grouped by case-folded product, each group sorted by threshold."""
+
+    def __init__(self, rows):
+        grouped = {}
+        for alert_id, user_id, product_name, alert_price in rows:
+            if product_name is None or alert_price is None:
+                continue
+            grouped.setdefault(product_key(product_name), []).append((float(alert_price), alert_id, user_id, product_name))
+
+        self._groups = {}
+        for key, alerts in grouped.items():
+            alerts.sort(key=lambda alert: alert[0])
+            self._groups[key] = (
+                np.array([alert[0] for alert in alerts], dtype=np.float64),
+                [alert[1:] for alert in alerts],
+            )
+        self.size = sum(len(alerts) for alerts in grouped.values())
+
+    def crossed(self, product_name, previous_price, price):
+        """Returns (alert_price, alert_id, user_id, product_name) for every alert the move crossed."""
+        group = self._groups.get(product_key(product_name))
+        if group is None or previous_price is None or price == previous_price:
+            return []
+        thresholds, alerts = group
+        if price > previous_price:
+            lo = np.searchsorted(thresholds, previous_price, side="right")
+            hi = np.searchsorted(thresholds, price, side="right")
+        else:
+            lo = np.searchsorted(thresholds, price, side="left")
+            hi = np.searchsorted(thresholds, previous_price, side="left")
+        return [(thresholds[i], *alerts[i]) for i in range(lo, hi)]
+
+
+# ---------------- NOTIFICATION SINKS ----------------
+class LogSink:
+    """Writes each notification to the application log."""
+
+    def send(self, notifications):
+        for note in notifications:
+            logging.info("🔔 Price alert %s for user %s: %s %s to %.2f (threshold %.2f, %s).",
+                         note["alert_id"], note["user_id"], note["product_name"], note["direction"],
+                         note["price"], note["alert_price"], note["source"])
+
+
+class MemorySink:
+    """Keeps notifications in a list, for tests and in-process consumers."""
+
+    def __init__(self):
+        self.notifications = []
+
+    def send(self, notifications):
+        self.notifications.extend(notifications)
+
+
+class FileSink:
+    """Appends notifications to a JSON-lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, notifications):
+        with self._lock, open(self.path, "a") as file:
+            for note in notifications:
+                file.write(json.dumps(note) + "\n")
+
+
+def sink_from_spec(spec):
+    """Builds a sink from 'log', 'memory', 'file:<path>' or 'module:ClassName'."""
+    spec = (spec or "log").strip()
+    if spec == "log":
+        return LogSink()
+    if spec == "memory":
+        return MemorySink()
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+# ---------------- ENGINE ----------------
+class AlertEngine:
+    """Evaluates price events against the alert index and sends crossed alerts to a sink.
+
+    `load_alerts` returns (id, user_id, product_name, alert_price) rows. The index is reloaded on
+    the next evaluation after invalidate() (e.g. when a user sets or deletes an alert), or once it
+    is older than `refresh_interval` seconds so changes made through other processes are seen.
+    `baseline` ({product: last known price}, or a callable returning it on first evaluation) seeds
+    the previous price each product's first event is compared against.
+    """
+
+    def __init__(self, load_alerts, sink, baseline=None, refresh_interval=None):
+        self.load_alerts = load_alerts
+        self.sink = sink
+        self.refresh_interval = refresh_interval
+        self._baseline = baseline
+        self._last_prices = None
+        self._index = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Forces the alert index to be reloaded before the next evaluation."""
+        self._index = None
+
+    @property
+    def last_prices(self):
+        if self._last_prices is None:
+            baseline = self._baseline() if callable(self._baseline) else self._baseline
+            self._last_prices = {product_key(name): price for name, price in (baseline or {}).items()}
+        return self._last_prices
+
+    def index(self):
+        stale = self.refresh_interval and time.monotonic() - self._loaded_at > self.refresh_interval
+        if self._index is None or stale:
+            self._index = AlertIndex(self.load_alerts())
+            self._loaded_at = time.monotonic()
+            logging.info("✅ Alert index loaded with %d alerts.", self._index.size)
+        return self._index
+
+    def evaluate(self, events):
+        """Evaluates (product_name, price, source) events in order and sends one batch of notifications."""
+        notifications = []
+        with self._lock:
+            index = self.index()
+            last_prices = self.last_prices
+            for product_name, price, source in events:
+                key = product_key(product_name)
+                previous_price = last_prices.get(key)
+                last_prices[key] = price
+                for alert_price, alert_id, user_id, alert_product in index.crossed(product_name, previous_price, price):
+                    notifications.append({
+                        "alert_id": alert_id,
+                        "user_id": user_id,
+                        "product_name": alert_product,
+                        "alert_price": float(alert_price),
+                        "previous_price": float(previous_price),
+                        "price": float(price),
+                        "direction": "rose" if price > previous_price else "fell",
+                        "source": source,
+                        "at": datetime.now().isoformat(timespec="seconds"),
+                    })
+        if notifications:
+            self.sink.send(notifications)
+        return notifications
+
+
+class AlertWorker:
+    """Background thread that evaluates queued price events in batches.
+
+    Events are collected for up to `interval` seconds (or until `batch_size` are waiting) and then
+    evaluated together. When the queue is full, new events are dropped with a warning rather than
+    blocking the request that produced them.
+    """
+
+    def __init__(self, engine, interval=2.0, batch_size=500, max_queue=10000):
+        self.engine = engine
+        self.interval = interval
+        self.batch_size = batch_size
+        self._events = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def submit(self, product_name, price, source):
+        """Queues a price event, starting the worker thread in this process on first use."""
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self.start()
+        try:
+            self._events.put_nowait((product_name, float(price), source))
+        except queue.Full:
+            logging.warning("⚠ Alert queue full, dropping price event for '%s'.", product_name)
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="alert-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _drain(self):
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._drain()
+            if not batch:
+                continue
+            try:
+                self.engine.evaluate(batch)
+            except Exception as e:
+                logging.error("❌ Alert evaluation failed for %d events: %s", len(batch), e)
+
+
+# ---------------- CLI ----------------
+def load_alerts_from_db():
+    """Reads every price_alerts row using the DB_* connection settings."""
+    import mysql.connector
+    from db_pool import connect_args_from_env
+
+    conn = mysql.connector.connect(**connect_args_from_env())
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, user_id, product_name, alert_price FROM price_alerts")
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    finally:
+        conn.close()
+
+
+def latest_moves(csv_path, store_path=None):
+    """(product, previous price, latest price) from each product's last two observed CSV months."""
+    from price_store import load_prices
+
+    prices = load_prices(csv_path, store_path)
+    moves = []
+    for name, row in zip(prices.names, prices.values()):
+        observed = row[~np.isnan(row)]
+        if len(observed) >= 2:
+            moves.append((name, float(observed[-2]), float(observed[-1])))
+    return moves
+
+
+def reevaluate(csv_path, sink, load_alerts=load_alerts_from_db, store_path=None):
+    """Full re-evaluation of every alert against the latest month-over-month move."""
+    moves = latest_moves(csv_path, store_path)
+    engine = AlertEngine(load_alerts, sink, baseline={name: previous for name, previous, _ in moves})
+    return engine.evaluate([(name, latest, "reevaluation") for name, _, latest in moves])
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Evaluate price alerts.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    full = subcommands.add_parser("reevaluate", help="Re-evaluate every alert against the latest CSV prices.")
+    full.add_argument("--csv", default="commodity_price.csv")
+    full.add_argument("--price-store", default=os.environ.get("PRICE_STORE", "commodity_price.bin"),
+                      help="Memory-mapped price store to read instead of the CSV when it is current.")
+    full.add_argument("--sink", default=os.environ.get("ALERT_SINK", "log"))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    fired = reevaluate(args.csv, sink_from_spec(args.sink), store_path=args.price_store)
+    print(f"Fired {len(fired)} alerts in {time.perf_counter() - started:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,400 @@
-import pandas as pd
-from flask import Flask, request, jsonify, render_template, session, url_for, redirect
+import numpy as np
+from flask import Flask, request, jsonify, render_template, session, url_for, redirect, g, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import mysql.connector
-import joblib
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
+import threading
+from contextlib import contextmanager
 import logging
+import hashlib
+import time
+from db_pool import UNAVAILABLE_ERRORS, CircuitOpen, ConnectionPool, PoolTimeout, connect_args_from_env, pool_settings_from_env
+from price_index import (AGGREGATIONS, RESOLUTIONS, PriceIndex, downsample, expand_monthly, ordinals_to_iso,
+                         page_after, product_key, series_to_columns, series_to_records)
+from artifacts import (ArtifactManager, default_models_path, default_price_store_path, file_state, load_artifacts,
+                       validate_artifacts)
+from alerts import AlertEngine, AlertWorker, sink_from_spec
+from catalog import ProductCatalog
+from data_version import VersionWatcher
+from replica import ReadReplica, ReplicaUnavailable, source_rows
+from response_cache import CachedResponse, ResponseCache
+from write_behind import WriteBehindQueue
+from passwords import FailedLoginCache, HasherBusy, PasswordHasher
+from metrics import MetricsRegistry
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+# LOG_LEVEL=INFO skips the per-request DEBUG lines (including logged request payloads); hot paths log with lazy
+# %-style arguments, so skipped lines cost no string formatting.
+logging.basicConfig(level=getattr(logging, os.environ.get("LOG_LEVEL", "DEBUG").upper(), logging.DEBUG),
+                    format='%(asctime)s - %(levelname)s - %(message)s')
 
 app = Flask(__name__)
 CORS(app)
 
+# ✅ Request metrics, served in Prometheus text format at /metrics (see metrics.py)
+metrics = MetricsRegistry()
+request_latency = metrics.histogram("agri_http_request_duration_seconds", "Request latency by route, method and status.",
+                                    ("route", "method", "status"))
+request_phase_latency = metrics.histogram("agri_request_phase_seconds",
+                                          "Time per request spent in the database, the model and JSON serialization.",
+                                          ("route", "phase"))
+
+@contextmanager
+def timed_phase(phase):
+    """Adds the time spent in the block to the current request's `phase` total (db, model, serialization)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context():
+            phases = g.setdefault('phase_seconds', {})
+            phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - started
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing every jsonify() as the request's serialization phase."""
+    def dumps(self, obj, **kwargs):
+        with timed_phase("serialization"):
+            return super().dumps(obj, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request_latency.observe(time.perf_counter() - started, route, request.method, str(response.status_code))
+        for phase, seconds in g.pop('phase_seconds', {}).items():
+            request_phase_latency.observe(seconds, route, phase)
+    return response
+
 # Configure session (important for secure login)
 # IMPORTANT: Replace "your_very_secret_and_long_random_key_here" with a strong, random key
 # For production, set this as an environment variable in Render.
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "a_very_secure_and_long_random_string_for_flask_session_keys_1234567890")
 
 # ✅ Database connection details from environment variables (using Aiven details as per original request)
-# These should be set in your Render service environment variables.
-# The hardcoded values are for local testing/defaults if env vars are not set.
-db_host = os.environ.get("DB_HOST", "mysql-fc0e3b0-sadhasivamkanaga15-f154.l.aivencloud.com")
-db_user = os.environ.get("DB_USER", "avnadmin")
-db_password = os.environ.get("DB_PASSWORD", "AVNS_P2X1P7jH__WuLtv9YSs") # Replace with your actual Aiven password!
-db_name = os.environ.get("DB_NAME", "defaultdb")
-db_port = int(os.environ.get("DB_PORT", 21436))
-
-def get_db_connection():
-    """Establishes and returns a new database connection."""
-    try:
-        conn = mysql.connector.connect(
-            host=db_host,
-            user=db_user,
-            password=db_password,
-            database=db_name,
-            port=db_port
-            # ssl_ca='path/to/your/aiven_ca.pem' # Uncomment and provide path if Aiven requires SSL CA file
-        )
-        logging.info("✅ Database connection established (get_db_connection).")
-        return conn
-    except mysql.connector.Error as err:
-        logging.error(f"❌ Database connection error (get_db_connection): {err}")
-        return None
+# These should be set in your Render service environment variables (see connect_args_from_env in db_pool.py).
+db_connect_args = connect_args_from_env()
+
+# ✅ One connection pool per gunicorn worker process, created lazily on first use
+# (so it is never shared across a fork). Sized via DB_POOL_SIZE / DB_POOL_MAX_OVERFLOW / DB_POOL_TIMEOUT.
+# Connections give up after DB_CONNECT_TIMEOUT seconds and each read/write after DB_READ_TIMEOUT / DB_WRITE_TIMEOUT,
+# so a slow or unreachable database cannot hold a worker indefinitely. After DB_BREAKER_FAILURES consecutive failed
+# connection attempts the pool's circuit breaker opens: requests fail fast (read endpoints serve stale data, see
+# stale_price_series) and one request probes the database again every DB_BREAKER_RESET_SECONDS.
+_db_pool = None
+_db_pool_pid = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Returns this worker process's connection pool, creating it on first use."""
+    global _db_pool, _db_pool_pid
+    pid = os.getpid()
+    if _db_pool is None or _db_pool_pid != pid:
+        with _db_pool_lock:
+            if _db_pool is None or _db_pool_pid != pid:
+                _db_pool = ConnectionPool(db_connect_args, **pool_settings_from_env())
+                _db_pool_pid = pid
+    return _db_pool
+
+@contextmanager
+def db_connection():
+    """Checks a pooled database connection out for a `with` block.
+
+    Yields None if no connection could be obtained, so routes keep their `if not conn` handling.
+    The connection is returned to the pool (with any uncommitted work rolled back) when the block exits.
+    """
+    pool = get_db_pool()
+    with timed_phase("db"):
+        try:
+            conn = pool.checkout()
+        except CircuitOpen as err:
+            logging.debug("ℹ️ Database connection skipped (db_connection): %s", err)
+            conn = None
+        except (mysql.connector.Error, PoolTimeout) as err:
+            logging.error("❌ Database connection error (db_connection): %s", err)
+            conn = None
+        if conn is None:
+            yield None
+            return
+        try:
+            yield conn
+        finally:
+            pool.checkin(conn)
+
+# ✅ Storage layout of historical prices (HISTORICAL_PRICES_STORAGE):
+#   daily   - historical_prices holds one row per product per day (the layout sql_insert_code.py has always produced)
+#   monthly - historical_prices_monthly holds one row per product-month, expanded to daily points per request
+HISTORICAL_PRICES_STORAGE = os.environ.get("HISTORICAL_PRICES_STORAGE", "daily").lower()
+if HISTORICAL_PRICES_STORAGE == "monthly":
+    PRICE_TABLE, PRICE_DATE_COLUMN = "historical_prices_monthly", "month"
+else:
+    PRICE_TABLE, PRICE_DATE_COLUMN = "historical_prices", "date"
 
 # Helper function to get product list from DB
+def load_product_names():
+    """Fetches a distinct list of product names from the historical prices table (used by the product catalog)."""
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed while loading the product catalog.")
+        cursor = conn.cursor(dictionary=True) # Use dictionary=True for easier access by column name
+        try:
+            cursor.execute(f"SELECT DISTINCT product_name FROM {PRICE_TABLE} ORDER BY product_name ASC")
+            products = [row['product_name'] for row in cursor.fetchall()]
+            logging.info(f"✅ load_product_names: Fetched {len(products)} products.")
+            return products
+        finally:
+            cursor.close()
+
 def get_product_list():
-    """Fetches a distinct list of product names from the historical_prices table."""
-    conn = get_db_connection()
-    if not conn:
-        logging.error("❌ get_product_list: Database connection failed.")
-        return []
+    """All product names with stored prices, served from the cached product catalog."""
+    return product_catalog.products()
+
+# ✅ Optional in-memory trend engine for /price_trend (PRICE_TREND_ENGINE=index).
+# Each product's history is loaded once into NumPy arrays and range queries are answered by binary search.
+# The index reloads itself every PRICE_INDEX_REFRESH_SECONDS, or immediately via /admin/refresh_price_index.
+def load_historical_price_rows(batch_size=10000):
+    """Streams (product_name, date or month, price) rows from the historical prices table for the price index."""
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed while loading the price index.")
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT product_name, {PRICE_DATE_COLUMN}, price FROM {PRICE_TABLE} WHERE price IS NOT NULL")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
 
-    products = []
-    try:
-        cursor = conn.cursor(dictionary=True) # Use dictionary=True for easier access by column name
-        cursor.execute("SELECT DISTINCT product_name FROM historical_prices ORDER BY product_name ASC")
-        product_results = cursor.fetchall()
-        products = [row['product_name'] for row in product_results]
-        logging.info(f"✅ get_product_list: Fetched {len(products)} products.")
-    except mysql.connector.Error as err:
-        logging.error(f"❌ get_product_list: Database error fetching products: {err}")
-    finally:
-        if conn and conn.is_connected():
+# PRICE_TREND_ENGINE=store serves /price_trend from the monthly commodity prices the prediction artifacts already hold
+# (the memory-mapped price store, see price_store.py), expanded to daily points like HISTORICAL_PRICES_STORAGE=monthly.
+PRICE_TREND_ENGINE = os.environ.get("PRICE_TREND_ENGINE", "mysql").lower()
+price_index = None
+if PRICE_TREND_ENGINE == "index":
+    price_index = PriceIndex(load_historical_price_rows,
+                             refresh_interval=float(os.environ.get("PRICE_INDEX_REFRESH_SECONDS", 300)),
+                             monthly=HISTORICAL_PRICES_STORAGE == "monthly")
+    logging.info("✅ /price_trend will be served from the in-memory price index.")
+
+# ✅ Optional local read replica (PRICE_TREND_ENGINE=replica, see replica.py). The historical prices table is copied
+# into a SQLite file (READ_REPLICA_PATH, default replica.sqlite3) when the worker starts, every
+# REPLICA_SYNC_INTERVAL_SECONDS and right after a bulk load bumps the "prices" data version, copying only rows on or
+# after the replica's latest date. /price_trend and the product list then read it instead of MySQL (and fall back to
+# MySQL until a new replica's first sync has finished). Every response reports the replica's latest date and age in
+# the X-Replica-High-Water and X-Replica-Staleness-Seconds headers.
+def load_replica_rows(since):
+    """Streams the historical prices rows dated on or after `since` (all rows if None) for a replica sync."""
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed while syncing the read replica.")
+        yield from source_rows(conn, PRICE_TABLE, PRICE_DATE_COLUMN, since)
+
+read_replica = None
+if PRICE_TREND_ENGINE == "replica":
+    read_replica = ReadReplica(os.environ.get("READ_REPLICA_PATH", "replica.sqlite3"), load_replica_rows,
+                               storage="monthly" if HISTORICAL_PRICES_STORAGE == "monthly" else "daily",
+                               interval=float(os.environ.get("REPLICA_SYNC_INTERVAL_SECONDS", 300)),
+                               trigger=lambda: data_versions.get("prices"))
+    logging.info("✅ /price_trend and the product list will be served from the read replica '%s'.", read_replica.path)
+
+@app.after_request
+def report_replica_staleness(response):
+    if read_replica is not None:
+        status = read_replica.status()
+        if status["synced_at"] is not None:
+            response.headers['X-Replica-High-Water'] = status["high_water"] or ""
+            response.headers['X-Replica-Staleness-Seconds'] = str(status["staleness_seconds"])
+    return response
+
+def load_catalog_products():
+    """Product names for the catalog, from the read replica when it is enabled and has been synced."""
+    if read_replica is not None:
+        try:
+            return read_replica.products()
+        except ReplicaUnavailable as e:
+            logging.warning("⚠ Product catalog: %s; reading MySQL.", e)
+    return load_product_names()
+
+# ✅ Prediction artifacts: models (models.npz, or models.pkl - see artifacts.py) and commodity prices, with the
+# prediction table and forecast curves built from them. Prices are memory-mapped from PRICE_STORE (default
+# commodity_price.bin, built with python price_store.py build) when it matches PRICES_CSV, else parsed from the CSV. ARTIFACT_LOADING=eager (default) loads them at import,
+# which under gunicorn --preload (GUNICORN_PRELOAD=1, see gunicorn.conf.py) happens once in the master and is shared
+# with every forked worker; ARTIFACT_LOADING=lazy defers loading (and the pandas import) to the first prediction.
+# Forecast curves run FORECAST_HORIZON_MONTHS months past each product's last CSV month, so /predict answers the
+# requested date's month with a multi-step forecast instead of one date-blind step.
+# Every ARTIFACT_RELOAD_INTERVAL_SECONDS (0 disables) each worker checks the files' mtimes and the "models" data
+# version; after a retrain or CSV refresh it loads the new set in the background, validates it (see
+# validate_artifacts; ARTIFACT_MAX_ABS_SLOPE bounds the coefficients) and swaps it in without a restart.
+FORECAST_HORIZON_MONTHS = int(os.environ.get("FORECAST_HORIZON_MONTHS", 60))
+MODELS_FILE = default_models_path()
+PRICES_CSV = os.environ.get("PRICES_CSV", "commodity_price.csv")
+PRICE_STORE = default_price_store_path()
+ARTIFACT_MAX_ABS_SLOPE = float(os.environ.get("ARTIFACT_MAX_ABS_SLOPE", 5))
+data_versions = VersionWatcher()
+artifact_manager = ArtifactManager(
+    lambda: load_artifacts(MODELS_FILE, PRICES_CSV, FORECAST_HORIZON_MONTHS, store_path=PRICE_STORE),
+    signature=lambda: (file_state(MODELS_FILE), file_state(PRICES_CSV), file_state(PRICE_STORE), data_versions.get("models")),
+    check_interval=float(os.environ.get("ARTIFACT_RELOAD_INTERVAL_SECONDS", 10)),
+    validate=lambda artifacts, previous: validate_artifacts(artifacts, previous, ARTIFACT_MAX_ABS_SLOPE),
+)
+if os.environ.get("ARTIFACT_LOADING", "eager").lower() != "lazy":
+    artifact_manager.ensure_loaded() # The watcher thread starts with the first request, in the worker process
+
+# ✅ Product catalog: the product list is cached per worker instead of running SELECT DISTINCT on every
+# page render. It is rebuilt after PRODUCT_CATALOG_TTL_SECONDS, or as soon as the bulk loader or model.py
+# bumps the shared data version (see data_version.py). While the database is unavailable it serves the last list it
+# loaded (or, before the first load, the CSV's products), flagged stale, and retries every PRODUCT_CATALOG_RETRY_SECONDS.
+def csv_product_names():
+    """Product names of the commodity CSV, the catalog's fallback when the database cannot be read."""
+    prices = artifact_manager.current().prices
+    if prices is None:
+        raise ConnectionError("Commodity price data not loaded.")
+    return sorted(set(prices.names))
+
+product_catalog = ProductCatalog(
+    load_catalog_products,
+    lambda: artifact_manager.current().prediction_table.names,
+    ttl=float(os.environ.get("PRODUCT_CATALOG_TTL_SECONDS", 300)),
+    version=lambda: (data_versions.get("prices"), artifact_manager.current().version,
+                     read_replica.version() if read_replica is not None else None),
+    fallback_products=csv_product_names,
+    retry_interval=float(os.environ.get("PRODUCT_CATALOG_RETRY_SECONDS", 10)),
+)
+
+# ✅ In-process LRU caches (bounded, with a TTL) for read-only results. /price_trend responses are keyed on the
+# normalized request and dropped when the loader bumps the "prices" data version; predictions are keyed on
+# (product, date, model version). Counters are served at /admin/cache_stats.
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", 300))
+response_cache = ResponseCache(max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", 1024)),
+                               ttl=RESPONSE_CACHE_TTL_SECONDS,
+                               version=lambda: (data_versions.get("prices"),
+                                                artifact_manager.current().version if PRICE_TREND_ENGINE == "store" else None,
+                                                read_replica.version() if read_replica is not None else None))
+prediction_cache = ResponseCache(max_entries=int(os.environ.get("PREDICTION_CACHE_SIZE", 10000)),
+                                 ttl=RESPONSE_CACHE_TTL_SECONDS)
+app_started_at = datetime.now().timestamp()
+
+def cached_get_response(key, build):
+    """Serves a GET response from response_cache, building and storing it on a miss.
+
+    Only fresh 200 responses are cached (not stale fallbacks, see stale_price_series). Every response carries a
+    strong ETag (a hash of the body) and a Last-Modified of the latest data version bump, so repeat browser
+    requests are answered with 304.
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        response = app.make_response(build())
+        if response.status_code != 200 or 'X-Data-Stale' in response.headers:
+            return response
+        body = response.get_data()
+        headers = {name: value for name, value in response.headers.items() if name.startswith('X-')}
+        entry = CachedResponse(body, response.mimetype, headers, hashlib.sha1(body).hexdigest())
+        response_cache.put(key, entry)
+    response = app.response_class(entry.body, mimetype=entry.mimetype, headers=entry.headers)
+    response.set_etag(entry.etag)
+    response.last_modified = datetime.fromtimestamp(data_versions.modified_at() or app_started_at, tz=timezone.utc)
+    response.headers['Cache-Control'] = 'no-cache' # Browsers may keep it, but must revalidate with the ETag
+    return response.make_conditional(request)
+
+# ✅ Price alerts: every prediction is queued for a background worker that fires crossed price_alerts
+# in batches (see alerts.py). Notifications go to ALERT_SINK: log (default), file:<path>, memory or module:Class.
+def load_alert_rows():
+    """Reads every price_alerts row for the alert index."""
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed while loading price alerts.")
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id, user_id, product_name, alert_price FROM price_alerts")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+def latest_csv_prices(prediction_table):
+    """Latest CSV price per product, the alert engine's starting point for detecting crossings."""
+    return {name: prediction_table.latest_price(name) for name in prediction_table.names
+            if not np.isnan(prediction_table.latest_price(name))}
+
+alert_engine = AlertEngine(
+    load_alert_rows,
+    sink_from_spec(os.environ.get("ALERT_SINK", "log")),
+    baseline=lambda: latest_csv_prices(artifact_manager.current().prediction_table),
+    refresh_interval=float(os.environ.get("ALERT_INDEX_REFRESH_SECONDS", 60)),
+)
+alert_worker = AlertWorker(alert_engine, interval=float(os.environ.get("ALERT_EVAL_INTERVAL_SECONDS", 2)))
+
+# ✅ Predictions are recorded in price_predictions by a write-behind queue: requests enqueue the row and return,
+# and a background thread writes queued rows as multi-row INSERTs every PREDICTION_WRITE_INTERVAL_SECONDS or
+# PREDICTION_WRITE_BATCH_SIZE rows. Repeats of a (product, date, model version) row are written once.
+def write_prediction_rows(rows):
+    """Inserts (product_name, predicted_price, prediction_date) rows in one transaction."""
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed while saving predictions.")
+        cursor = conn.cursor()
+        try:
+            # executemany folds these rows into a single multi-row INSERT, committed once.
+            query = "INSERT INTO price_predictions (product_name, predicted_price, prediction_date) VALUES (%s, %s, %s)"
+            cursor.executemany(query, rows)
+            conn.commit()
+            logging.info("✅ Prediction writer: %d predictions saved to database.", len(rows))
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
             cursor.close()
-            conn.close()
-    return products
-
-# ✅ Load machine learning models
-models = {}
-try:
-    models = joblib.load("models.pkl")
-    logging.info("✅ Machine learning models loaded successfully.")
-except FileNotFoundError:
-    logging.warning("⚠ Error: 'models.pkl' not found. Please run 'model.py' to train and save models.")
-except Exception as e:
-    logging.error(f"⚠ Error loading models: {e}")
-
-# ✅ Load commodity data from CSV
-df = pd.DataFrame() # Initialize as empty DataFrame
-try:
-    df = pd.read_csv("commodity_price.csv")
-    df.columns = df.columns.str.strip() # Clean column names
-    if "Commodities" in df.columns:
-        logging.info("✅ Products loaded from CSV: %s", df["Commodities"].unique())
-    else:
-        logging.error("❌ 'Commodities' column not found in 'commodity_price.csv'. Please check the CSV structure.")
-        df = pd.DataFrame() # Ensure df is empty if column is missing
-except FileNotFoundError:
-    logging.error("❌ Error: 'commodity_price.csv' not found.")
-except Exception as e:
-    logging.error(f"❌ Error loading commodity data from CSV: {e}")
-    df = pd.DataFrame()
+
+prediction_writer = WriteBehindQueue(
+    write_prediction_rows,
+    batch_size=int(os.environ.get("PREDICTION_WRITE_BATCH_SIZE", 500)),
+    interval=float(os.environ.get("PREDICTION_WRITE_INTERVAL_SECONDS", 1)),
+    max_queue=int(os.environ.get("PREDICTION_WRITE_QUEUE_MAX", 10000)),
+    when_full=os.environ.get("PREDICTION_WRITE_WHEN_FULL", "block").lower(),
+    name="prediction-writer",
+)
+
+def record_prediction(product, predicted_price, prediction_date, model_version):
+    """Queues a prediction for price_predictions; returns False if the write-behind queue dropped it."""
+    return prediction_writer.submit((product, prediction_date, model_version), (product, predicted_price, prediction_date))
+
+# ✅ Password hashing runs on a bounded pool (PASSWORD_HASH_WORKERS at once, PASSWORD_HASH_MAX_PENDING waiting)
+# with the work factors in PASSWORD_HASH_METHOD (a werkzeug method such as scrypt:32768:8:1 or pbkdf2:sha256:600000).
+# Stored hashes made with other parameters are rehashed after the next successful login.
+password_hasher = PasswordHasher(
+    method=os.environ.get("PASSWORD_HASH_METHOD", "scrypt"),
+    workers=int(os.environ.get("PASSWORD_HASH_WORKERS", 2)),
+    max_pending=int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 32)),
+)
+failed_logins = FailedLoginCache(ResponseCache(max_entries=int(os.environ.get("FAILED_LOGIN_CACHE_SIZE", 10000)),
+                                               ttl=float(os.environ.get("FAILED_LOGIN_CACHE_TTL_SECONDS", 300))))
+
+def store_rehashed_password(table, user_id, hashed_password):
+    """Replaces a users/admin_users password hash with one made with the current PASSWORD_HASH_METHOD."""
+    with db_connection() as conn:
+        if not conn:
+            raise ConnectionError("Database connection failed while storing a rehashed password.")
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"UPDATE {table} SET password = %s WHERE id = %s", (hashed_password, user_id))
+            conn.commit()
+            logging.info("✅ Rehashed password stored for %s id %s.", table, user_id)
+        finally:
+            cursor.close()
+
+# Upper bound on (product, date) pairs accepted by one /predict/batch call
+PREDICT_BATCH_MAX = int(os.environ.get("PREDICT_BATCH_MAX", 5000))
+# Upper bound on alerts accepted by one /alerts/bulk call
+ALERT_BULK_MAX = int(os.environ.get("ALERT_BULK_MAX", 500))
 
 # ---------------- HOME ROUTE ----------------
 @app.route('/')
@@ -118,68 +420,72 @@ def admin_login_page():
 @app.route('/register', methods=['POST'])
 def register():
     """Handles new user registration."""
-    conn = get_db_connection()
-    if not conn:
-        logging.error("❌ Register: Database connection failed (at the beginning of route).")
-        return jsonify({"status": "error", "message": "Database connection failed. Please try again later."}), 500
-
-    cursor = conn.cursor()
     data = request.form # Assuming signup form still uses standard form submission
     username = data.get('username')
     email = data.get('email')
     password = data.get('password')
 
     logging.debug("ℹ️ Register: Form data received: %s", data)
-    logging.info(f"ℹ️ Register: Attempting to register Username: '{username}', Email: '{email}', Password (length): {len(password) if password else 0}")
+    logging.info("ℹ️ Register: Attempting to register Username: '%s', Email: '%s', Password (length): %s", username, email, len(password) if password else 0)
 
     if not all([username, email, password]):
-        cursor.close()
-        conn.close()
         logging.warning("❌ Register: Missing required fields.")
         return jsonify({"status": "error", "message": "All fields are required."}), 400
 
-    # Check if email already exists before attempting insert
-    try:
-        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-        existing_user = cursor.fetchone()
-        if existing_user:
+    # Check if email already exists before hashing the password and attempting insert
+    with db_connection() as conn:
+        if not conn:
+            logging.error("❌ Register: Database connection failed (at the beginning of route).")
+            return jsonify({"status": "error", "message": "Database connection failed. Please try again later."}), 500
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+            existing_user = cursor.fetchone()
+        except mysql.connector.Error as err:
+            logging.error("❌ Register: Database error checking for existing email: %s", err)
+            return jsonify({"status": "error", "message": f"Registration failed: Database error checking email. {str(err)}"}), 500
+        finally:
             cursor.close()
-            conn.close()
-            logging.warning(f"❌ Register: Email '{email}' already registered.")
-            return jsonify({"status": "error", "message": "Email address is already registered. Please use a different email."}), 409 # 409 Conflict
-    except mysql.connector.Error as err:
-        cursor.close()
-        conn.close()
-        logging.error(f"❌ Register: Database error checking for existing email: {err}")
-        return jsonify({"status": "error", "message": f"Registration failed: Database error checking email. {str(err)}"}), 500
+    if existing_user:
+        logging.warning("❌ Register: Email '%s' already registered.", email)
+        return jsonify({"status": "error", "message": "Email address is already registered. Please use a different email."}), 409 # 409 Conflict
 
+    # ✅ Hash on the bounded hashing pool, without holding a pooled DB connection meanwhile
+    try:
+        hashed_password = password_hasher.hash(password)
+    except HasherBusy:
+        logging.warning("⚠ Register: Password hashing pool is busy.")
+        return jsonify({"status": "error", "message": "Server is busy. Please try again shortly."}), 503
+    logging.info("ℹ️ Register: Hashed password generated: '%s...'", hashed_password[:20]) # Log a snippet
 
-    hashed_password = generate_password_hash(password)
-    logging.info(f"ℹ️ Register: Hashed password generated: '{hashed_password[:20]}...'") # Log a snippet
+    with db_connection() as conn:
+        if not conn:
+            logging.error("❌ Register: Database connection failed (before insert).")
+            return jsonify({"status": "error", "message": "Database connection failed. Please try again later."}), 500
 
-    query = "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)"
-    try:
-        cursor.execute(query, (username, email, hashed_password))
-        conn.commit()
-        logging.info("✅ Register: User data committed to database.")
-        cursor.close()
-        conn.close()
-        session['registration_success'] = "Registration successful! You can now log in."
-        logging.info(f"✅ User '{email}' registered successfully. Redirecting to login page.")
-        # For register, still redirect to login page as per previous logic, but ensure frontend handles it
-        return redirect(url_for('login_page'))
-    except mysql.connector.Error as err: # Catch specific MySQL errors
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        logging.error(f"❌ Register error (mysql.connector.Error during insert): {err}")
-        return jsonify({"status": "error", "message": f"Registration failed due to database error: {str(err)}"}), 500
-    except Exception as e: # Catch any other unexpected errors
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        logging.error(f"❌ Register error (General Exception during insert): {e}")
-        return jsonify({"status": "error", "message": f"Registration failed due to an unexpected error: {str(e)}"}), 500
+        cursor = conn.cursor()
+        query = "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)"
+        try:
+            cursor.execute(query, (username, email, hashed_password))
+            conn.commit()
+            logging.info("✅ Register: User data committed to database.")
+        except mysql.connector.Error as err: # Catch specific MySQL errors
+            conn.rollback()
+            logging.error("❌ Register error (mysql.connector.Error during insert): %s", err)
+            return jsonify({"status": "error", "message": f"Registration failed due to database error: {str(err)}"}), 500
+        except Exception as e: # Catch any other unexpected errors
+            conn.rollback()
+            logging.error("❌ Register error (General Exception during insert): %s", e)
+            return jsonify({"status": "error", "message": f"Registration failed due to an unexpected error: {str(e)}"}), 500
+        finally:
+            cursor.close()
+
+    failed_logins.forget_unknown("users", email)
+    session['registration_success'] = "Registration successful! You can now log in."
+    logging.info("✅ User '%s' registered successfully. Redirecting to login page.", email)
+    # For register, still redirect to login page as per previous logic, but ensure frontend handles it
+    return redirect(url_for('login_page'))
 
 # ---------------- LOGIN PAGE ROUTE ----------------
 @app.route('/login.html')
@@ -199,49 +505,61 @@ def login():
     password = data.get('password')
 
     logging.debug("ℹ️ User Login: JSON data received: %s", data)
-    logging.info(f"ℹ️ User Login: Attempting login for Email: '{email}', Password (length): {len(password) if password else 0}")
+    logging.info("ℹ️ User Login: Attempting login for Email: '%s', Password (length): %s", email, len(password) if password else 0)
 
     if not all([email, password]):
-        logging.warning(f"❌ User Login: Missing email ({email}) or password ({password}).")
+        logging.warning("❌ User Login: Missing email (%s) or password (%s).", email, password)
         return jsonify({"status": "error", "message": "Email and password are required."}), 400
 
-    conn = get_db_connection()
-    if not conn:
-        logging.error("❌ User Login: Database connection failed.")
-        return jsonify({"status": "error", "message": "Database connection failed. Please try again later."}), 500
+    # ✅ Repeats of a recent failure (unknown email or the same wrong password) skip the DB query and hash check
+    if failed_logins.is_unknown("users", email) or failed_logins.is_wrong_password("users", email, password):
+        logging.warning("❌ User Login: Repeated failed login for '%s' (cached).", email)
+        return jsonify({"status": "error", "message": "Invalid credentials!"}), 401
 
-    cursor = conn.cursor()
-    user = None
-    try:
-        cursor.execute("SELECT id, email, password, username FROM users WHERE email=%s", (email,))
-        user = cursor.fetchone()
-        logging.info(f"ℹ️ User Login: Query executed. User found: {user is not None}")
-    except mysql.connector.Error as err:
-        logging.error(f"❌ User Login: Database query error: {err}")
-        return jsonify({"status": "error", "message": "An error occurred during login."}), 500
-    finally:
-        if conn and conn.is_connected():
+    with db_connection() as conn:
+        if not conn:
+            logging.error("❌ User Login: Database connection failed.")
+            return jsonify({"status": "error", "message": "Database connection failed. Please try again later."}), 500
+
+        cursor = conn.cursor()
+        user = None
+        try:
+            cursor.execute("SELECT id, email, password, username FROM users WHERE email=%s", (email,))
+            user = cursor.fetchone()
+            logging.info("ℹ️ User Login: Query executed. User found: %s", user is not None)
+        except mysql.connector.Error as err:
+            logging.error("❌ User Login: Database query error: %s", err)
+            return jsonify({"status": "error", "message": "An error occurred during login."}), 500
+        finally:
             cursor.close()
-            conn.close()
-
-    if user:
-        user_id, user_email, hashed_password_from_db, username = user
-        logging.info(f"ℹ️ User Login: Retrieved user - ID: {user_id}, Email: {user_email}")
-        logging.info(f"ℹ️ User Login: Checking password hash for provided password against '{hashed_password_from_db[:20]}...'") # Log a snippet
-        if check_password_hash(hashed_password_from_db, password):
-            session['user_email'] = user_email
-            session['user_id'] = user_id
-            session['username'] = username
-            logging.info(f"✅ User '{user_email}' logged in successfully. Redirecting to dashboard.")
-            # Return JSON for success, frontend will handle redirect
-            return jsonify({"status": "success", "redirect": url_for('dashboard')}), 200
-        else:
-            logging.warning(f"❌ User Login: Invalid password for '{email}'.")
-            return jsonify({"status": "error", "message": "Invalid credentials!"}), 401
-    else:
-        logging.warning(f"❌ User Login: User '{email}' not found.")
+
+    if not user:
+        failed_logins.unknown("users", email)
+        logging.warning("❌ User Login: User '%s' not found.", email)
         return jsonify({"status": "error", "message": "Invalid credentials!"}), 401
 
+    user_id, user_email, hashed_password_from_db, username = user
+    logging.info("ℹ️ User Login: Retrieved user - ID: %s, Email: %s", user_id, user_email)
+    logging.info("ℹ️ User Login: Checking password hash for provided password against '%s...'", hashed_password_from_db[:20]) # Log a snippet
+    try:
+        password_ok = password_hasher.verify(hashed_password_from_db, password)
+    except HasherBusy:
+        logging.warning("⚠ User Login: Password hashing pool is busy.")
+        return jsonify({"status": "error", "message": "Server is busy. Please try again shortly."}), 503
+    if not password_ok:
+        failed_logins.wrong_password("users", email, password)
+        logging.warning("❌ User Login: Invalid password for '%s'.", email)
+        return jsonify({"status": "error", "message": "Invalid credentials!"}), 401
+
+    if password_hasher.needs_rehash(hashed_password_from_db):
+        password_hasher.rehash_later(password, lambda new_hash: store_rehashed_password("users", user_id, new_hash))
+    session['user_email'] = user_email
+    session['user_id'] = user_id
+    session['username'] = username
+    logging.info("✅ User '%s' logged in successfully. Redirecting to dashboard.", user_email)
+    # Return JSON for success, frontend will handle redirect
+    return jsonify({"status": "success", "redirect": url_for('dashboard')}), 200
+
 # ---------------- ADMIN LOGIN API ROUTE ----------------
 @app.route('/admin_login', methods=['POST'])
 def admin_login():
@@ -252,48 +570,60 @@ def admin_login():
     password = data.get('password')
 
     logging.debug("ℹ️ Admin Login: JSON data received: %s", data)
-    logging.info(f"ℹ️ Admin Login: Attempting login for Email: '{email}', Password (length): {len(password) if password else 0}")
+    logging.info("ℹ️ Admin Login: Attempting login for Email: '%s', Password (length): %s", email, len(password) if password else 0)
 
     if not email or not password:
-        logging.warning(f"❌ Admin Login: Missing email ({email}) or password ({password}).")
+        logging.warning("❌ Admin Login: Missing email (%s) or password (%s).", email, password)
         return jsonify({"status": "error", "message": "Email and Password are required!"}), 400
 
-    conn = get_db_connection()
-    if not conn:
-        logging.error("❌ Admin Login: Database connection failed.")
-        return jsonify({"status": "error", "message": "Database connection failed. Please try again later."}), 500
+    if failed_logins.is_unknown("admin_users", email) or failed_logins.is_wrong_password("admin_users", email, password):
+        logging.warning("❌ Admin Login: Repeated failed login for admin '%s' (cached).", email)
+        return jsonify({"status": "error", "message": "Invalid admin credentials!"}), 401
 
-    cursor = conn.cursor(dictionary=True) # Use dictionary=True for easier access by column name
-    admin_user = None
-    try:
-        cursor.execute("SELECT id, email, password FROM admin_users WHERE email = %s", (email,))
-        admin_user = cursor.fetchone()
-        logging.info(f"ℹ️ Admin Login: Query executed. Admin user found: {admin_user is not None}")
-    except mysql.connector.Error as err:
-        logging.error(f"❌ Admin Login: Database query error: {err}")
-        return jsonify({"status": "error", "message": "An error occurred during admin login."}), 500
-    finally:
-        if conn and conn.is_connected():
+    with db_connection() as conn:
+        if not conn:
+            logging.error("❌ Admin Login: Database connection failed.")
+            return jsonify({"status": "error", "message": "Database connection failed. Please try again later."}), 500
+
+        cursor = conn.cursor(dictionary=True) # Use dictionary=True for easier access by column name
+        admin_user = None
+        try:
+            cursor.execute("SELECT id, email, password FROM admin_users WHERE email = %s", (email,))
+            admin_user = cursor.fetchone()
+            logging.info("ℹ️ Admin Login: Query executed. Admin user found: %s", admin_user is not None)
+        except mysql.connector.Error as err:
+            logging.error("❌ Admin Login: Database query error: %s", err)
+            return jsonify({"status": "error", "message": "An error occurred during admin login."}), 500
+        finally:
             cursor.close()
-            conn.close()
-
-    if admin_user:
-        logging.info(f"ℹ️ Admin Login: Retrieved admin user - ID: {admin_user['id']}, Email: {admin_user['email']}")
-        logging.info(f"ℹ️ Admin Login: Checking password hash for provided password against '{admin_user['password'][:20]}...'") # Log a snippet
-        if check_password_hash(admin_user['password'], password):
-            session['admin_id'] = admin_user['id']
-            session['admin_email'] = admin_user['email']
-            session['is_admin'] = True
-            logging.info(f"✅ Admin '{email}' logged in successfully. Redirecting to admin dashboard.")
-            # Return JSON for success, frontend will handle redirect
-            return jsonify({"status": "success", "redirect": url_for('admin_dashboard')}), 200
-        else:
-            logging.warning(f"❌ Admin Login: Invalid password for admin '{email}'.")
-            return jsonify({"status": "error", "message": "Invalid admin credentials!"}), 401
-    else:
-        logging.warning(f"❌ Admin Login: Admin user '{email}' not found.")
+
+    if not admin_user:
+        failed_logins.unknown("admin_users", email)
+        logging.warning("❌ Admin Login: Admin user '%s' not found.", email)
+        return jsonify({"status": "error", "message": "Invalid admin credentials!"}), 401
+
+    logging.info("ℹ️ Admin Login: Retrieved admin user - ID: %s, Email: %s", admin_user['id'], admin_user['email'])
+    logging.info("ℹ️ Admin Login: Checking password hash for provided password against '%s...'", admin_user['password'][:20]) # Log a snippet
+    try:
+        password_ok = password_hasher.verify(admin_user['password'], password)
+    except HasherBusy:
+        logging.warning("⚠ Admin Login: Password hashing pool is busy.")
+        return jsonify({"status": "error", "message": "Server is busy. Please try again shortly."}), 503
+    if not password_ok:
+        failed_logins.wrong_password("admin_users", email, password)
+        logging.warning("❌ Admin Login: Invalid password for admin '%s'.", email)
         return jsonify({"status": "error", "message": "Invalid admin credentials!"}), 401
 
+    if password_hasher.needs_rehash(admin_user['password']):
+        admin_id = admin_user['id']
+        password_hasher.rehash_later(password, lambda new_hash: store_rehashed_password("admin_users", admin_id, new_hash))
+    session['admin_id'] = admin_user['id']
+    session['admin_email'] = admin_user['email']
+    session['is_admin'] = True
+    logging.info("✅ Admin '%s' logged in successfully. Redirecting to admin dashboard.", email)
+    # Return JSON for success, frontend will handle redirect
+    return jsonify({"status": "success", "redirect": url_for('admin_dashboard')}), 200
+
 # ---------------- DASHBOARD ROUTE ----------------
 @app.route('/dashboard')
 def dashboard():
@@ -302,26 +632,24 @@ def dashboard():
         logging.warning("❌ Dashboard: User not logged in. Redirecting to login.")
         return redirect(url_for('login_page'))
 
-    conn = get_db_connection()
-    if not conn:
-        logging.error("❌ Dashboard: Database connection failed.")
-        return "Database connection failed", 500
-
-    cursor = conn.cursor(dictionary=True)
-    user_email = session.get('user_email')
-    username = session.get('username', 'User')
+    with db_connection() as conn:
+        if not conn:
+            logging.error("❌ Dashboard: Database connection failed.")
+            return "Database connection failed", 500
 
-    alerts = []
-    try:
-        cursor.execute("SELECT id, product_name, alert_price FROM price_alerts WHERE user_id = %s", (session['user_id'],))
-        alerts = cursor.fetchall()
-        logging.info(f"✅ Dashboard: Fetched {len(alerts)} alerts for user {session['user_id']}.")
-    except mysql.connector.Error as err:
-        logging.error(f"❌ Dashboard: Error fetching alerts: {err}")
-    finally:
-        if conn and conn.is_connected():
+        cursor = conn.cursor(dictionary=True)
+        user_email = session.get('user_email')
+        username = session.get('username', 'User')
+
+        alerts = []
+        try:
+            cursor.execute("SELECT id, product_name, alert_price FROM price_alerts WHERE user_id = %s", (session['user_id'],))
+            alerts = cursor.fetchall()
+            logging.info(f"✅ Dashboard: Fetched {len(alerts)} alerts for user {session['user_id']}.")
+        except mysql.connector.Error as err:
+            logging.error(f"❌ Dashboard: Error fetching alerts: {err}")
+        finally:
             cursor.close()
-            conn.close()
 
     return render_template('dashboard.html', user_email=user_email, username=username, alerts=alerts)
 
@@ -333,23 +661,21 @@ def admin_dashboard():
         logging.warning("❌ Admin Dashboard: Admin not logged in. Redirecting to admin login.")
         return redirect(url_for('admin_login_page'))
 
-    conn = get_db_connection()
-    if not conn:
-        logging.error("❌ Admin Dashboard: Database connection failed.")
-        return "Database connection failed", 500
-
-    users = []
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, username, email FROM users")
-        users = cursor.fetchall()
-        logging.info(f"✅ Admin Dashboard: Fetched {len(users)} users.")
-    except mysql.connector.Error as err:
-        logging.error(f"❌ Admin Dashboard: Database error fetching users: {err}")
-    finally:
-        if conn and conn.is_connected():
+    with db_connection() as conn:
+        if not conn:
+            logging.error("❌ Admin Dashboard: Database connection failed.")
+            return "Database connection failed", 500
+
+        users = []
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, username, email FROM users")
+            users = cursor.fetchall()
+            logging.info(f"✅ Admin Dashboard: Fetched {len(users)} users.")
+        except mysql.connector.Error as err:
+            logging.error(f"❌ Admin Dashboard: Database error fetching users: {err}")
+        finally:
             cursor.close()
-            conn.close()
 
     return render_template('admin_dashboard.html', users=users, message=session.pop('message', None), message_type=session.pop('message_type', None))
 
@@ -361,37 +687,86 @@ def delete_user(user_id):
         logging.warning("❌ Delete User: Admin not logged in. Redirecting to admin login.")
         return redirect(url_for('admin_login_page'))
 
-    conn = get_db_connection()
-    if not conn:
-        session['message'] = "Database connection failed.";
-        session['message_type'] = 'danger';
-        logging.error("❌ Delete User: Database connection failed.")
-        return redirect(url_for('admin_dashboard'))
+    with db_connection() as conn:
+        if not conn:
+            session['message'] = "Database connection failed.";
+            session['message_type'] = 'danger';
+            logging.error("❌ Delete User: Database connection failed.")
+            return redirect(url_for('admin_dashboard'))
 
-    try:
-        cursor = conn.cursor()
-        delete_query = "DELETE FROM users WHERE id = %s"
-        cursor.execute(delete_query, (user_id,))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        session['message'] = "User deleted successfully.";
-        session['message_type'] = 'success';
-        logging.info(f"✅ User ID {user_id} deleted by admin.")
-    except mysql.connector.Error as err:
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        session['message'] = f"Error deleting user: {err}";
-        session['message_type'] = 'danger';
-        logging.error(f"❌ Delete User: Database error deleting user {user_id}: {err}")
-    except Exception as e:
-        session['message'] = f"An unexpected error occurred: {e}";
-        session['message_type'] = 'danger';
-        logging.error(f"❌ Delete User: General error deleting user {user_id}: {e}")
+        try:
+            cursor = conn.cursor()
+            delete_query = "DELETE FROM users WHERE id = %s"
+            cursor.execute(delete_query, (user_id,))
+            conn.commit()
+            cursor.close()
+            session['message'] = "User deleted successfully.";
+            session['message_type'] = 'success';
+            logging.info(f"✅ User ID {user_id} deleted by admin.")
+        except mysql.connector.Error as err:
+            conn.rollback()
+            cursor.close()
+            session['message'] = f"Error deleting user: {err}";
+            session['message_type'] = 'danger';
+            logging.error(f"❌ Delete User: Database error deleting user {user_id}: {err}")
+        except Exception as e:
+            session['message'] = f"An unexpected error occurred: {e}";
+            session['message_type'] = 'danger';
+            logging.error(f"❌ Delete User: General error deleting user {user_id}: {e}")
 
     return redirect(url_for('admin_dashboard'))
 
+# ---------------- DB POOL STATS (ADMIN) ROUTE ----------------
+@app.route('/admin/db_pool_stats')
+def db_pool_stats():
+    """Returns this worker's connection pool counters, used to size DB_POOL_SIZE and DB_POOL_MAX_OVERFLOW."""
+    if 'is_admin' not in session or not session['is_admin']:
+        logging.warning("❌ DB Pool Stats: Admin not logged in. Returning unauthorized.")
+        return jsonify({"error": "Unauthorized. Please log in as admin."}), 401
+
+    return jsonify(get_db_pool().stats())
+
+# ---------------- RESPONSE CACHE STATS (ADMIN) ROUTE ----------------
+@app.route('/admin/cache_stats')
+def cache_stats():
+    """Returns this worker's response and prediction cache counters as JSON (admin only)."""
+    if 'is_admin' not in session or not session['is_admin']:
+        logging.warning("❌ Cache Stats: Admin not logged in. Returning unauthorized.")
+        return jsonify({"error": "Unauthorized. Please log in as admin."}), 401
+    return jsonify({"responses": response_cache.stats(), "predictions": prediction_cache.stats()})
+
+# ---------------- REFRESH PRICE INDEX (ADMIN) ROUTE ----------------
+@app.route('/admin/refresh_price_index', methods=['POST'])
+def refresh_price_index():
+    """Reloads this worker's in-memory price index so newly inserted prices become visible."""
+    if 'is_admin' not in session or not session['is_admin']:
+        logging.warning("❌ Refresh Price Index: Admin not logged in. Returning unauthorized.")
+        return jsonify({"error": "Unauthorized. Please log in as admin."}), 401
+
+    if price_index is None:
+        return jsonify({"error": "Price index is not enabled (set PRICE_TREND_ENGINE=index)."}), 400
+
+    try:
+        price_index.refresh()
+    except (mysql.connector.Error, ConnectionError) as e:
+        logging.error(f"❌ Refresh Price Index: Reload failed: {e}")
+        return jsonify({"error": f"Price index reload failed: {str(e)}"}), 500
+    response_cache.clear() # Cached /price_trend responses may predate the reload
+    return jsonify({"status": "success", "products": len(price_index.products())})
+
+# ---------------- RELOAD MODELS (ADMIN) ROUTE ----------------
+@app.route('/admin/reload_models', methods=['POST'])
+def reload_models():
+    """Reloads this worker's models and CSV now instead of waiting for the file watcher."""
+    if 'is_admin' not in session or not session['is_admin']:
+        logging.warning("❌ Reload Models: Admin not logged in. Returning unauthorized.")
+        return jsonify({"error": "Unauthorized. Please log in as admin."}), 401
+
+    artifact_manager.ensure_loaded()
+    if not artifact_manager.reload(artifact_manager.signature()):
+        return jsonify({"error": f"New models were rejected: {artifact_manager.last_error}", **artifact_manager.stats()}), 422
+    return jsonify({"status": "success", **artifact_manager.stats()})
+
 # ---------------- ALERT SETTINGS PAGE ROUTE ----------------
 @app.route('/alert_settings')
 def alert_settings_page():
@@ -401,32 +776,43 @@ def alert_settings_page():
         return redirect(url_for('login_page'))
 
     user_id = session['user_id']
-    conn = get_db_connection()
-    if not conn:
-        logging.error("❌ Alert Settings: Database connection failed.")
-        return "Database connection failed", 500
-
-    alerts = []
-    products = []
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, product_name, alert_price FROM price_alerts WHERE user_id = %s", (user_id,))
-        alerts = cursor.fetchall()
-        logging.info(f"✅ Alert Settings: Fetched {len(alerts)} alerts for user {user_id}.")
-
-        # Fetch products for the dropdown
-        products = get_product_list() # Use the helper function
-        logging.info(f"✅ Alert Settings: Fetched {len(products)} products for dropdown.")
-    except mysql.connector.Error as err:
-        logging.error(f"❌ Alert Settings: Error fetching alerts or products: {err}")
-    finally:
-        if conn and conn.is_connected():
+    with db_connection() as conn:
+        if not conn:
+            logging.error("❌ Alert Settings: Database connection failed.")
+            return "Database connection failed", 500
+
+        alerts = []
+        products = []
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, product_name, alert_price FROM price_alerts WHERE user_id = %s", (user_id,))
+            alerts = cursor.fetchall()
+            logging.info(f"✅ Alert Settings: Fetched {len(alerts)} alerts for user {user_id}.")
+        except mysql.connector.Error as err:
+            logging.error(f"❌ Alert Settings: Error fetching alerts or products: {err}")
+        finally:
             cursor.close()
-            conn.close()
+
+    # Fetch products for the dropdown (after the alerts connection has gone back to the pool)
+    products = get_product_list() # Use the helper function
+    logging.info(f"✅ Alert Settings: Fetched {len(products)} products for dropdown.")
 
     return render_template('alert_settings.html', alerts=alerts, products=products, message=session.pop('alert_message', None))
 
 # ---------------- SET/UPDATE ALERT ROUTE ----------------
+def upsert_alerts(cursor, user_id, alerts):
+    """Sets [(product_name, alert_price), ...] for one user in a single INSERT ... ON DUPLICATE KEY UPDATE.
+
+    The unique (user_id, product_name) key on price_alerts (see migrations/) turns a repeated product
+    into an update of its price, so a double-submitted form cannot create two alerts. Returns the
+    affected row count (1 per inserted alert, 2 per updated one).
+    """
+    placeholders = ", ".join(["(%s, %s, %s)"] * len(alerts))
+    params = [value for product, price in alerts for value in (user_id, product, price)]
+    cursor.execute(f"INSERT INTO price_alerts (user_id, product_name, alert_price) VALUES {placeholders} "
+                   "ON DUPLICATE KEY UPDATE alert_price = VALUES(alert_price)", params)
+    return cursor.rowcount
+
 @app.route('/set_alert', methods=['POST'])
 def set_alert():
     """Handles setting or updating a price alert for a user."""
@@ -435,58 +821,121 @@ def set_alert():
         return jsonify({"error": "Unauthorized. Please log in."}), 401
 
     user_id = session['user_id']
-    conn = get_db_connection()
-    if not conn:
-        logging.error("❌ Set Alert: Database connection failed.")
-        session['alert_message'] = "Database connection failed."
-        return redirect(url_for('alert_settings_page'))
-
     product = request.form.get('product') # Form uses standard POST, so request.form
     price = request.form.get('price')
 
-    logging.debug(f"ℹ️ Set Alert: Received product: {product}, price: {price}")
+    logging.debug("ℹ️ Set Alert: Received product: %s, price: %s", product, price)
 
     if not product or not price:
-        conn.close()
         session['alert_message'] = "Please fill in all fields!"
         logging.warning("❌ Set Alert: Missing product or price.")
         return redirect(url_for('alert_settings_page'))
 
     try:
         price = float(price) # Ensure price is a float
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM price_alerts WHERE user_id = %s AND product_name = %s", (user_id, product))
-        existing_alert = cursor.fetchone()
-
-        if existing_alert:
-            update_query = "UPDATE price_alerts SET alert_price = %s WHERE id = %s"
-            cursor.execute(update_query, (price, existing_alert[0]))
-            conn.commit()
-            session['alert_message'] = "Alert updated successfully!"
-            logging.info(f"✅ Alert for user {user_id}, product '{product}' updated.")
-        else:
-            insert_query = "INSERT INTO price_alerts (user_id, product_name, alert_price) VALUES (%s, %s, %s)"
-            cursor.execute(insert_query, (user_id, product, price))
-            conn.commit()
-            session['alert_message'] = "Alert set successfully!"
-            logging.info(f"✅ Alert for user {user_id}, product '{product}' set.")
-        cursor.close()
     except ValueError:
         session['alert_message'] = "Invalid price value. Price must be a number."
         logging.warning("❌ Set Alert: Invalid price value.")
-    except mysql.connector.Error as err:
-        conn.rollback()
-        logging.error(f"❌ Set Alert: Database error setting alert: {err}")
-        session['alert_message'] = f"Error setting alert: {err}"
-    except Exception as e:
-        logging.error(f"❌ Set Alert: General error setting alert: {e}")
-        session['alert_message'] = f"An unexpected error occurred: {e}"
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
+        return redirect(url_for('alert_settings_page'))
+
+    with db_connection() as conn:
+        if not conn:
+            logging.error("❌ Set Alert: Database connection failed.")
+            session['alert_message'] = "Database connection failed."
+            return redirect(url_for('alert_settings_page'))
+
+        try:
+            cursor = conn.cursor()
+            try:
+                affected = upsert_alerts(cursor, user_id, [(product, price)])
+            finally:
+                cursor.close()
+            conn.commit()
+            alert_engine.invalidate()
+            if affected == 2:
+                session['alert_message'] = "Alert updated successfully!"
+                logging.info("✅ Alert for user %s, product '%s' updated.", user_id, product)
+            else:
+                session['alert_message'] = "Alert set successfully!"
+                logging.info("✅ Alert for user %s, product '%s' set.", user_id, product)
+        except mysql.connector.Error as err:
+            conn.rollback()
+            logging.error(f"❌ Set Alert: Database error setting alert: {err}")
+            session['alert_message'] = f"Error setting alert: {err}"
+        except Exception as e:
+            logging.error(f"❌ Set Alert: General error setting alert: {e}")
+            session['alert_message'] = f"An unexpected error occurred: {e}"
 
     return redirect(url_for('alert_settings_page'))
 
+# ---------------- BULK ALERT ROUTE ----------------
+@app.route('/alerts/bulk', methods=['POST'])
+def set_alerts_bulk():
+    """Sets or updates many of the user's alerts in one statement.
+
+    Accepts {"alerts": [{"product": ..., "price": ...}, ...]} or {"alerts": {"<product>": <price>, ...}}
+    and responds {"saved": [{"product": ..., "price": ...}], "errors": [...]}. Products are matched
+    case-insensitively against the product catalog; a product listed twice keeps its last price.
+    """
+    if 'user_id' not in session:
+        logging.warning("❌ Bulk Alerts: User not logged in. Returning unauthorized.")
+        return jsonify({"error": "Unauthorized. Please log in."}), 401
+
+    data = request.get_json(silent=True) or {}
+    items = data.get('alerts')
+    if isinstance(items, dict):
+        items = [{"product": product, "price": price} for product, price in items.items()]
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Provide 'alerts' as a list of {product, price} or a {product: price} object."}), 400
+    if len(items) > ALERT_BULK_MAX:
+        logging.warning("❌ Bulk Alerts: %d alerts exceeds the limit of %d.", len(items), ALERT_BULK_MAX)
+        return jsonify({"error": f"Too many alerts in one call; the limit is {ALERT_BULK_MAX}."}), 400
+
+    # Spell products as stored; if the catalog is unavailable, names are taken as given.
+    known = {product_key(name): name for name in get_product_list()}
+    alerts, errors = {}, []
+    for item in items:
+        product = item.get('product') if isinstance(item, dict) else None
+        price = item.get('price') if isinstance(item, dict) else None
+        if not isinstance(product, str) or not product.strip():
+            errors.append({"product": product, "price": price, "error": "Product is required."})
+            continue
+        if known and product_key(product) not in known:
+            errors.append({"product": product, "price": price, "error": f"Unknown product: {product}."})
+            continue
+        try:
+            price = float(price)
+        except (TypeError, ValueError):
+            errors.append({"product": product, "price": price, "error": "Price must be a number."})
+            continue
+        if not np.isfinite(price) or price <= 0:
+            errors.append({"product": product, "price": price, "error": "Price must be a positive number."})
+            continue
+        alerts[product_key(product)] = (known.get(product_key(product), product.strip()), price)
+
+    response = {"saved": [{"product": product, "price": price} for product, price in alerts.values()], "errors": errors}
+    if not alerts:
+        return jsonify(response), 400
+
+    user_id = session['user_id']
+    with db_connection() as conn:
+        if not conn:
+            logging.error("❌ Bulk Alerts: Database connection failed.")
+            return jsonify({"error": "Database connection failed."}), 500
+        cursor = conn.cursor()
+        try:
+            upsert_alerts(cursor, user_id, list(alerts.values()))
+            conn.commit()
+        except mysql.connector.Error as err:
+            conn.rollback()
+            logging.error("❌ Bulk Alerts: Database error saving %d alerts: %s", len(alerts), err)
+            return jsonify({"error": f"Error saving alerts: {err}"}), 500
+        finally:
+            cursor.close()
+    alert_engine.invalidate()
+    logging.info("✅ Bulk Alerts: Saved %d alerts for user %s (%d rejected).", len(alerts), user_id, len(errors))
+    return jsonify(response)
+
 # ---------------- DELETE ALERT ROUTE ----------------
 @app.route('/alerts/delete/<int:alert_id>')
 def delete_alert(alert_id):
@@ -496,30 +945,28 @@ def delete_alert(alert_id):
         return redirect(url_for('login_page'))
 
     user_id = session['user_id']
-    conn = get_db_connection()
-    if not conn:
-        session['alert_message'] = "Database connection failed."
-        logging.error("❌ Delete Alert: Database connection failed.")
-        return redirect(url_for('alert_settings_page'))
+    with db_connection() as conn:
+        if not conn:
+            session['alert_message'] = "Database connection failed."
+            logging.error("❌ Delete Alert: Database connection failed.")
+            return redirect(url_for('alert_settings_page'))
 
-    try:
-        cursor = conn.cursor()
-        delete_query = "DELETE FROM price_alerts WHERE id = %s AND user_id = %s"
-        cursor.execute(delete_query, (alert_id, user_id))
-        conn.commit()
-        cursor.close()
-        session['alert_message'] = "Alert deleted successfully!"
-        logging.info(f"✅ Alert ID {alert_id} deleted for user {user_id}.")
-    except mysql.connector.Error as err:
-        conn.rollback()
-        logging.error(f"❌ Delete Alert: Database error deleting alert: {err}")
-        session['alert_message'] = f"Error deleting alert: {err}"
-    except Exception as e:
-        logging.error(f"❌ Delete Alert: General error deleting alert: {e}")
-        session['alert_message'] = f"An unexpected error occurred: {e}"
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
+        try:
+            cursor = conn.cursor()
+            delete_query = "DELETE FROM price_alerts WHERE id = %s AND user_id = %s"
+            cursor.execute(delete_query, (alert_id, user_id))
+            conn.commit()
+            cursor.close()
+            session['alert_message'] = "Alert deleted successfully!"
+            alert_engine.invalidate()
+            logging.info(f"✅ Alert ID {alert_id} deleted for user {user_id}.")
+        except mysql.connector.Error as err:
+            conn.rollback()
+            logging.error(f"❌ Delete Alert: Database error deleting alert: {err}")
+            session['alert_message'] = f"Error deleting alert: {err}"
+        except Exception as e:
+            logging.error(f"❌ Delete Alert: General error deleting alert: {e}")
+            session['alert_message'] = f"An unexpected error occurred: {e}"
     return redirect(url_for('alert_settings_page'))
 
 # ---------------- HISTORICAL PRICE PAGE ROUTE ----------------
@@ -533,10 +980,47 @@ def historical_price_page():
     products = get_product_list() # Use the helper function
     return render_template('historical_price.html', products=products)
 
+# ---------------- PRODUCT CATALOG API ROUTE ----------------
+@app.route('/products', methods=['GET'])
+def get_products():
+    """Returns the cached product catalog as JSON, answering If-None-Match with 304 when unchanged."""
+    snapshot = product_catalog.snapshot()
+    response = jsonify({"products": snapshot.products, "predictable": snapshot.predictable, "stale": snapshot.stale})
+    if snapshot.stale:
+        mark_stale(response)
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'private, max-age=60'
+    return response.make_conditional(request)
+
 # ---------------- HISTORICAL PRICE TRENDS API ROUTE ----------------
 @app.route('/price_trend', methods=['GET'])
 def get_price_trends():
-    """Fetches historical price trends for a given product and date range."""
+    """Fetches historical price trends for a given product and date range, through the response cache."""
+    args = request.args
+    key = ("price_trend", product_key(args.get('product_name') or ''), args.get('from_date'), args.get('to_date'),
+           args.get('resolution', 'day').lower(), args.get('agg', 'mean').lower(),
+           args.get('after'), args.get('limit'), args.get('format', 'records').lower())
+    return cached_get_response(key, price_trend_response)
+
+def stale_price_series(product, read_from, to_date):
+    """(day ordinals, prices) of a product from the loaded commodity CSV, or None if it is not loaded.
+
+    The CSV holds monthly prices, expanded to daily points like the monthly table; it is as current
+    as the last deploy, so responses built from it are marked stale (see mark_stale).
+    """
+    price_store = artifact_manager.current().prices
+    if price_store is None:
+        return None
+    return expand_monthly(*price_store.series(product), read_from, to_date)
+
+def mark_stale(response):
+    """Flags a response served from fallback data while the database is unavailable; such responses are not cached."""
+    response.headers['X-Data-Stale'] = 'true'
+    response.headers['Warning'] = '110 - "Response is Stale"'
+    return response
+
+def price_trend_response():
+    """Builds the /price_trend response for the current request (see get_price_trends)."""
     # This API endpoint does not require user_id in session as it's called via fetch from frontend
     # However, if you want to protect this API, uncomment the session check below:
     # if 'user_id' not in session:
@@ -547,45 +1031,131 @@ def get_price_trends():
     from_date_str = request.args.get('from_date')
     to_date_str = request.args.get('to_date')
 
-    logging.debug(f"ℹ️ Price Trend API: Received product: {product}, from_date: {from_date_str}, to_date: {to_date_str}")
+    logging.debug("ℹ️ Price Trend API: Received product: %s, from_date: %s, to_date: %s", product, from_date_str, to_date_str)
 
     if not product or not from_date_str or not to_date_str:
         logging.warning("❌ Price Trend API: Missing product_name, from_date, or to_date.")
         return jsonify({"error": "Please provide product_name, from_date, and to_date."}), 400
 
     try:
-        datetime.strptime(from_date_str, '%Y-%m-%d').date()
-        datetime.strptime(to_date_str, '%Y-%m-%d').date()
+        from_date = datetime.strptime(from_date_str, '%Y-%m-%d').date()
+        to_date = datetime.strptime(to_date_str, '%Y-%m-%d').date()
+        after_str = request.args.get('after')
+        after = datetime.strptime(after_str, '%Y-%m-%d').date() if after_str else None
     except ValueError:
         logging.warning("❌ Price Trend API: Invalid date format.")
         return jsonify({"error": "Invalid date format. Use %Y-%m-%d."}), 400
 
-    conn = get_db_connection()
-    if not conn:
-        logging.error("❌ Price Trend API: Database connection failed.")
-        return jsonify({"error": "Database connection failed."}), 500
-
-    cursor = conn.cursor()
-    # Ensure product_name comparison is case-insensitive if your data or frontend has mixed case
-    # For MySQL, you can use COLLATE utf8mb4_general_ci or LOWER() function
-    query = "SELECT date, price FROM historical_prices WHERE LOWER(product_name)=LOWER(%s) AND date BETWEEN %s AND %s ORDER BY date ASC"
-    results = []
+    # ✅ Optional server-side downsampling, keyset pagination and columnar output:
+    #   resolution=day|week|month, agg=mean|min|max|last, after=<last date of previous page>&limit=N, format=records|columnar
+    resolution = request.args.get('resolution', 'day').lower()
+    aggregation = request.args.get('agg', 'mean').lower()
+    output_format = request.args.get('format', 'records').lower()
+    if resolution not in RESOLUTIONS or aggregation not in AGGREGATIONS or output_format not in ('records', 'columnar'):
+        logging.warning("❌ Price Trend API: Invalid resolution, agg or format.")
+        return jsonify({"error": f"resolution must be one of {', '.join(RESOLUTIONS)}; agg one of {', '.join(AGGREGATIONS)}; format records or columnar."}), 400
     try:
-        cursor.execute(query, (product, from_date_str, to_date_str))
-        db_results = cursor.fetchall()
-        logging.debug(f"ℹ️ Price Trend API: Number of results found: {len(db_results)}")
-        results = [{"date": row[0].strftime('%Y-%m-%d'), "price": float(row[1])} for row in db_results]
-        if not results:
-            logging.info("ℹ️ Price Trend API: No data found for the given criteria.")
-            return jsonify({"message": "No price data found for the selected product and date range."}), 200
-        return jsonify(results)
-    except mysql.connector.Error as e:
-        logging.error(f"❌ Price Trend API: Database error: {e}")
-        return jsonify({"error": f"Error fetching price trends: {str(e)}"}), 500
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+        if limit is not None and limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer."}), 400
+
+    # Every point of a later page is dated after `after`, so earlier rows need not be read at all.
+    # (Daily pages can also stop reading after limit + 1 rows.)
+    read_from = max(from_date, after + timedelta(days=1)) if after else from_date
+    row_limit = limit + 1 if limit is not None and resolution == 'day' else None
+    replica_result = None
+    if read_replica is not None and read_from <= to_date:
+        try:
+            replica_result = read_replica.query(product, read_from, to_date, row_limit)
+            logging.debug("ℹ️ Price Trend API: Number of results found in read replica: %d", len(replica_result[0]))
+        except ReplicaUnavailable as e:
+            logging.warning("⚠ Price Trend API: %s; reading MySQL.", e)
+    if read_from > to_date:
+        dates, prices = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    elif price_index is not None:
+        try:
+            dates, prices = price_index.query(product, read_from, to_date)
+            logging.debug("ℹ️ Price Trend API: Number of results found in price index: %d", len(dates))
+        except (mysql.connector.Error, ConnectionError) as e:
+            logging.error("❌ Price Trend API: Price index could not be loaded: %s", e)
+            dates = None
+    elif replica_result is not None:
+        dates, prices = replica_result
+    elif PRICE_TREND_ENGINE == "store":
+        price_store = artifact_manager.current().prices
+        if price_store is None:
+            logging.error("❌ Price Trend API: Commodity price data not loaded.")
+            return jsonify({"error": "Commodity price data not loaded."}), 500
+        dates, prices = expand_monthly(*price_store.series(product), read_from, to_date)
+    else:
+        dates = None
+        with db_connection() as conn:
+            if not conn:
+                logging.error("❌ Price Trend API: Database connection failed.")
+            else:
+                cursor = conn.cursor()
+                # product_name has a case-insensitive collation (see migrations/), so a plain comparison matches
+                # mixed case and can use the (product_name, date) index, which LOWER(product_name) would defeat.
+                query = "SELECT date, price FROM historical_prices WHERE product_name=%s AND date BETWEEN %s AND %s ORDER BY date ASC"
+                try:
+                    if HISTORICAL_PRICES_STORAGE == "monthly":
+                        # One row per month: fetch the months overlapping the window and expand only the requested days
+                        query = "SELECT month, price FROM historical_prices_monthly WHERE product_name=%s AND month BETWEEN %s AND %s AND price IS NOT NULL ORDER BY month ASC"
+                        cursor.execute(query, (product, read_from.replace(day=1), to_date))
+                        db_results = cursor.fetchall()
+                        logging.debug("ℹ️ Price Trend API: Number of monthly results found: %s", len(db_results))
+                        dates, prices = expand_monthly([row[0] for row in db_results], [row[1] for row in db_results], read_from, to_date)
+                    else:
+                        if row_limit is not None:
+                            query += f" LIMIT {row_limit}"
+                        cursor.execute(query, (product, read_from, to_date))
+                        db_results = cursor.fetchall()
+                        logging.debug("ℹ️ Price Trend API: Number of results found: %s", len(db_results))
+                        dates = np.array([row[0].toordinal() for row in db_results if row[1] is not None], dtype=np.int32)
+                        prices = np.array([row[1] for row in db_results if row[1] is not None], dtype=np.float64)
+                except UNAVAILABLE_ERRORS as e:
+                    logging.error("❌ Price Trend API: Database unavailable: %s", e)
+                    get_db_pool().record_failure()
+                    dates = None
+                except mysql.connector.Error as e:
+                    logging.error("❌ Price Trend API: Database error: %s", e)
+                    return jsonify({"error": f"Error fetching price trends: {str(e)}"}), 500
+                finally:
+                    cursor.close()
+
+    # ✅ When the database (or the price index built from it) cannot be read, serve the commodity CSV's
+    # prices instead, flagged stale, rather than an error.
+    stale = dates is None
+    if stale:
+        fallback = stale_price_series(product, read_from, to_date)
+        if fallback is None:
+            return jsonify({"error": "Database connection failed."}), 500
+        logging.warning("⚠ Price Trend API: Serving stale prices for '%s' from the commodity CSV.", product)
+        dates, prices = fallback
+
+    if resolution != 'day' or aggregation != 'mean':
+        dates, prices = downsample(dates, prices, resolution, aggregation)
+    dates, prices, next_after = page_after(dates, prices, after.toordinal() if after else None, limit)
+    if len(dates) == 0:
+        logging.info("ℹ️ Price Trend API: No data found for the given criteria.")
+        response = jsonify({"message": "No price data found for the selected product and date range."})
+        return (mark_stale(response) if stale else response), 200
+
+    if output_format == 'columnar':
+        body = series_to_columns(dates, prices)
+        body["next_after"] = ordinals_to_iso([next_after])[0] if next_after is not None else None
+        if stale:
+            body["stale"] = True
+        response = jsonify(body)
+    else:
+        response = jsonify(series_to_records(dates, prices))
+    if next_after is not None:
+        response.headers['X-Next-After'] = ordinals_to_iso([next_after])[0]
+    if stale:
+        mark_stale(response)
+    return response
 
 # ---------------- PRICE PREDICTION PAGE ROUTE ----------------
 @app.route('/predict_price')
@@ -595,7 +1165,7 @@ def predict_price_page():
         logging.warning("❌ Predict Price: User not logged in. Redirecting to login.")
         return redirect(url_for('login_page'))
 
-    products = get_product_list() # Use the helper function
+    products = product_catalog.predictable() # Only products /predict has a model for
     return render_template('predict_price.html', products=products)
 
 
@@ -607,7 +1177,10 @@ def predict():
         logging.warning("❌ Predict API: User not logged in. Returning unauthorized JSON.")
         return jsonify({"error": "Unauthorized. Please log in."}), 401
 
-    if not models:
+    # One consistent set of models and tables for the whole request
+    artifacts = artifact_manager.current()
+    prediction_table, forecast_engine = artifacts.prediction_table, artifacts.forecast_engine
+    if not artifacts.models:
         logging.warning("❌ Predict API: Prediction models not loaded.")
         return jsonify({"error": "Prediction models are not loaded. Please ensure 'models.pkl' exists and was trained."}), 503
 
@@ -617,7 +1190,7 @@ def predict():
     date_str = data.get('date')
 
     logging.debug("ℹ️ Predict API: JSON data received: %s", data)
-    logging.info(f"ℹ️ Predict API: Attempting prediction for Product: '{product}', Date: '{date_str}'")
+    logging.info("ℹ️ Predict API: Attempting prediction for Product: '%s', Date: '%s'", product, date_str)
 
     if not all([product, date_str]):
         logging.warning("❌ Predict API: Missing product or date.")
@@ -633,64 +1206,177 @@ def predict():
         logging.warning("❌ Predict API: Invalid date format.")
         return jsonify({"error": "Invalid date format. Use %Y-%m-%d."}), 400
 
-    if product not in models:
-        logging.warning(f"❌ Predict API: No model found for product: {product}.")
+    if product not in prediction_table:
+        logging.warning("❌ Predict API: No model found for product: %s.", product)
         return jsonify({"error": f"No prediction model found for product: {product}. Please ensure the model was trained."}), 400
 
-    if df.empty or "Commodities" not in df.columns:
+    if not prediction_table.csv_loaded:
         logging.error("❌ Predict API: Commodity data CSV not loaded properly.")
         return jsonify({"error": "Commodity data CSV not loaded properly."}), 500
 
-    product_data = df[df["Commodities"].str.lower() == product.lower()] # Case-insensitive match
-    if product_data.empty:
-        logging.warning(f"❌ Predict API: No historical data in CSV for product: {product}.")
+    row = prediction_table.index[product]
+    if not prediction_table.in_csv[row]:
+        logging.warning("❌ Predict API: No historical data in CSV for product: %s.", product)
         return jsonify({"error": "No historical data found in CSV for this product to make a prediction!"}), 400
 
-    price_columns = [col for col in df.columns if '-' in col and len(col.split('-')[1]) == 2]
-    if not price_columns:
+    if not prediction_table.has_price_columns:
         logging.error("❌ Predict API: Not enough price data columns in CSV for prediction.")
         return jsonify({"error": "Not enough price data columns in the CSV for prediction!"}), 400
 
-    latest_price_col = price_columns[-1]
-
-    if latest_price_col not in product_data.columns or pd.isna(product_data[latest_price_col].iloc[0]):
-        logging.warning(f"❌ Predict API: Latest price data not available in CSV for {product}.")
+    if np.isnan(prediction_table.latest[row]):
+        logging.warning("❌ Predict API: Latest price data not available in CSV for %s.", product)
         return jsonify({"error": f"Latest price data not available in CSV for {product} to make a prediction."}), 400
 
-    latest_price = product_data[latest_price_col].iloc[0]
-    prediction_input = [[latest_price]]
+    if forecast_engine.months_ahead(product, input_date) > forecast_engine.horizon:
+        logging.warning("❌ Predict API: Date %s is beyond the forecast horizon for %s.", date_str, product)
+        return jsonify({"error": f"Prediction date is too far ahead. Forecasts for {product} are available up to {forecast_engine.horizon_end(product)}."}), 400
 
-    conn = None # Initialize conn to None for finally block
     try:
-        model = models[product]
-        predicted_price = model.predict(prediction_input)[0]
-        predicted_price_mysql = float(round(predicted_price, 2))
-        logging.info(f"✅ Predict API: Predicted price for {product} on {date_str}: {predicted_price_mysql}")
-
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.cursor()
-            query = "INSERT INTO price_predictions (product_name, predicted_price, prediction_date) VALUES (%s, %s, %s)"
-            cursor.execute(query, (product, predicted_price_mysql, date_str))
-            conn.commit()
-            cursor.close()
-            logging.info("✅ Predict API: Prediction saved to database.")
-            return jsonify({"predicted_price": predicted_price_mysql})
-        else:
-            logging.warning("⚠ Predict API: Could not save prediction to database (DB connection failed).")
-            return jsonify({"predicted_price": predicted_price_mysql, "warning": "Could not save prediction to database."}), 200
+        cache_key = (product, input_date, artifacts.version)
+        predicted_price_mysql = prediction_cache.get(cache_key)
+        if predicted_price_mysql is None:
+            with timed_phase("model"):
+                predicted_price = forecast_engine.forecast(product, input_date)
+            predicted_price_mysql = float(round(predicted_price, 2))
+            prediction_cache.put(cache_key, predicted_price_mysql)
+        logging.info("✅ Predict API: Predicted price for %s on %s: %s", product, date_str, predicted_price_mysql)
+        alert_worker.submit(product, predicted_price_mysql, "prediction")
+
+        # The INSERT happens later on the write-behind thread, so a slow database does not slow predictions down.
+        if record_prediction(product, predicted_price_mysql, date_str, artifacts.version):
+            return jsonify({"predicted_price": predicted_price_mysql, "model_version": artifacts.version})
+        logging.warning("⚠ Predict API: Could not save prediction to database (write-behind queue full).")
+        return jsonify({"predicted_price": predicted_price_mysql, "model_version": artifacts.version,
+                        "warning": "Could not save prediction to database."}), 200
 
     except Exception as e:
-        logging.error(f"❌ Predict API: Error during prediction or DB save: {e}")
-        if conn and conn.is_connected():
-            conn.rollback() # Rollback if error occurred after connection
+        logging.error("❌ Predict API: Error during prediction or DB save: %s", e)
         return jsonify({"error": f"Error during prediction: {str(e)}"}), 500
-    finally:
-        # Ensure connection is closed even if not explicitly handled in try/except
-        if conn and conn.is_connected():
-            conn.close()
 
 
+# ---------------- BATCH PRICE PREDICTION API ROUTE ----------------
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Predicts prices for many (product, date) pairs in one call and saves them in one transaction.
+
+    Accepts either {"items": [{"product": ..., "date": ...}, ...]} or a grid
+    {"products": [...], "dates": [...]}, and responds column-wise:
+    {"products": [...], "dates": [...], "predicted_prices": [...], "errors": [...]}.
+    """
+    if 'user_id' not in session:
+        logging.warning("❌ Batch Predict API: User not logged in. Returning unauthorized JSON.")
+        return jsonify({"error": "Unauthorized. Please log in."}), 401
+
+    artifacts = artifact_manager.current()
+    prediction_table, forecast_engine = artifacts.prediction_table, artifacts.forecast_engine
+    if not artifacts.models:
+        logging.warning("❌ Batch Predict API: Prediction models not loaded.")
+        return jsonify({"error": "Prediction models are not loaded. Please ensure 'models.pkl' exists and was trained."}), 503
+
+    data = request.get_json(silent=True) or {}
+    if isinstance(data.get('items'), list):
+        pairs = [(item.get('product'), item.get('date')) for item in data['items'] if isinstance(item, dict)]
+    elif isinstance(data.get('products'), list) and isinstance(data.get('dates'), list):
+        pairs = [(product, date_str) for product in data['products'] for date_str in data['dates']]
+    else:
+        logging.warning("❌ Batch Predict API: Request has neither 'items' nor 'products' and 'dates'.")
+        return jsonify({"error": "Provide 'items' as a list of {product, date} or 'products' and 'dates' lists."}), 400
+
+    if not pairs:
+        return jsonify({"error": "No prediction requests provided."}), 400
+    if len(pairs) > PREDICT_BATCH_MAX:
+        logging.warning("❌ Batch Predict API: %d requests exceeds the limit of %d.", len(pairs), PREDICT_BATCH_MAX)
+        return jsonify({"error": f"Too many predictions requested; the limit is {PREDICT_BATCH_MAX} per call."}), 400
+
+    today = datetime.today().date()
+    valid_products, valid_dates, valid_date_strs, errors = [], [], [], []
+    for product, date_str in pairs:
+        reason = prediction_table.unavailable_reason(product) if isinstance(product, str) else "Product is required."
+        if reason is None:
+            try:
+                input_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+                if input_date < today:
+                    reason = "Prediction date cannot be in the past."
+                elif forecast_engine.months_ahead(product, input_date) > forecast_engine.horizon:
+                    reason = f"Prediction date is too far ahead. Forecasts are available up to {forecast_engine.horizon_end(product)}."
+            except (TypeError, ValueError):
+                reason = "Invalid date format. Use %Y-%m-%d."
+        if reason is None:
+            valid_products.append(product)
+            valid_dates.append(input_date)
+            valid_date_strs.append(date_str)
+        else:
+            errors.append({"product": product, "date": date_str, "error": reason})
+
+    with timed_phase("model"):
+        predicted_prices = np.round(forecast_engine.forecast_many(valid_products, valid_dates), 2).tolist()
+    logging.info("✅ Batch Predict API: Predicted %d prices (%d rejected).", len(predicted_prices), len(errors))
+    for product, predicted_price in zip(valid_products, predicted_prices):
+        alert_worker.submit(product, predicted_price, "prediction")
+
+    response = {"products": valid_products, "dates": valid_date_strs, "predicted_prices": predicted_prices, "errors": errors,
+                "model_version": artifacts.version}
+    if not predicted_prices:
+        return jsonify(response), 400
+
+    dropped = sum(not record_prediction(product, predicted_price, date_str, artifacts.version)
+                  for product, predicted_price, date_str in zip(valid_products, predicted_prices, valid_date_strs))
+    if dropped:
+        logging.warning("⚠ Batch Predict API: %d predictions not saved (write-behind queue full).", dropped)
+        response["warning"] = "Could not save predictions to database."
+    return jsonify(response)
+
+# ---------------- METRICS ROUTE ----------------
+@metrics.collector
+def collect_component_metrics():
+    """Connection pool, cache and write-behind counters of this worker, read at scrape time."""
+    pool = _db_pool.stats() if _db_pool is not None and _db_pool_pid == os.getpid() else {}
+    for name in ("checkouts", "waits", "timeouts", "reconnects", "connections_opened", "connections_closed"):
+        yield (f"agri_db_pool_{name}_total", "counter", f"Connection pool {name.replace('_', ' ')}.", [({}, pool.get(name))])
+    for name in ("open", "idle", "in_use"):
+        yield (f"agri_db_pool_{name}_connections", "gauge", f"Connection pool {name.replace('_', ' ')} connections.", [({}, pool.get(name))])
+    if "circuit_state" in pool:
+        yield ("agri_db_circuit_open", "gauge", "1 while the database circuit breaker is open or probing.",
+               [({}, 0 if pool["circuit_state"] == "closed" else 1)])
+        yield ("agri_db_circuit_trips_total", "counter", "Times the database circuit breaker opened.", [({}, pool["circuit_trips"])])
+        yield ("agri_db_circuit_rejected_total", "counter", "Database checkouts refused while the breaker was open.",
+               [({}, pool["circuit_rejected"])])
+
+    caches = {"responses": response_cache.stats(), "predictions": prediction_cache.stats()}
+    for name in ("hits", "misses", "evictions", "expirations"):
+        yield (f"agri_cache_{name}_total", "counter", f"Cache {name} per cache.",
+               [({"cache": cache}, stats[name]) for cache, stats in caches.items()])
+    yield ("agri_cache_hit_ratio", "gauge", "Cache hits / lookups per cache.",
+           [({"cache": cache}, stats["hit_ratio"]) for cache, stats in caches.items()])
+    yield ("agri_cache_entries", "gauge", "Entries held per cache.",
+           [({"cache": cache}, stats["entries"]) for cache, stats in caches.items()])
+
+    writes = prediction_writer.stats()
+    for name in ("written", "deduplicated", "dropped", "failed"):
+        yield (f"agri_prediction_writes_{name}_total", "counter", f"Prediction rows {name} by the write-behind queue.", [({}, writes[name])])
+    yield ("agri_prediction_writes_queued", "gauge", "Prediction rows waiting to be written.", [({}, writes["queued"])])
+
+    artifacts = artifact_manager.stats()
+    yield ("agri_model_info", "gauge", "Model version this worker is serving.",
+           [({"version": artifacts["version"]}, 1)] if artifacts["version"] else [])
+    yield ("agri_model_loaded_timestamp_seconds", "gauge", "When the serving models were loaded.", [({}, artifacts["loaded_at"])])
+    for name in ("reloads", "failed_reloads"):
+        yield (f"agri_model_{name}_total", "counter", f"Model {name.replace('_', ' ')} in this worker.", [({}, artifacts[name])])
+
+    if read_replica is not None:
+        replica = read_replica.status()
+        yield ("agri_replica_staleness_seconds", "gauge", "Seconds since the read replica's last successful sync.",
+               [({}, replica["staleness_seconds"])])
+        yield ("agri_replica_rows", "gauge", "Rows held by the read replica.", [({}, replica["rows"])])
+        for name in ("syncs", "failed_syncs"):
+            yield (f"agri_replica_{name}_total", "counter", f"Read replica {name.replace('_', ' ')} run by this worker.",
+                   [({}, replica[name])])
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Exposes this worker's metrics in Prometheus text format."""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # ---------------- LOGOUT ROUTE ----------------
 @app.route('/logout')
 def logout():
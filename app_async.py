@@ -0,0 +1,36 @@
+"""Async entry point: the same Flask app (routes, templates, settings) served by gevent greenlets.
+
+    gunicorn --worker-class gevent app_async:app        (see Procfile.async)
+
+Under the default sync workers a worker is blocked for every MySQL round trip, so concurrency equals
+the worker count. Here the standard library is monkey-patched before app.py is imported, so each
+request runs in a greenlet and a socket wait (MySQL, SMTP alerts) yields to the other requests of the
+worker: one worker overlaps as many in-flight database waits as it has pooled connections, and
+requests waiting for a connection wait cooperatively too. For that the MySQL driver has to be the
+pure-Python one (DB_USE_PURE=1), the pool defaults are raised, and password hashing stays on real OS
+threads so it does not stall the event loop.
+
+Background workers (write-behind queue, alert worker, artifact watcher) become greenlets as well.
+CPU-bound work (predictions, template rendering) still runs one request at a time per worker.
+"""
+# Patch before anything else imports socket, threading or queue
+from gevent import monkey
+
+monkey.patch_all()
+
+import os
+
+# ✅ Defaults for async serving, each overridable from the environment
+os.environ.setdefault("DB_USE_PURE", "1")
+os.environ.setdefault("DB_POOL_SIZE", "10")
+# Connections per worker beyond DB_POOL_SIZE (closed again when idle); keep workers x (size + overflow)
+# below the MySQL server's max_connections.
+os.environ.setdefault("DB_POOL_MAX_OVERFLOW", "40")
+
+from gevent.threadpool import ThreadPoolExecutor
+
+import passwords
+
+passwords.PasswordHasher.executor_class = ThreadPoolExecutor
+
+from app import app
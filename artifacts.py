@@ -0,0 +1,335 @@
+"""Prediction artifacts (models + commodity CSV) and their sklearn-free storage format.
+
+models.npz holds every commodity's linear coefficients as plain arrays (names, slope, intercept),
+so a serving process loads it with NumPy alone; models.pkl needs joblib and sklearn to unpickle.
+model.py writes both. To convert an existing models.pkl:
+    python artifacts.py convert [models.pkl] [models.npz]
+
+ArtifactManager serves one loaded set at a time and, when asked to watch, reloads it in the
+background whenever the model or CSV files (or the "models" data version) change. A reloaded set
+only replaces the current one if validate_artifacts() finds nothing wrong with it.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+class LinearCoefficients:
+    """A fitted one-feature linear model without sklearn: the coef_/intercept_ attributes and predict()."""
+
+    __slots__ = ("coef_", "intercept_")
+
+    def __init__(self, slope, intercept):
+        self.coef_ = np.array([slope], dtype=np.float64)
+        self.intercept_ = float(intercept)
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64)[:, 0] * self.coef_[0] + self.intercept_
+
+
+def replace_atomically(path, write):
+    """Calls write(file) on a temporary file next to `path`, then renames it over `path`.
+
+    Readers (such as a worker reloading models) see either the old or the new file, never a partial one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+        # mkstemp creates the file private (0600); keep the replaced file's mode so workers can still read it.
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def save_compact_models(path, models):
+    """Writes {name: fitted linear model} to an .npz file; raises ValueError for non-linear models."""
+    names, slope, intercept = [], [], []
+    for name, model in models.items():
+        coef = getattr(model, "coef_", None)
+        if coef is None or np.size(coef) != 1:
+            raise ValueError(f"Model for '{name}' has no single linear coefficient; keep using models.pkl.")
+        names.append(name)
+        slope.append(np.ravel(coef)[0])
+        intercept.append(np.ravel(model.intercept_)[0])
+    replace_atomically(path, lambda file: np.savez(
+        file, names=np.array(names, dtype=str), slope=np.array(slope, dtype=np.float64),
+        intercept=np.array(intercept, dtype=np.float64)))
+
+
+def load_compact_models(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {str(name): LinearCoefficients(s, i) for name, s, i in zip(data["names"], data["slope"], data["intercept"])}
+
+
+def load_models(path):
+    """Loads models from models.npz (NumPy only) or models.pkl (imports joblib and sklearn)."""
+    if path.endswith(".npz"):
+        return load_compact_models(path)
+    import joblib
+    return joblib.load(path)
+
+
+def default_models_path():
+    """MODELS_FILE if set, else models.npz when present, else models.pkl."""
+    path = os.environ.get("MODELS_FILE")
+    if path:
+        return path
+    return "models.npz" if os.path.exists("models.npz") else "models.pkl"
+
+
+def default_price_store_path():
+    """PRICE_STORE if set, else commodity_price.bin (built by python price_store.py build)."""
+    return os.environ.get("PRICE_STORE", "commodity_price.bin")
+
+
+def load_price_matrix(csv_path, store_path=None):
+    """Commodity prices from the memory-mapped price store when it is current, else from the CSV; None if unusable."""
+    from price_store import load_prices
+
+    try:
+        prices = load_prices(csv_path, store_path)
+    except FileNotFoundError:
+        logging.error("❌ Error: '%s' not found.", csv_path)
+        return None
+    except Exception as e:
+        logging.error("❌ Error loading commodity data: %s", e)
+        return None
+    logging.info("✅ %d products loaded from %s.", len(set(prices.names)), prices.path or csv_path)
+    return prices
+
+
+def file_state(path):
+    """(mtime, size) of a file, or None if it does not exist; cheap enough to poll."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def fingerprint(*paths):
+    """Short content hash of the given files, the model version reported with predictions.
+
+    It depends only on the file contents, so every worker serving the same files reports the same version.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            with open(path, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+        except OSError:
+            pass
+        digest.update(b"\0")
+    return digest.hexdigest()[:12]
+
+
+class Artifacts:
+    """One consistent set of loaded models, commodity prices and the lookup tables built from them."""
+
+    def __init__(self, models, prediction_table, forecast_engine, version=None, prices=None):
+        self.models = models
+        self.prices = prices
+        self.prediction_table = prediction_table
+        self.forecast_engine = forecast_engine
+        self.version = version
+        self.loaded_at = time.time()
+
+
+def load_artifacts(models_path, csv_path, horizon, version=None, store_path=None):
+    """Loads models and commodity prices and precomputes the prediction table and forecast curves.
+
+    Prices come from the price store at `store_path` when it is current, else from the CSV.
+    `version` defaults to the fingerprint of the files.
+    """
+    from forecasting import ForecastEngine
+    from predictor import PredictionTable
+
+    started = time.perf_counter()
+    if version is None:
+        version = fingerprint(models_path, csv_path, *([store_path] if store_path else []))
+    models = {}
+    try:
+        models = load_models(models_path)
+        logging.info("✅ Machine learning models loaded successfully from '%s'.", models_path)
+    except FileNotFoundError:
+        logging.warning("⚠ Error: '%s' not found. Please run 'model.py' to train and save models.", models_path)
+    except Exception as e:
+        logging.error("⚠ Error loading models: %s", e)
+
+    prices = load_price_matrix(csv_path, store_path)
+    # ✅ Precompute product -> (latest price, slope, intercept) so /predict does no per-request DataFrame work
+    prediction_table = PredictionTable.build(models, prices)
+    forecast_engine = ForecastEngine.build(prediction_table, prices, horizon)
+    logging.info("✅ Prediction artifacts %s built for %d products in %.3fs.", version, len(prediction_table), time.perf_counter() - started)
+    return Artifacts(models, prediction_table, forecast_engine, version, prices)
+
+
+def validate_artifacts(artifacts, previous=None, max_abs_slope=5.0):
+    """Returns a list of problems that make a newly loaded set unfit to serve (empty if it is fine).
+
+    Checked: models and CSV loaded, every product of the previous set still present, every model's
+    product found in the CSV, finite coefficients with |slope| <= max_abs_slope, and finite forecasts.
+    """
+    table, engine = artifacts.prediction_table, artifacts.forecast_engine
+    if not artifacts.models:
+        return ["no models loaded"]
+    problems = []
+    if not table.csv_loaded or not table.has_price_columns:
+        problems.append("commodity CSV not loaded or has no price columns")
+    if previous is not None and previous.models:
+        missing = sorted(set(previous.prediction_table.names) - set(table.names))
+        if missing:
+            problems.append(f"products missing from the new models: {', '.join(missing)}")
+    not_in_csv = [name for name, found in zip(table.names, table.in_csv) if not found]
+    if not_in_csv:
+        problems.append(f"products without CSV history: {', '.join(not_in_csv)}")
+    linear = np.array([name not in table.fallback_models for name in table.names], dtype=bool)
+    bad = linear & ~(np.isfinite(table.slope) & np.isfinite(table.intercept) & (np.abs(table.slope) <= max_abs_slope))
+    if bad.any():
+        problems.append(f"coefficients out of range (|slope| > {max_abs_slope:g} or not finite) for: "
+                        f"{', '.join(np.array(table.names, dtype=object)[bad])}")
+    has_history = np.isfinite(engine.last_price)
+    unstable = has_history & ~np.isfinite(engine.curves).all(axis=1)
+    if unstable.any():
+        problems.append(f"non-finite forecasts for: {', '.join(np.array(engine.names, dtype=object)[unstable])}")
+    return problems
+
+
+class ArtifactManager:
+    """Holds the current Artifacts behind one reference, loading them on first use.
+
+    `load` returns a new Artifacts. Requests read current() once and use that object throughout,
+    so they always see one consistent set. With a `signature` callable (for example the mtimes of
+    the model and CSV files) and a `check_interval`, a background thread in each process polls the
+    signature and, when it changes, loads a new set off the request path, validates it and swaps
+    it in with a single assignment. A set that fails to load or validate is logged and discarded,
+    and the previous one keeps serving until the files change again.
+    """
+
+    def __init__(self, load, signature=None, check_interval=None, validate=validate_artifacts):
+        self.load = load
+        self.signature = signature
+        self.check_interval = check_interval
+        self.validate = validate
+        self._artifacts = None
+        self._signature = None
+        self._rejected_signature = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+
+    def ensure_loaded(self):
+        """Loads the first set if nothing is loaded yet; does not start the watcher thread."""
+        artifacts = self._artifacts
+        if artifacts is None:
+            with self._lock:
+                if self._artifacts is None:
+                    self._signature = self.signature() if self.signature else None
+                    self._artifacts = self.load()
+                artifacts = self._artifacts
+        return artifacts
+
+    def current(self):
+        """The set to serve this request from; starts this process's watcher thread on first use."""
+        if self.check_interval and (self._thread is None or not self._thread.is_alive()):
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self.start()
+        return self.ensure_loaded()
+
+    @property
+    def loaded(self):
+        return self._artifacts is not None
+
+    def reload(self, signature=None):
+        """Loads and validates a new set and swaps it in; returns True if it replaced the current one."""
+        with self._lock:
+            previous = self._artifacts
+            try:
+                artifacts = self.load()
+                problems = self.validate(artifacts, previous)
+            except Exception as e:
+                problems = [f"load failed: {e}"]
+            if problems:
+                self._rejected_signature = signature
+                self.failed_reloads += 1
+                self.last_error = "; ".join(problems)
+                logging.error("❌ Rejected reloaded prediction artifacts, still serving %s: %s",
+                              previous.version if previous else None, self.last_error)
+                return False
+            self._artifacts = artifacts
+            self._signature = signature
+            self.reloads += 1
+            self.last_error = None
+        logging.info("✅ Prediction artifacts reloaded: %s -> %s.", previous.version if previous else None, artifacts.version)
+        return True
+
+    def check(self):
+        """Reloads if the signature moved since the last load (and is not a set already rejected)."""
+        if not self.signature or self._artifacts is None:
+            return False
+        signature = self.signature()
+        if signature == self._signature or signature == self._rejected_signature:
+            return False
+        return self.reload(signature)
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="artifact-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval + 1)
+
+    def _run(self):
+        while not self._stopping.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logging.error("❌ Artifact reload check failed: %s", e)
+
+    def stats(self):
+        artifacts = self._artifacts
+        return {
+            "version": artifacts.version if artifacts else None,
+            "loaded_at": artifacts.loaded_at if artifacts else None,
+            "products": len(artifacts.prediction_table) if artifacts else 0,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+        }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Prediction artifact tools.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    convert = subcommands.add_parser("convert", help="Convert models.pkl to the sklearn-free models.npz format.")
+    convert.add_argument("source", nargs="?", default="models.pkl")
+    convert.add_argument("target", nargs="?", default="models.npz")
+    args = parser.parse_args()
+
+    models = load_models(args.source)
+    save_compact_models(args.target, models)
+    print(f"✅ Wrote {len(models)} models to '{args.target}'.")
+
+
+if __name__ == "__main__":
+    main()
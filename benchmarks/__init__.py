@@ -0,0 +1 @@
+# Benchmarks for the AgriPricePredict hot paths. Run each module with `python -m benchmarks.<name>`.
@@ -0,0 +1,58 @@
+"""Benchmark: cost of one password hash per PASSWORD_HASH_METHOD, and login throughput per pool size.
+
+Use it to pick work factors: a login should stay well under the request budget while the hash
+remains expensive for an attacker. Run from the repository root:
+    python -m benchmarks.bench_passwords [--methods scrypt:32768:8:1 pbkdf2:sha256:600000 ...]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from passwords import PasswordHasher
+
+DEFAULT_METHODS = [
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+    "pbkdf2:sha256:260000",
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:1000000",
+]
+
+
+def time_per_hash(method, repeat):
+    stored = generate_password_hash("correct horse battery staple", method)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        check_password_hash(stored, "correct horse battery staple")
+    return (time.perf_counter() - started) / repeat
+
+
+def logins_per_second(method, workers, logins):
+    """Concurrent verifies pushed through a PasswordHasher with `workers` hashing threads."""
+    hasher = PasswordHasher(method, workers=workers, max_pending=logins)
+    stored = generate_password_hash("correct horse battery staple", method)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=logins) as clients:
+        list(clients.map(lambda _: hasher.verify(stored, "correct horse battery staple"), range(logins)))
+    return logins / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--methods", nargs="+", default=DEFAULT_METHODS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--logins", type=int, default=16, help="Concurrent logins for the throughput test.")
+    args = parser.parse_args()
+
+    print(f"{'method':28s} {'ms/hash':>9s}  " + "  ".join(f"{f'logins/s @{w}':>13s}" for w in args.workers))
+    for method in args.methods:
+        per_hash = time_per_hash(method, args.repeat)
+        rates = [logins_per_second(method, workers, args.logins) for workers in args.workers]
+        print(f"{method:28s} {per_hash * 1000:9.1f}  " + "  ".join(f"{rate:13.1f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Microbenchmark: per-call cost of the /predict computation, before and after PredictionTable.
+
+Run from the repository root:  python -m benchmarks.bench_predict [--iterations N]
+"""
+import argparse
+import timeit
+
+import joblib
+import pandas as pd
+
+from predictor import PredictionTable
+from price_store import PriceMatrix
+
+
+def legacy_predict(models, df, product):
+    """The per-request work /predict did before PredictionTable (DataFrame filter + sklearn call)."""
+    product_data = df[df["Commodities"].str.lower() == product.lower()]
+    price_columns = [col for col in df.columns if '-' in col and len(col.split('-')[1]) == 2]
+    latest_price = product_data[price_columns[-1]].iloc[0]
+    return models[product].predict([[latest_price]])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--models", default="models.pkl")
+    parser.add_argument("--csv", default="commodity_price.csv")
+    args = parser.parse_args()
+
+    models = joblib.load(args.models)
+    df = pd.read_csv(args.csv)
+    df.columns = df.columns.str.strip()
+    table = PredictionTable.build(models, PriceMatrix.from_frame(df))
+    products = [name for name in table.names if table.in_csv[table.index[name]]]
+
+    # Both paths must agree exactly before their timings mean anything.
+    for product in products:
+        before, after = legacy_predict(models, df, product), table.predict(product)
+        assert round(before, 2) == round(after, 2) and before == after, (product, before, after)
+
+    product = products[0]
+    for label, fn in (("legacy (DataFrame + sklearn)", lambda: legacy_predict(models, df, product)),
+                      ("PredictionTable", lambda: table.predict(product))):
+        best = min(timeit.repeat(fn, number=args.iterations, repeat=5)) / args.iterations
+        print(f"{label:32s} {best * 1e6:10.2f} µs/call")
+    print(f"Checked {len(products)} products: results identical.")
+
+
+if __name__ == "__main__":
+    main()
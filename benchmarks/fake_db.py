@@ -0,0 +1,186 @@
+"""SQLite-backed stand-in for the MySQL database, for benchmarks that drive the real app.
+
+It implements just enough of the mysql.connector connection/cursor API for app.py (cursor(dictionary=...),
+execute/executemany with %s placeholders, fetchone/fetchall/fetchmany, commit/rollback, in_transaction,
+ping), and seeds the tables the app queries from commodity_price.csv with sql_insert_code.py's expansion.
+SQLite errors are re-raised as mysql.connector errors so the app's error handling paths are exercised.
+`latency` adds a sleep per statement and commit, standing in for the network round trip to a remote MySQL.
+"""
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import date
+
+import mysql.connector
+from werkzeug.security import generate_password_hash
+
+from sql_insert_code import expand_to_days, month_rows, monthly_chunks
+
+# SQLite version of migrations/ (0001_core_tables.sql and the indexes 0003 adds); NOCASE stands in for the case-insensitive MySQL collation.
+SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+                    email TEXT UNIQUE NOT NULL COLLATE NOCASE, password TEXT NOT NULL);
+CREATE TABLE admin_users (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL COLLATE NOCASE,
+                          password TEXT NOT NULL);
+CREATE TABLE price_alerts (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                           product_name TEXT NOT NULL COLLATE NOCASE, alert_price REAL NOT NULL,
+                           UNIQUE (user_id, product_name));
+CREATE TABLE historical_prices (product_name TEXT NOT NULL COLLATE NOCASE, date DATE NOT NULL, price REAL);
+CREATE INDEX idx_historical_prices_product_date ON historical_prices (product_name, date, price);
+CREATE INDEX idx_historical_prices_date ON historical_prices (date);
+CREATE TABLE historical_prices_monthly (product_name TEXT NOT NULL COLLATE NOCASE, month DATE NOT NULL, price REAL,
+                                        PRIMARY KEY (product_name, month));
+CREATE INDEX idx_historical_prices_monthly_month ON historical_prices_monthly (month);
+CREATE TABLE price_predictions (id INTEGER PRIMARY KEY AUTOINCREMENT, product_name TEXT NOT NULL COLLATE NOCASE,
+                                predicted_price REAL, prediction_date DATE);
+CREATE INDEX idx_price_predictions_product_date ON price_predictions (product_name, prediction_date);
+"""
+
+# Password used for every seeded account
+PASSWORD = "benchmark-password"
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+
+class FakeCursor:
+    def __init__(self, connection, dictionary=False, latency=0.0):
+        self._cursor = connection.cursor()
+        self.dictionary = dictionary
+        self.latency = latency
+
+    @staticmethod
+    def _sql(query):
+        query = query.replace("%s", "?")
+        # MySQL upsert -> SQLite upsert (the conflict target may be omitted since SQLite 3.35)
+        head, upsert, assignments = query.partition(" ON DUPLICATE KEY UPDATE ")
+        if upsert:
+            query = head + " ON CONFLICT DO UPDATE SET " + re.sub(r"VALUES\((\w+)\)", r"excluded.\1", assignments)
+        return query
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def execute(self, query, params=()):
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            self._cursor.execute(self._sql(query), tuple(params))
+        except sqlite3.Error as e:
+            raise mysql.connector.errors.DatabaseError(msg=str(e)) from e
+
+    def executemany(self, query, rows):
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            self._cursor.executemany(self._sql(query), [tuple(row) for row in rows])
+        except sqlite3.Error as e:
+            raise mysql.connector.errors.DatabaseError(msg=str(e)) from e
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeConnection:
+    def __init__(self, path, latency=0.0):
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, timeout=30)
+        self.latency = latency
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self._conn, dictionary, self.latency)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        if self.latency:
+            time.sleep(self.latency)
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        pass
+
+    def reconnect(self, attempts=1, delay=0):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+
+class FakeDatabase:
+    """A seeded SQLite file; connect() opens a FakeConnection to it (usable as ConnectionPool's `connect`)."""
+
+    def __init__(self, path=None, latency=0.0):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="agri-bench-", suffix=".sqlite3")
+            os.close(fd)
+        self.path = path
+        self.latency = latency
+
+    def connect(self, **connect_args):
+        return FakeConnection(self.path, self.latency)
+
+    def seed(self, csv_path="commodity_price.csv", users=50, alerts_per_user=3, password_method="pbkdf2:sha256:1000"):
+        """Creates the schema and loads prices, users (user<i>@example.com), one admin and price alerts."""
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        products = []
+        for melted in monthly_chunks(csv_path):
+            names, days, prices = expand_to_days(melted)
+            conn.executemany("INSERT INTO historical_prices (product_name, price, date) VALUES (?, ?, ?)",
+                             zip(names.tolist(), [None if p != p else round(p, 2) for p in prices.tolist()], days.tolist()))
+            names, months, prices = month_rows(melted)
+            conn.executemany("INSERT OR REPLACE INTO historical_prices_monthly (product_name, price, month) VALUES (?, ?, ?)",
+                             zip(names.tolist(), [None if p != p else round(p, 2) for p in prices.tolist()], months.tolist()))
+            products.extend(name for name in names.tolist() if name not in products)
+
+        hashed = generate_password_hash(PASSWORD, password_method)
+        conn.executemany("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+                         [(f"user{i}", f"user{i}@example.com", hashed) for i in range(users)])
+        conn.execute("INSERT INTO admin_users (email, password) VALUES (?, ?)", ("admin@example.com", hashed))
+        conn.executemany("INSERT INTO price_alerts (user_id, product_name, alert_price) VALUES (?, ?, ?)",
+                         [(user_id, products[(user_id + k) % len(products)], 20.0 + 10 * k)
+                          for user_id in range(1, users + 1) for k in range(alerts_per_user)])
+        conn.commit()
+        conn.close()
+        return self
+
+    def count(self, table):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            conn.close()
+
+    def remove(self):
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
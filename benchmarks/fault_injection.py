@@ -0,0 +1,184 @@
+"""Fault injection: the app against a MySQL server that stops answering, then recovers.
+
+A stand-in server accepts TCP connections but hangs, in one of two ways:
+    connect - never sends the handshake greeting (a wedged or overloaded server)
+    login   - greets and accepts the login, then never answers a command (a hung query)
+With short timeouts the script checks that the read endpoints keep answering 200 from the CSV
+fallback flagged stale (X-Data-Stale), that the first requests are bounded by the timeouts, that the
+circuit breaker opens and later requests fail fast, and that once the database answers again (the
+SQLite stand-in from benchmarks/fake_db.py) the breaker's probe closes it and fresh data is served:
+    python -m benchmarks.fault_injection [--modes connect login] [--timeout 1] [--reset 2]
+Exits with status 1 if any check fails.
+"""
+import argparse
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks.fake_db import FakeDatabase
+
+# Responses served without the database must be this fast once the breaker is open
+FAST_SECONDS = 0.05
+
+
+def packet(sequence, payload):
+    return struct.pack("<I", len(payload))[:3] + bytes([sequence]) + payload
+
+
+def greeting():
+    """A MySQL protocol v10 handshake offering mysql_native_password."""
+    capabilities = 0x1 | 0x8 | 0x200 | 0x2000 | 0x8000 | 0x80000
+    return (b"\x0a" + b"8.0.0-hang\0" + struct.pack("<I", 1) + b"abcdefgh" + b"\0"
+            + struct.pack("<H", capabilities & 0xFFFF) + bytes([255]) + struct.pack("<H", 2)
+            + struct.pack("<H", capabilities >> 16) + bytes([21]) + b"\0" * 10 + b"ijklmnopqrst\0"
+            + b"mysql_native_password\0")
+
+
+OK_PACKET = b"\x00\x00\x00\x02\x00\x00\x00"
+
+
+class HangingMySQL:
+    """Listens on a free local port and hangs every connection as `mode` says, until stop()."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(100)
+        self.port = self._sock.getsockname()[1]
+        self._connections = []
+        threading.Thread(target=self._serve, name=f"hanging-mysql-{mode}", daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self._connections.append(conn)
+            if self.mode == "login":
+                try:
+                    conn.sendall(packet(0, greeting()))
+                    conn.recv(4096)  # the login
+                    conn.sendall(packet(2, OK_PACKET))
+                except OSError:
+                    pass
+
+    def stop(self):
+        self._sock.close()
+        for conn in self._connections:
+            conn.close()
+
+
+class Checks:
+    def __init__(self):
+        self.failed = 0
+
+    def check(self, ok, message):
+        print(f"{'✅' if ok else '❌'} {message}")
+        self.failed += not ok
+
+
+def price_trend(client, day):
+    """A one-month /price_trend window starting `day` days into 2020, so no two calls share a cache key."""
+    start = date(2020, 1, 1) + timedelta(days=day)
+    started = time.perf_counter()
+    response = client.get("/price_trend", query_string={"product_name": "Rice", "from_date": start.isoformat(),
+                                                        "to_date": (start + timedelta(days=30)).isoformat()})
+    return response, time.perf_counter() - started
+
+
+def run_mode(app_module, mode, args, fake_db, checks, day):
+    print(f"--- {mode} ---")
+    server = HangingMySQL(mode)
+    # A fresh pool (and breaker) pointed at the hanging server, and a catalog that has never loaded
+    app_module.db_connect_args["port"] = server.port
+    app_module._db_pool = None
+    app_module.product_catalog.invalidate()
+    client = app_module.app.test_client()
+    bound = 2 * args.timeout + 1.0  # connect timeout, plus a read timeout in "login" mode, plus slack
+    try:
+        for attempt in range(args.failures + 3):
+            response, elapsed = price_trend(client, day)
+            day += 1
+            stale = response.headers.get("X-Data-Stale") == "true"
+            if attempt < args.failures:
+                checks.check(response.status_code == 200 and stale and elapsed < bound,
+                             f"/price_trend while down: {response.status_code}, stale={stale}, {elapsed:.2f}s (bound {bound:.1f}s)")
+            else:
+                checks.check(response.status_code == 200 and stale and elapsed < FAST_SECONDS,
+                             f"/price_trend with the breaker open: {response.status_code}, stale={stale}, {elapsed * 1000:.1f} ms")
+        stats = app_module._db_pool.stats()
+        checks.check(stats.get("circuit_state") == "open" and stats.get("circuit_trips") == 1,
+                     f"breaker open after {args.failures} failures: {stats.get('circuit_state')}, "
+                     f"{stats.get('circuit_trips')} trip(s), {stats.get('circuit_rejected')} rejected")
+
+        started = time.perf_counter()
+        response = client.get("/products")
+        elapsed = time.perf_counter() - started
+        body = response.get_json()
+        checks.check(response.status_code == 200 and body["stale"] and body["products"] and elapsed < FAST_SECONDS,
+                     f"/products while down: {response.status_code}, stale={body['stale']}, "
+                     f"{len(body['products'])} products from the CSV, {elapsed * 1000:.1f} ms")
+        metrics = client.get("/metrics").get_data(as_text=True)
+        checks.check("agri_db_circuit_open 1" in metrics, "/metrics reports agri_db_circuit_open 1")
+    finally:
+        server.stop()
+
+    # The database comes back: after reset_timeout the next request probes it and closes the breaker
+    app_module._db_pool.connect = fake_db.connect
+    time.sleep(max(args.reset, args.catalog_retry) + 0.1)
+    response, elapsed = price_trend(client, day)
+    day += 1
+    checks.check(response.status_code == 200 and "X-Data-Stale" not in response.headers and response.get_json(),
+                 f"/price_trend after recovery: {response.status_code}, fresh, {elapsed * 1000:.1f} ms")
+    checks.check(app_module._db_pool.stats()["circuit_state"] == "closed", "breaker closed by the recovery probe")
+    body = client.get("/products").get_json()
+    checks.check(not body["stale"], f"/products after recovery: stale={body['stale']}, {len(body['products'])} products")
+    return day
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=("connect", "login"), default=["connect", "login"])
+    parser.add_argument("--timeout", type=float, default=1.0, help="DB_CONNECT_TIMEOUT and DB_READ_TIMEOUT, in seconds.")
+    parser.add_argument("--failures", type=int, default=3, help="DB_BREAKER_FAILURES.")
+    parser.add_argument("--reset", type=float, default=2.0, help="DB_BREAKER_RESET_SECONDS.")
+    parser.add_argument("--catalog-retry", type=float, default=1.0, help="PRODUCT_CATALOG_RETRY_SECONDS.")
+    parser.add_argument("--csv", default="commodity_price.csv")
+    args = parser.parse_args()
+
+    # Timeouts are whole seconds for the C extension, so keep them integral
+    timeout = str(max(int(args.timeout), 1))
+    os.environ.update({
+        "DB_HOST": "127.0.0.1", "DB_USER": "agri", "DB_PASSWORD": "agri", "DB_NAME": "agri",
+        "DB_CONNECT_TIMEOUT": timeout, "DB_READ_TIMEOUT": timeout, "DB_WRITE_TIMEOUT": timeout,
+        "DB_BREAKER_FAILURES": str(args.failures), "DB_BREAKER_RESET_SECONDS": str(args.reset),
+        "PRODUCT_CATALOG_RETRY_SECONDS": str(args.catalog_retry),
+    })
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+    os.environ.setdefault("ALERT_SINK", "memory")
+    import app as app_module
+
+    app_module.prediction_writer.write_rows = lambda rows: None
+    fake_db = FakeDatabase().seed(args.csv)
+    checks = Checks()
+    try:
+        day = 0
+        for mode in args.modes:
+            day = run_mode(app_module, mode, args, fake_db, checks, day)
+    finally:
+        fake_db.remove()
+    if checks.failed:
+        print(f"❌ {checks.failed} check(s) failed.")
+        return 1
+    print("✅ All fault injection checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
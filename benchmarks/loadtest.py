@@ -0,0 +1,235 @@
+"""End-to-end load test: drives the real Flask app endpoint by endpoint and reports latency percentiles.
+
+By default the app is imported in-process and served through its test client, backed by an SQLite
+stand-in for MySQL (benchmarks/fake_db.py) seeded from commodity_price.csv:
+    python -m benchmarks.loadtest [--requests 500] [--concurrency 4] [--output loadtest.json]
+With --url the same scenarios are sent over HTTP to a running server (e.g. a local gunicorn); its
+database must contain the login given by --email/--password. --db-latency-ms adds a simulated
+network round trip to every statement of the in-process stand-in.
+For each endpoint the report holds throughput, p50/p95/p99 latency, error count, peak Python
+allocation per request and process RSS; compare two runs with python -m benchmarks.report.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+from benchmarks.fake_db import PASSWORD, FakeDatabase
+from benchmarks.report import percentiles, write_report
+
+PRODUCTS = ["Rice", "Wheat", "Atta (Wheat)", "Tur/Arhar Dal", "Sugar", "Milk", "Onion", "Tomato", "Potato", "Gur"]
+
+
+class InProcessClient:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post_json(self, path, body):
+        return self.client.post(path, json=body).status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def _send(self, request):
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def get(self, path):
+        return self._send(urllib.request.Request(self.base_url + path))
+
+    def post_json(self, path, body):
+        return self._send(urllib.request.Request(self.base_url + path, data=json.dumps(body).encode(),
+                                                 headers={"Content-Type": "application/json"}, method="POST"))
+
+
+def random_window(rng, days):
+    start = date(2014, 1, 1) + timedelta(days=rng.randrange(0, 3900 - days))
+    return start.isoformat(), (start + timedelta(days=days)).isoformat()
+
+
+def future_date(rng):
+    return (date.today() + timedelta(days=rng.randrange(1, 700))).isoformat()
+
+
+def trend_path(rng, days, extra=""):
+    from_date, to_date = random_window(rng, days)
+    return f"/price_trend?product_name={urllib.parse.quote(rng.choice(PRODUCTS))}&from_date={from_date}&to_date={to_date}{extra}"
+
+
+# Endpoint scenarios: name -> (needs login, request function)
+SCENARIOS = {
+    "GET /products": (False, lambda c, rng: c.get("/products")),
+    "GET /price_trend 1y daily": (False, lambda c, rng: c.get(trend_path(rng, 365))),
+    "GET /price_trend 10y daily": (False, lambda c, rng: c.get(trend_path(rng, 3650))),
+    "GET /price_trend 10y monthly columnar": (False, lambda c, rng: c.get(trend_path(rng, 3650, "&resolution=month&format=columnar"))),
+    "GET /predict_price": (True, lambda c, rng: c.get("/predict_price")),
+    "GET /dashboard": (True, lambda c, rng: c.get("/dashboard")),
+    "POST /predict": (True, lambda c, rng: c.post_json("/predict", {"product": rng.choice(PRODUCTS), "date": future_date(rng)})),
+    "POST /predict/batch x100": (True, lambda c, rng: c.post_json("/predict/batch", {
+        "items": [{"product": rng.choice(PRODUCTS), "date": future_date(rng)} for _ in range(100)]})),
+    "POST /login": (False, None),  # filled in by main() with the configured credentials
+}
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_scenario(make_client, send, needs_login, login, requests, concurrency, warmup, seed):
+    clients = [make_client() for _ in range(concurrency)]
+    if needs_login:
+        for client in clients:
+            login(client)
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        send(clients[0], rng)
+
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    per_thread = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(client, count, thread_seed):
+        thread_rng = random.Random(thread_seed)
+        local, failed = [], 0
+        for _ in range(count):
+            started = time.perf_counter()
+            status = send(client, thread_rng)
+            local.append(time.perf_counter() - started)
+            failed += status >= 400
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(clients[i], per_thread[i], seed * 1000 + i)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, errors[0], elapsed, clients[0], rng
+
+
+def peak_allocation_kb(client, send, rng, samples):
+    """Largest Python allocation peak of a single request, over a few sequential requests."""
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            send(client, rng)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def load_app(fake_db):
+    """Imports app.py with its connection pool pointed at the SQLite stand-in."""
+    import app as app_module
+    from db_pool import ConnectionPool, pool_settings_from_env
+
+    app_module._db_pool = ConnectionPool({}, connect=fake_db.connect, **pool_settings_from_env())
+    app_module._db_pool_pid = os.getpid()
+    return app_module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per endpoint.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--memory-samples", type=int, default=10)
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    parser.add_argument("--url", help="Drive a running server over HTTP instead of the in-process app.")
+    parser.add_argument("--email", default="user0@example.com")
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--csv", default="commodity_price.csv")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Simulated round trip per statement (in-process only).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="loadtest.json")
+    args = parser.parse_args()
+
+    fake_db = None
+    if args.url:
+        def make_client():
+            return HttpClient(args.url)
+    else:
+        # Settings for the in-process app: quiet logs, cheap seeded password hashes, isolated data version file
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+        os.environ.setdefault("ALERT_SINK", "memory")
+        os.environ.setdefault("DATA_VERSION_FILE", os.path.join(tempfile.gettempdir(), f"agri-bench-version-{os.getpid()}.json"))
+        started = time.perf_counter()
+        fake_db = FakeDatabase(latency=args.db_latency_ms / 1000).seed(args.csv, password_method=os.environ["PASSWORD_HASH_METHOD"])
+        print(f"Seeded SQLite stand-in in {time.perf_counter() - started:.2f}s "
+              f"({fake_db.count('historical_prices')} historical_prices rows)", file=sys.stderr)
+        app_module = load_app(fake_db)
+
+        def make_client():
+            return InProcessClient(app_module.app)
+
+    credentials = {"email": args.email, "password": args.password}
+
+    def login(client):
+        status = client.post_json("/login", credentials)
+        if status != 200:
+            raise SystemExit(f"Login as {args.email} failed with HTTP {status}.")
+
+    scenarios = dict(SCENARIOS)
+    scenarios["POST /login"] = (False, lambda c, rng: c.post_json("/login", credentials))
+
+    results = {}
+    try:
+        for index, name in enumerate(args.endpoints):
+            needs_login, send = scenarios[name]
+            latencies, errors, elapsed, client, rng = run_scenario(
+                make_client, send, needs_login, login, args.requests, args.concurrency, args.warmup, args.seed + index)
+            result = {"requests": len(latencies), "errors": errors, "throughput_rps": round(len(latencies) / elapsed, 2)}
+            result.update(percentiles(latencies))
+            if not args.url:
+                result["peak_alloc_kb_per_request"] = peak_allocation_kb(client, send, rng, args.memory_samples)
+                result["rss_mb"] = rss_mb()
+            results[name] = result
+            print(f"{name:40s} {result['throughput_rps']:9.1f} req/s  p50 {result['p50_ms']:8.2f} ms  "
+                  f"p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  errors {errors}")
+    finally:
+        if fake_db is not None:
+            fake_db.remove()
+
+    write_report(args.output, "loadtest", results, {
+        "requests": args.requests, "concurrency": args.concurrency, "target": args.url or "in-process (SQLite stand-in)",
+        "db_latency_ms": None if args.url else args.db_latency_ms})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Microbenchmarks: the prediction path, /price_trend serialization, model.py training and price loading.
+
+Run from the repository root:
+    python -m benchmarks.micro [--output micro.json] [--only predict trend training loading]
+Each case reports the best-of-5 time per call; compare two runs with python -m benchmarks.report.
+"""
+import argparse
+import json
+import os
+import tempfile
+import timeit
+from datetime import date, timedelta
+from decimal import Decimal
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import model as training
+from benchmarks.bench_predict import legacy_predict
+from benchmarks.report import write_report
+from forecasting import ForecastEngine
+from predictor import PredictionTable
+from price_store import PriceMatrix, build as build_price_store, open_store
+from price_index import downsample, series_to_columns, series_to_records
+
+
+def best_per_call(fn, number, repeat=5):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def record(results, name, fn, number):
+    seconds = best_per_call(fn, number)
+    results[name] = {"us_per_call": round(seconds * 1e6, 3), "calls": number}
+    print(f"{name:40s} {seconds * 1e6:14.2f} µs/call")
+
+
+def bench_predict(results, models, df, iterations):
+    prices = PriceMatrix.from_frame(df)
+    table = PredictionTable.build(models, prices)
+    engine = ForecastEngine.build(table, prices, 60)
+    products = [name for name in table.names if table.in_csv[table.index[name]]]
+    product = products[0]
+    target = date.today() + timedelta(days=200)
+    pairs_products = [products[i % len(products)] for i in range(1000)]
+    pairs_dates = [target + timedelta(days=i % 365) for i in range(1000)]
+
+    record(results, "predict/legacy_dataframe_sklearn", lambda: legacy_predict(models, df, product), iterations)
+    record(results, "predict/prediction_table", lambda: table.predict(product), iterations * 10)
+    record(results, "predict/forecast_one", lambda: engine.forecast(product, target), iterations * 10)
+    record(results, "predict/forecast_many_1000", lambda: engine.forecast_many(pairs_products, pairs_dates), max(iterations // 10, 1))
+
+
+def bench_trend(results, iterations):
+    # A 10-year daily range, as MySQL returns it (date, Decimal) and as the arrays the app now works on
+    days = 3650
+    start = date(2014, 1, 1)
+    rows = [(start + timedelta(days=i), Decimal(f"{20 + (i % 97) / 4:.2f}")) for i in range(days)]
+    ordinals = np.array([row[0].toordinal() for row in rows], dtype=np.int32)
+    prices = np.array([float(row[1]) for row in rows], dtype=np.float64)
+    number = max(iterations // 20, 1)
+
+    record(results, "trend/legacy_dict_rows", lambda: [{"date": r[0].strftime('%Y-%m-%d'), "price": float(r[1])} for r in rows], number)
+    record(results, "trend/records", lambda: series_to_records(ordinals, prices), number)
+    record(results, "trend/columnar", lambda: series_to_columns(ordinals, prices), number)
+    record(results, "trend/legacy_dict_rows_json", lambda: json.dumps([{"date": r[0].strftime('%Y-%m-%d'), "price": float(r[1])} for r in rows]), number)
+    record(results, "trend/columnar_json", lambda: json.dumps(series_to_columns(ordinals, prices)), number)
+    record(results, "trend/month_mean_columnar_json", lambda: json.dumps(series_to_columns(*downsample(ordinals, prices, "month", "mean"))), number)
+
+
+def legacy_training(prices):
+    """One sklearn fit per commodity, the way model.py trained before the batched solve."""
+    names, matrix = prices.names, prices.values()
+    return {name: training.fit_one(training.commodity_pairs(names, matrix, name)) for name in dict.fromkeys(names)}
+
+
+def bench_training(results, df):
+    prices = PriceMatrix.from_frame(df)
+    record(results, "training/legacy_per_commodity_sklearn", lambda: legacy_training(prices), 3)
+    record(results, "training/batched_solve", lambda: training.train(prices, workers=1), 3)
+
+
+def bench_loading(results, csv_path):
+    """Getting the commodity prices into a worker: parsing the CSV with pandas vs opening the price store."""
+    with tempfile.TemporaryDirectory() as directory:
+        store_path = os.path.join(directory, "prices.bin")
+        build_price_store(csv_path, store_path)
+        record(results, "loading/pandas_read_csv", lambda: PriceMatrix.from_frame(pd.read_csv(csv_path)), 20)
+        record(results, "loading/open_price_store", lambda: open_store(store_path), 200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--models", default="models.pkl")
+    parser.add_argument("--csv", default="commodity_price.csv")
+    parser.add_argument("--only", nargs="+", choices=["predict", "trend", "training", "loading"],
+                        default=["predict", "trend", "training", "loading"])
+    parser.add_argument("--output", default="micro.json")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    df.columns = df.columns.str.strip()
+    results = {}
+    if "predict" in args.only:
+        bench_predict(results, joblib.load(args.models), df, args.iterations)
+    if "trend" in args.only:
+        bench_trend(results, args.iterations)
+    if "training" in args.only:
+        bench_training(results, df)
+    if "loading" in args.only:
+        bench_loading(results, args.csv)
+    write_report(args.output, "micro", results, {"iterations": args.iterations, "csv": args.csv})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Machine-readable benchmark reports, so runs on different commits can be compared.
+
+    python -m benchmarks.report old.json new.json
+prints every metric that appears in both reports with its relative change.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+def percentiles(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    if len(ms) == 0:
+        return {}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"mean_ms": round(float(ms.mean()), 4), "p50_ms": round(float(p50), 4),
+            "p95_ms": round(float(p95), 4), "p99_ms": round(float(p99), 4), "max_ms": round(float(ms.max()), 4)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path, kind, results, settings=None):
+    """Writes {"meta": ..., "results": ...} as JSON and returns the report."""
+    report = {
+        "meta": {
+            "kind": kind,
+            "revision": git_revision(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "settings": settings or {},
+        },
+        "results": results,
+    }
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+    print(f"Report written to '{path}'")
+    return report
+
+
+def compare(old, new):
+    """Yields (name, metric, old value, new value) for numeric metrics present in both reports."""
+    for name, new_metrics in new["results"].items():
+        old_metrics = old["results"].get(name, {})
+        for metric, new_value in new_metrics.items():
+            old_value = old_metrics.get(metric)
+            if isinstance(new_value, (int, float)) and isinstance(old_value, (int, float)):
+                yield name, metric, old_value, new_value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+    with open(args.old) as file:
+        old = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+    print(f"{old['meta'].get('revision')} -> {new['meta'].get('revision')}")
+    for name, metric, old_value, new_value in compare(old, new):
+        change = f"{(new_value - old_value) / old_value * 100:+8.1f}%" if old_value else "       -"
+        print(f"{name:40s} {metric:16s} {old_value:14.4f} {new_value:14.4f} {change}")
+
+
+if __name__ == "__main__":
+    main()
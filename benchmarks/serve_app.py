@@ -0,0 +1,15 @@
+"""WSGI module benchmarks/serving.py runs under gunicorn: app.py backed by a seeded SQLite stand-in.
+
+BENCH_DB is the seeded database file and BENCH_DB_LATENCY_MS the simulated MySQL round trip per
+statement. With BENCH_SERVING=async app_async.py is imported first, so gevent patches the standard
+library before anything else is loaded, exactly as under Procfile.async.
+"""
+import os
+
+if os.environ.get("BENCH_SERVING") == "async":
+    import app_async
+
+from benchmarks.fake_db import FakeDatabase
+from benchmarks.loadtest import load_app
+
+app = load_app(FakeDatabase(os.environ["BENCH_DB"], latency=float(os.environ.get("BENCH_DB_LATENCY_MS", 0)) / 1000)).app
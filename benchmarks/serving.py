@@ -0,0 +1,105 @@
+"""Sync vs async serving under the same load test, over HTTP against real gunicorn workers.
+
+Seeds one SQLite stand-in (benchmarks/fake_db.py) and, for each mode, starts gunicorn on it with
+--db-latency-ms of simulated MySQL round trip per statement, then runs benchmarks/loadtest.py against
+it with the same endpoints, requests and concurrency:
+    python -m benchmarks.serving [--modes sync async] [--workers 2] [--concurrency 50] [--output serving.json]
+sync is Procfile's `gunicorn app:app`, async is Procfile.async's gevent workers on app_async:app.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.fake_db import PASSWORD, FakeDatabase
+from benchmarks.report import write_report
+
+MODES = {
+    "sync": [],
+    "async": ["--worker-class", "gevent"],
+}
+
+# Routes that wait on the database on every request, plus /predict (whose insert is queued) for reference
+IO_ENDPOINTS = ["GET /price_trend 1y daily", "GET /dashboard", "POST /predict"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with code {process.returncode} before serving.")
+        try:
+            with urllib.request.urlopen(url + "/products", timeout=5) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"gunicorn did not answer on {url} within {timeout}s.")
+
+
+def run_mode(mode, args, db_path):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, BENCH_SERVING=mode, BENCH_DB=db_path, BENCH_DB_LATENCY_MS=str(args.db_latency_ms),
+               LOG_LEVEL="WARNING", ALERT_SINK="memory", PASSWORD_HASH_METHOD="pbkdf2:sha256:1000",
+               DATA_VERSION_FILE=os.path.join(tempfile.gettempdir(), f"agri-bench-version-{os.getpid()}-{mode}.json"))
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}",
+                               "--workers", str(args.workers), *MODES[mode], "benchmarks.serve_app:app"], env=env)
+    output = os.path.join(tempfile.gettempdir(), f"agri-bench-serving-{os.getpid()}-{mode}.json")
+    try:
+        wait_until_ready(url, server)
+        subprocess.run([sys.executable, "-m", "benchmarks.loadtest", "--url", url, "--endpoints", *args.endpoints,
+                        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                        "--warmup", str(args.warmup), "--password", PASSWORD, "--output", output], check=True)
+        with open(output) as file:
+            return json.load(file)["results"]
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+        if os.path.exists(output):
+            os.remove(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["sync", "async"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per endpoint.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0, help="Simulated round trip per statement.")
+    parser.add_argument("--endpoints", nargs="+", default=IO_ENDPOINTS)
+    parser.add_argument("--csv", default="commodity_price.csv")
+    parser.add_argument("--output", default="serving.json")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    fake_db = FakeDatabase().seed(args.csv)
+    print(f"Seeded SQLite stand-in in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    results = {}
+    try:
+        for mode in args.modes:
+            print(f"--- {mode} ---")
+            for name, result in run_mode(mode, args, fake_db.path).items():
+                results[f"{mode} {name}"] = result
+    finally:
+        fake_db.remove()
+
+    write_report(args.output, "serving", results, {
+        "workers": args.workers, "requests": args.requests, "concurrency": args.concurrency,
+        "db_latency_ms": args.db_latency_ms, "cpus": os.cpu_count()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Measures worker startup: time to import app.py, time to the first prediction, and what got imported.
+
+Each mode runs in a fresh interpreter, as a new gunicorn worker would:
+    python -m benchmarks.startup [--modes eager-npz eager-pkl lazy-npz] [--runs 3] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.report import write_report
+
+MODES = {
+    "eager-pkl": {"ARTIFACT_LOADING": "eager", "MODELS_FILE": "models.pkl"},
+    "eager-npz": {"ARTIFACT_LOADING": "eager", "MODELS_FILE": "models.npz"},
+    "lazy-npz": {"ARTIFACT_LOADING": "lazy", "MODELS_FILE": "models.npz"},
+}
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def child():
+    """Runs inside the fresh interpreter and prints one JSON measurement."""
+    started = time.perf_counter()
+    import app
+    imported = time.perf_counter() - started
+    heavy_after_import = sorted(name for name in ("pandas", "sklearn", "scipy", "joblib") if name in sys.modules)
+    rss_after_import = rss_mb()
+
+    app.prediction_writer.write_rows = lambda rows: None  # no database here; discard queued rows
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 1
+    started = time.perf_counter()
+    status = client.post("/predict", json={"product": "Rice", "date": "2027-01-15"}).status_code
+    first_prediction = time.perf_counter() - started
+
+    print(json.dumps({
+        "import_s": imported,
+        "first_predict_s": first_prediction,
+        "first_predict_status": status,
+        "rss_after_import_mb": rss_after_import,
+        "rss_after_first_predict_mb": rss_mb(),
+        "heavy_modules_after_import": heavy_after_import,
+        "heavy_modules_after_first_predict": sorted(name for name in ("pandas", "sklearn", "scipy", "joblib") if name in sys.modules),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=sorted(MODES))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", default="startup.json")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child()
+
+    results = {}
+    for mode in args.modes:
+        # Point the database at a closed local port: startup must not depend on it.
+        env = dict(os.environ, LOG_LEVEL="WARNING", DB_HOST="127.0.0.1", DB_PORT="1", **MODES[mode])
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child"], env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        best = min(runs, key=lambda run: run["import_s"])
+        results[mode] = {
+            "import_ms": round(best["import_s"] * 1000, 1),
+            "first_predict_ms": round(min(run["first_predict_s"] for run in runs) * 1000, 1),
+            "first_predict_status": best["first_predict_status"],
+            "rss_after_import_mb": round(best["rss_after_import_mb"], 1),
+            "rss_after_first_predict_mb": round(best["rss_after_first_predict_mb"], 1),
+            "heavy_modules_after_import": best["heavy_modules_after_import"],
+            "heavy_modules_after_first_predict": best["heavy_modules_after_first_predict"],
+        }
+        row = results[mode]
+        print(f"{mode:10s} import {row['import_ms']:8.1f} ms  first /predict {row['first_predict_ms']:8.1f} ms  "
+              f"RSS {row['rss_after_import_mb']:6.1f} MB  loaded at import: {', '.join(row['heavy_modules_after_import']) or '-'}")
+    write_report(args.output, "startup", results, {"runs": args.runs})
+
+
+if __name__ == "__main__":
+    main()
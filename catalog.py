@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from price_index import product_key
+
+
+class CatalogSnapshot:
+    """An immutable view of the product catalog at one data version (`stale` if the database could not be read)."""
+
+    __slots__ = ("products", "predictable", "version", "etag", "stale")
+
+    def __init__(self, products, predictable, version, stale=False):
+        self.products = products
+        self.predictable = predictable
+        self.version = version
+        self.stale = stale
+        body = json.dumps([products, predictable, stale], separators=(",", ":"))
+        self.etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+class ProductCatalog:
+    """In-process cache of the product list, replacing a SELECT DISTINCT per page render.
+
+    `load_products` returns the product names stored in the database and `model_names` the keys
+    of the loaded models. The cached snapshot is rebuilt once it is older than `ttl` seconds, when
+    `version()` (the shared data version) changes, or after invalidate(). If the database cannot
+    be reached, the previous snapshot keeps being served (or, before the first successful load,
+    one built from `fallback_products()`, e.g. the CSV's products), flagged stale, and the database
+    is tried again after `retry_interval` seconds.
+    """
+
+    def __init__(self, load_products, model_names, ttl=300.0, version=lambda: None, fallback_products=None,
+                 retry_interval=10.0):
+        self.load_products = load_products
+        self.model_names = model_names
+        self.ttl = ttl
+        self.version = version
+        self.fallback_products = fallback_products
+        self.retry_interval = retry_interval
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def _build(self, version, load_products=None):
+        products = sorted((load_products or self.load_products)())
+        db_keys = {product_key(name) for name in products}
+        # Offer predictions only for products that have both stored prices and a trained model,
+        # spelled as the model key because /predict looks models up by exact name.
+        predictable = sorted(name for name in self.model_names() if product_key(name) in db_keys)
+        return CatalogSnapshot(products, predictable, version, stale=load_products is not None)
+
+    def snapshot(self):
+        version = self.version()
+        snapshot = self._snapshot
+        fresh = (snapshot is not None and snapshot.version == version
+                 and time.monotonic() - self._loaded_at < self.ttl)
+        if fresh:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not snapshot and self._snapshot is not None:
+                return self._snapshot  # another thread rebuilt it while we waited
+            try:
+                self._snapshot = self._build(version)
+                self._loaded_at = time.monotonic()
+                logging.info("✅ Product catalog loaded: %d products, %d predictable.",
+                             len(self._snapshot.products), len(self._snapshot.predictable))
+            except Exception as e:
+                logging.error("❌ Product catalog reload failed: %s", e)
+                previous = self._snapshot
+                if previous is not None:
+                    self._snapshot = CatalogSnapshot(previous.products, previous.predictable, version, stale=True)
+                elif self.fallback_products is not None:
+                    try:
+                        self._snapshot = self._build(version, self.fallback_products)
+                    except Exception as fallback_error:
+                        logging.error("❌ Product catalog fallback failed: %s", fallback_error)
+                if self._snapshot is None:
+                    return CatalogSnapshot([], [], version, stale=True)
+                # Serve the stale snapshot until the next attempt, retry_interval seconds from now
+                self._loaded_at = time.monotonic() - max(self.ttl - self.retry_interval, 0.0)
+            return self._snapshot
+
+    def products(self):
+        return self.snapshot().products
+
+    def predictable(self):
+        return self.snapshot().predictable
@@ -0,0 +1,66 @@
+"""Shared data version counters, bumped by the bulk loader and model training.
+
+The counters live in a small JSON file (DATA_VERSION_FILE, default data_version.json) so every
+gunicorn worker, and every separate script, sees the same versions. Caches key their entries
+on these versions and drop them as soon as a counter moves.
+"""
+import json
+import os
+import tempfile
+import threading
+
+
+def version_file():
+    return os.environ.get("DATA_VERSION_FILE", "data_version.json")
+
+
+def read_versions(path=None):
+    """Returns the current counters, e.g. {"prices": 3, "models": 1} ({} if never bumped)."""
+    try:
+        with open(path or version_file()) as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def bump(kind, path=None):
+    """Increments one counter ("prices" or "models") and returns its new value."""
+    path = path or version_file()
+    versions = read_versions(path)
+    versions[kind] = versions.get(kind, 0) + 1
+    # Write to a temporary file and rename, so readers never see a half-written file.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".data_version.")
+    with os.fdopen(fd, "w") as file:
+        json.dump(versions, file)
+    os.replace(tmp_path, path)
+    return versions[kind]
+
+
+class VersionWatcher:
+    """Cheap repeated reads of the version file: it is only re-parsed when its mtime changes."""
+
+    def __init__(self, path=None):
+        self.path = path or version_file()
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._versions = {}
+
+    def current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            with self._lock:
+                self._versions = read_versions(self.path) if mtime is not None else {}
+                self._mtime = mtime
+        return self._versions
+
+    def get(self, kind):
+        return self.current().get(kind, 0)
+
+    def modified_at(self):
+        """Unix time of the last version bump, or None if the file does not exist yet."""
+        self.current()
+        return self._mtime / 1e9 if self._mtime is not None else None
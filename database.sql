@@ -1,3 +1,5 @@
+-- Superseded by the versioned migrations in migrations/ (python migrate.py), which create every table
+-- app.py queries with its indexes and bring tables created from this file up to date.
 CREATE DATABASE IF NOT EXISTS price_prediction_db;
 USE price_prediction_db;
 
@@ -17,3 +19,12 @@ CREATE TABLE IF NOT EXISTS price_alerts (
     price_threshold FLOAT NOT NULL,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
+
+-- Monthly Historical Prices Table (HISTORICAL_PRICES_STORAGE=monthly)
+-- One row per product per month, dated the 1st; the app expands it to daily points per request.
+CREATE TABLE IF NOT EXISTS historical_prices_monthly (
+    product_name VARCHAR(100) NOT NULL,
+    month DATE NOT NULL,
+    price DECIMAL(10, 2),
+    PRIMARY KEY (product_name, month)
+);
@@ -0,0 +1,286 @@
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the pool timeout."""
+
+
+class CircuitOpen(Exception):
+    """Raised by checkout() while the circuit breaker is open, without trying the database."""
+
+
+# Errors meaning the database could not be reached or did not answer in time (as opposed to a bad query)
+UNAVAILABLE_ERRORS = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError,
+                      mysql.connector.errors.ConnectionTimeoutError, mysql.connector.errors.ReadTimeoutError,
+                      mysql.connector.errors.WriteTimeoutError, PoolTimeout, CircuitOpen)
+
+
+class CircuitBreaker:
+    """Stops connection attempts to a database that keeps failing, and probes it for recovery.
+
+    After `failure_threshold` consecutive failures the breaker opens and allow() returns False,
+    so callers fail fast instead of each waiting out the connect and read timeouts. Once
+    `reset_timeout` seconds have passed it lets one probe through (half-open): a success closes
+    the breaker, a failure opens it for another `reset_timeout`. A probe that never reports back
+    is replaced by a new one after `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self._probe_started is not None else "open"
+
+    def allow(self):
+        if self._opened_at is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self._opened_at is None:
+                return True
+            probe_due = now - (self._probe_started if self._probe_started is not None else self._opened_at) >= self.reset_timeout
+            if probe_due:
+                self._probe_started = now
+                logging.info("ℹ️ Circuit breaker half-open, probing the database.")
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        if self._opened_at is None and self._failures == 0:
+            return
+        with self._lock:
+            if self._opened_at is not None:
+                logging.info("✅ Database reachable again, circuit breaker closed.")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None or (self._opened_at is None and self._failures >= self.failure_threshold):
+                if self._opened_at is None:
+                    self.trips += 1
+                    logging.error("❌ Circuit breaker open after %d database failures; failing fast for %.0fs.",
+                                  self._failures, self.reset_timeout)
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+    def stats(self):
+        return {"circuit_state": self.state, "circuit_trips": self.trips, "circuit_rejected": self.rejected}
+
+
+class ConnectionPool:
+    """A small, thread-safe pool of reusable MySQL connections.
+
+    Up to `size` idle connections are kept open between requests. Under load the pool
+    opens up to `max_overflow` extra connections, which are closed again on check-in
+    instead of being kept. Once `size + max_overflow` connections are in use, callers
+    wait up to `timeout` seconds for one to be returned before PoolTimeout is raised.
+    Every connection is pinged on checkout and reconnected if the server dropped it.
+    `connect` opens one connection from `connect_args` (mysql.connector.connect by default).
+    With a `breaker` (CircuitBreaker), failures to open or ping a connection count towards tripping
+    it, and while it is open checkout() raises CircuitOpen immediately.
+    """
+
+    def __init__(self, connect_args, size=5, max_overflow=5, timeout=10.0, connect=None, breaker=None):
+        self.connect_args = dict(connect_args)
+        self.connect = connect or mysql.connector.connect
+        self.breaker = breaker
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        # LIFO so the most recently used (warmest) connection is handed out first.
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "reconnects": 0,
+            "connections_opened": 0,
+            "connections_closed": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _open_connection(self):
+        try:
+            conn = self.connect(**self.connect_args)
+        except Exception:
+            with self._lock:
+                self._open -= 1
+            raise
+        self._count("connections_opened")
+        logging.info("✅ Database connection opened for pool (%d open).", self._open)
+        return conn
+
+    def _close_connection(self, conn):
+        with self._lock:
+            self._open -= 1
+            self._counters["connections_closed"] += 1
+        try:
+            conn.close()
+        except Exception as e:
+            logging.debug("ℹ️ Ignoring error while closing pooled connection: %s", e)
+
+    def _ensure_alive(self, conn):
+        """Pings a connection and reconnects it if the server has dropped it."""
+        try:
+            conn.ping(reconnect=False)
+        except mysql.connector.Error:
+            self._count("reconnects")
+            logging.warning("⚠ Pooled connection was stale, reconnecting.")
+            conn.reconnect(attempts=1, delay=0)
+        return conn
+
+    def checkout(self):
+        """Returns a live connection, opening a new one if the pool has capacity."""
+        if self.breaker is None:
+            return self._checkout()
+        if not self.breaker.allow():
+            raise CircuitOpen("Database circuit breaker is open.")
+        try:
+            conn = self._checkout()
+        except PoolTimeout:
+            raise  # the pool is busy, which says nothing about the database
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return conn
+
+    def record_failure(self):
+        """Counts a checked-out connection that timed out or dropped mid-query towards tripping the breaker."""
+        if self.breaker is not None:
+            self.breaker.record_failure()
+
+    def _checkout(self):
+        self._count("checkouts")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                can_open = self._open < self.size + self.max_overflow
+                if can_open:
+                    self._open += 1
+            if can_open:
+                return self._open_connection()
+            self._count("waits")
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                self._count("timeouts")
+                raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+        try:
+            return self._ensure_alive(conn)
+        except Exception:
+            self._close_connection(conn)
+            raise
+
+    def checkin(self, conn):
+        """Returns a connection to the pool, or closes it if it is overflow or broken."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._close_connection(conn)
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._close_connection(conn)
+
+    @contextmanager
+    def connection(self):
+        """Checks a connection out for the duration of a `with` block."""
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def stats(self):
+        """Returns the pool counters plus current open/idle connection gauges."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["open"] = self._open
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["open"] - stats["idle"]
+        stats["size"] = self.size
+        stats["max_overflow"] = self.max_overflow
+        if self.breaker is not None:
+            stats.update(self.breaker.stats())
+        return stats
+
+    def dispose(self):
+        """Closes every idle connection. Connections currently checked out are unaffected."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_connection(conn)
+
+
+def connect_args_from_env(query_timeouts=True):
+    """MySQL connection settings from DB_HOST, DB_USER, DB_PASSWORD, DB_NAME and DB_PORT.
+
+    Connecting gives up after DB_CONNECT_TIMEOUT seconds (default 5). With `query_timeouts`, every
+    read and write on the connection gives up after DB_READ_TIMEOUT / DB_WRITE_TIMEOUT seconds
+    (default 10); scripts running long statements (migrations, bulk loads) pass False.
+    """
+    # These should be set in your Render service environment variables.
+    # The hardcoded values are for local testing/defaults if env vars are not set.
+    args = {
+        "host": os.environ.get("DB_HOST", "mysql-fc0e3b0-sadhasivamkanaga15-f154.l.aivencloud.com"),
+        "user": os.environ.get("DB_USER", "avnadmin"),
+        "password": os.environ.get("DB_PASSWORD", "AVNS_P2X1P7jH__WuLtv9YSs"), # Replace with your actual Aiven password!
+        "database": os.environ.get("DB_NAME", "defaultdb"),
+        "port": int(os.environ.get("DB_PORT", 21436)),
+        # DB_USE_PURE=1 selects the pure-Python protocol implementation, whose sockets gevent can make
+        # cooperative (app_async.py sets it); the C extension blocks the whole worker while it waits.
+        "use_pure": os.environ.get("DB_USE_PURE", "0") == "1",
+        "connection_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 5)),
+        # "ssl_ca": 'path/to/your/aiven_ca.pem', # Uncomment and provide path if Aiven requires SSL CA file
+    }
+    if query_timeouts:
+        args["read_timeout"] = int(os.environ.get("DB_READ_TIMEOUT", 10))
+        args["write_timeout"] = int(os.environ.get("DB_WRITE_TIMEOUT", 10))
+    return args
+
+
+def pool_settings_from_env():
+    """Reads pool sizing from DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW and DB_POOL_TIMEOUT, and the circuit breaker
+    from DB_BREAKER_FAILURES (consecutive failures that trip it, default 3; 0 disables it) and
+    DB_BREAKER_RESET_SECONDS (time before probing the database again, default 15)."""
+    failures = int(os.environ.get("DB_BREAKER_FAILURES", 3))
+    return {
+        "size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_POOL_MAX_OVERFLOW", 5)),
+        "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        "breaker": CircuitBreaker(failures, float(os.environ.get("DB_BREAKER_RESET_SECONDS", 15))) if failures > 0 else None,
+    }
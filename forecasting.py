@@ -0,0 +1,117 @@
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from predictor import month_columns
+
+
+def month_index(year, month):
+    """Absolute month number (year * 12 + month - 1), so consecutive months differ by 1."""
+    return year * 12 + month - 1
+
+
+def month_label(index):
+    """Formats an absolute month number as 'YYYY-MM'."""
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def monthly_matrix(df):
+    """Reshapes the commodity CSV into (names, months, commodity x month float64 matrix).
+
+    `months` holds the absolute month number of each matrix column in ascending order; missing or
+    non-numeric prices are NaN.
+    """
+    import pandas as pd
+
+    parsed = []
+    for col in month_columns(df.columns):
+        try:
+            when = datetime.strptime(col.strip(), "%b-%y")
+        except ValueError:
+            logging.warning("⚠ Skipping column '%s': expected a 'Mon-YY' month.", col)
+            continue
+        parsed.append((month_index(when.year, when.month), col))
+    parsed.sort()
+
+    names = [str(name) for name in df["Commodities"]]
+    months = np.array([index for index, _ in parsed], dtype=np.int32)
+    matrix = df[[col for _, col in parsed]].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    return names, months, matrix
+
+
+def last_observed(matrix):
+    """Returns (column position, value) of each row's last non-NaN entry (-1, NaN if none)."""
+    observed = ~np.isnan(matrix)
+    last = np.where(observed.any(axis=1), matrix.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1), -1)
+    values = np.where(last >= 0, matrix[np.arange(len(matrix)), np.maximum(last, 0)], np.nan)
+    return last, values
+
+
+class ForecastEngine:
+    """Precomputed multi-step price forecasts, one curve per product out to `horizon` months.
+
+    Each curve is built recursively from the product's last observed monthly price
+    (p[k] = slope * p[k-1] + intercept), so answering any date within the horizon is an O(1)
+    array lookup. Dates in or before the last observed month return that month's price.
+    """
+
+    def __init__(self, names, last_month, last_price, slope, intercept, horizon, fallback_models=None):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.last_month = np.asarray(last_month, dtype=np.int64)
+        self.last_price = np.asarray(last_price, dtype=np.float64)
+        if horizon < 1:
+            raise ValueError("Forecast horizon must be at least one month.")
+        self.horizon = horizon
+        self.curves = np.empty((len(self.names), horizon), dtype=np.float64)
+
+        slope = np.asarray(slope, dtype=np.float64)
+        intercept = np.asarray(intercept, dtype=np.float64)
+        fallback_models = fallback_models or {}
+        fallback_rows = [(self.index[name], model) for name, model in fallback_models.items() if name in self.index]
+        previous = self.last_price
+        for step in range(horizon):
+            current = previous * slope + intercept
+            for row, model in fallback_rows:
+                current[row] = model.predict([[previous[row]]])[0]
+            self.curves[:, step] = current
+            previous = current
+
+    @classmethod
+    def build(cls, prediction_table, prices, horizon):
+        """Builds curves for every product in a PredictionTable from the monthly history in a PriceMatrix."""
+        last_month = np.zeros(len(prediction_table))
+        last_price = np.full(len(prediction_table), np.nan)
+        if prediction_table.csv_loaded and len(prices) and len(prices.months):
+            rows = prices.first_rows()
+            last_column, last_values = last_observed(prices.values())
+            for i, product in enumerate(prediction_table.names):
+                position = rows.get(product.lower())
+                if position is not None and last_column[position] >= 0:
+                    last_month[i] = prices.months[last_column[position]]
+                    last_price[i] = last_values[position]
+        return cls(prediction_table.names, last_month, last_price, prediction_table.slope,
+                   prediction_table.intercept, horizon, prediction_table.fallback_models)
+
+    def months_ahead(self, product, target_date):
+        """Number of months between a product's last observed month and the target date's month."""
+        return month_index(target_date.year, target_date.month) - int(self.last_month[self.index[product]])
+
+    def horizon_end(self, product):
+        """Last month ('YYYY-MM') a product can be forecast for."""
+        return month_label(int(self.last_month[self.index[product]]) + self.horizon)
+
+    def forecast(self, product, target_date):
+        """Forecast price for the target date's month; raises ValueError beyond the horizon."""
+        return self.forecast_many([product], [target_date])[0]
+
+    def forecast_many(self, products, target_dates):
+        """Vectorized forecast() for parallel sequences of products and dates."""
+        rows = np.fromiter((self.index[product] for product in products), dtype=np.intp, count=len(products))
+        targets = np.fromiter((month_index(d.year, d.month) for d in target_dates), dtype=np.int64, count=len(rows))
+        ahead = targets - self.last_month[rows]
+        if (ahead > self.horizon).any():
+            raise ValueError(f"Prediction date is beyond the {self.horizon}-month forecast horizon.")
+        steps = np.clip(ahead, 1, self.horizon) - 1
+        return np.where(ahead <= 0, self.last_price[rows], self.curves[rows, steps])
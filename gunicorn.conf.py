@@ -0,0 +1,29 @@
+# Gunicorn settings (read automatically by `gunicorn app:app`, see Procfile)
+import os
+
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# GUNICORN_PRELOAD=1 imports app.py once in the master before forking, so the prediction artifacts it
+# loads (ARTIFACT_LOADING=eager) are shared copy-on-write by every worker instead of loaded per worker.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0") == "1"
+
+# Concurrent requests per worker with --worker-class gevent (Procfile.async); sync workers ignore it.
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+
+def post_worker_init(worker):
+    """Starts the read replica's first sync as soon as the worker is up, not on its first request."""
+    import sys
+
+    app_module = sys.modules.get("app")
+    if app_module is not None and app_module.read_replica is not None:
+        app_module.read_replica.ensure_started()
+
+
+def worker_exit(server, worker):
+    """Writes any predictions still queued in this worker before it exits."""
+    import sys
+
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module.prediction_writer.stop()
@@ -0,0 +1,222 @@
+"""Incremental model update when a new month of prices arrives, without retraining from scratch.
+
+model.py saves model_state.npz next to the models: every commodity's sufficient statistics
+(STAT_FIELDS: n, sum_x, sum_y, sum_xx, sum_xy over (previous month, this month) pairs) and each CSV
+row's latest price. A new month adds at most one pair per row, so updating the sums and re-solving
+every commodity's 2x2 normal equations takes O(commodities) time, whatever the history length.
+
+    python incremental_update.py apply new_month.csv
+        new_month.csv has a Commodities column and one 'Mon-YY' column. Writes models-YYYY-MM.npz and
+        model_state-YYYY-MM.npz, keeps the replaced version as models-<previous month>.npz, then
+        switches models.npz and model_state.npz to the new version (unless --no-activate) and bumps
+        the "models" data version so running workers hot-reload it.
+    python incremental_update.py verify [commodity_price.csv] [--months 12]
+        Trains on all but the last N months, applies those months one at a time and checks every
+        step against a full retrain (model.py's train) to floating-point tolerance.
+
+Add the month to commodity_price.csv (and rebuild the price store) as before: the app still reads
+the latest prices from there. Only the npz models are updated; models.pkl is left as it was.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from artifacts import LinearCoefficients, replace_atomically, save_compact_models
+from data_version import bump
+from forecasting import month_index, month_label
+from model import load_training_state, save_training_state, solve_normal_equations, train, training_state
+from price_store import PriceMatrix, load_prices
+
+
+def read_month(path):
+    """Reads a one-month price file: returns (absolute month number, [(commodity, price or NaN), ...])."""
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        header = [column.strip() for column in next(reader)]
+        month_columns = [i for i, column in enumerate(header) if column and column != "Commodities"]
+        if "Commodities" not in header or len(month_columns) != 1:
+            raise ValueError(f"'{path}' must have a Commodities column and exactly one 'Mon-YY' month column.")
+        when = datetime.strptime(header[month_columns[0]], "%b-%y")
+        name_column, price_column = header.index("Commodities"), month_columns[0]
+        entries = []
+        for row in reader:
+            if len(row) <= name_column or not row[name_column].strip():
+                continue
+            try:
+                price = float(row[price_column]) if len(row) > price_column else np.nan
+            except ValueError:
+                price = np.nan  # Empty or non-numeric cells are missing prices, as in the full CSV
+            entries.append((row[name_column], price))
+    return month_index(when.year, when.month), entries
+
+
+def align_rows(row_names, entries):
+    """Matches new-month entries to the state's CSV rows (the k-th row of a name to its k-th entry).
+
+    Returns (row names, prices aligned to them); names not seen before are appended as new rows,
+    rows without an entry get NaN.
+    """
+    by_name = {}
+    for name, price in entries:
+        by_name.setdefault(name, []).append(price)
+    names = list(row_names)
+    prices = []
+    for name in row_names:
+        pending = by_name.get(name)
+        prices.append(pending.pop(0) if pending else np.nan)
+    for name, pending in by_name.items():
+        for price in pending:
+            names.append(name)
+            prices.append(price)
+    return names, np.array(prices, dtype=np.float64)
+
+
+def models_from_stats(commodities, stats):
+    """{commodity: LinearCoefficients} from sufficient statistics, as model.py's train() would fit them.
+
+    Singular systems with at least one pair (a constant previous-month price) get slope 0 and the
+    mean next-month price, which is what LinearRegression fits on such data; commodities without
+    any pair get no model.
+    """
+    slope, intercept, solvable = solve_normal_equations(stats)
+    models = {}
+    for i, commodity in enumerate(commodities):
+        if solvable[i]:
+            models[commodity] = LinearCoefficients(slope[i], intercept[i])
+        elif stats[i, 0] > 0:
+            models[commodity] = LinearCoefficients(0.0, stats[i, 2] / stats[i, 0])
+    return models
+
+
+def apply_month(state, month, entries):
+    """Returns the state after adding one month of prices; O(rows + commodities)."""
+    if month <= state["last_month"]:
+        raise ValueError(f"{month_label(month)} is not after the last trained month {month_label(state['last_month'])}.")
+    row_names, y = align_rows(state["row_names"], entries)
+    x = np.concatenate([state["last_prices"], np.full(len(row_names) - len(state["row_names"]), np.nan)])
+
+    commodities = list(state["commodities"])
+    positions = {name: i for i, name in enumerate(commodities)}
+    for name in row_names:
+        if name not in positions:
+            positions[name] = len(commodities)
+            commodities.append(name)
+    stats = np.zeros((len(commodities), state["stats"].shape[1]))
+    stats[:len(state["commodities"])] = state["stats"]
+
+    # The same per-pair terms lag_statistics() sums over the full history, for this month's pairs only
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    x0, y0 = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+    per_row = np.stack([valid, x0, y0, x0 * x0, x0 * y0], axis=1).astype(np.float64)
+    np.add.at(stats, np.array([positions[name] for name in row_names], dtype=np.intp), per_row)
+    return {"commodities": commodities, "stats": stats, "row_names": row_names, "last_month": month, "last_prices": y}
+
+
+def versioned_path(path, month):
+    root, extension = os.path.splitext(path)
+    return f"{root}-{month_label(month)}{extension}"
+
+
+def copy_atomically(source, target):
+    with open(source, "rb") as file:
+        data = file.read()
+    replace_atomically(target, lambda out: out.write(data))
+
+
+def apply_command(args):
+    started = time.perf_counter()
+    state = load_training_state(args.state)
+    month, entries = read_month(args.new_month)
+    new_state = apply_month(state, month, entries)
+    models = models_from_stats(new_state["commodities"], new_state["stats"])
+    elapsed = time.perf_counter() - started
+
+    models_path, state_path = versioned_path(args.models, month), versioned_path(args.state, month)
+    save_compact_models(models_path, models)
+    save_training_state(state_path, new_state)
+    print(f"✅ {month_label(month)}: updated {len(models)} models from {len(entries)} prices in {elapsed * 1000:.2f} ms "
+          f"-> '{models_path}', '{state_path}'.")
+    if args.no_activate:
+        return
+
+    # Keep the version being replaced next to the new one, so it can be restored by copying it back.
+    previous = versioned_path(args.models, state["last_month"])
+    if os.path.exists(args.models) and not os.path.exists(previous):
+        shutil.copy2(args.models, previous)
+        shutil.copy2(args.state, versioned_path(args.state, state["last_month"]))
+    copy_atomically(models_path, args.models)
+    copy_atomically(state_path, args.state)
+    bump("models")
+    print(f"✅ '{args.models}' now serves {month_label(month)} (previous version kept as '{previous}').")
+
+
+def coefficients(model):
+    return float(np.ravel(model.coef_)[0]), float(np.ravel(model.intercept_)[0])
+
+
+def verify_command(args):
+    """Replays the last N months incrementally and compares each step with a full retrain."""
+    prices = load_prices(args.csv, args.price_store)
+    if not 1 <= args.months < len(prices.months) - 1:
+        raise SystemExit(f"--months must be between 1 and {len(prices.months) - 2} for this CSV.")
+    matrix = prices.values()
+    first = len(prices.months) - args.months
+    state = training_state(PriceMatrix(prices.names, prices.months[:first], matrix[:, :first]))
+
+    worst = 0.0
+    for column in range(first, len(prices.months)):
+        entries = list(zip(prices.names, matrix[:, column]))
+        state = apply_month(state, int(prices.months[column]), entries)
+        incremental = models_from_stats(state["commodities"], state["stats"])
+        with contextlib.redirect_stdout(io.StringIO()):  # train() prints a line per commodity
+            full, _, _ = train(PriceMatrix(prices.names, prices.months[:column + 1], matrix[:, :column + 1]), workers=1)
+
+        if set(incremental) != set(full):
+            raise SystemExit(f"❌ {month_label(int(prices.months[column]))}: models differ: "
+                             f"{sorted(set(incremental) ^ set(full))}")
+        for commodity, model in full.items():
+            expected, actual = coefficients(model), coefficients(incremental[commodity])
+            if not np.allclose(actual, expected, rtol=args.rtol, atol=args.atol):
+                raise SystemExit(f"❌ {month_label(int(prices.months[column]))} '{commodity}': incremental {actual} != full {expected}")
+            worst = max(worst, float(np.max(np.abs(np.subtract(actual, expected)))))
+    print(f"✅ {args.months} incremental months match a full retrain for {len(full)} models "
+          f"(largest coefficient difference {worst:.3g}, rtol {args.rtol:g}).")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Update the price models with one new month of prices.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    apply = subcommands.add_parser("apply", help="Fold one month of prices into the models.")
+    apply.add_argument("new_month", help="CSV with a Commodities column and one 'Mon-YY' price column.")
+    apply.add_argument("--state", default="model_state.npz")
+    apply.add_argument("--models", default="models.npz")
+    apply.add_argument("--no-activate", action="store_true", help="Only write the versioned files.")
+    verify = subcommands.add_parser("verify", help="Check incremental updates against full retrains.")
+    verify.add_argument("csv", nargs="?", default="commodity_price.csv")
+    verify.add_argument("--price-store", default=os.environ.get("PRICE_STORE", "commodity_price.bin"))
+    verify.add_argument("--months", type=int, default=12, help="Number of trailing months to apply incrementally.")
+    verify.add_argument("--rtol", type=float, default=1e-9)
+    verify.add_argument("--atol", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "apply":
+            apply_command(args)
+        else:
+            verify_command(args)
+    except (FileNotFoundError, ValueError) as e:
+        raise SystemExit(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
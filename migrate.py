@@ -0,0 +1,238 @@
+"""Versioned schema migrations for the MySQL tables app.py queries.
+
+Migrations live in migrations/ as NNNN_description.sql (statements separated by ';') or
+NNNN_description.py (a module with upgrade(cursor)). They are applied in order, and each applied
+version is recorded in schema_migrations so it never runs twice:
+    python migrate.py [up]     apply pending migrations
+    python migrate.py status   list applied and pending migrations
+    python migrate.py check    EXPLAIN the hot queries and fail if one does not use its index
+Connection settings come from DB_HOST, DB_USER, DB_PASSWORD, DB_NAME and DB_PORT.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import re
+import sys
+import time
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+
+# Queries app.py runs on every request of its kind: (name, query, sample params, table, indexed columns).
+# check passes when EXPLAIN uses an index on `table` whose leading columns are the indexed columns.
+HOT_QUERIES = [
+    ("price trend (daily)",
+     "SELECT date, price FROM historical_prices WHERE product_name=%s AND date BETWEEN %s AND %s ORDER BY date ASC",
+     ("Rice", "2020-01-01", "2020-12-31"), "historical_prices", ("product_name", "date")),
+    ("price trend (monthly)",
+     "SELECT month, price FROM historical_prices_monthly WHERE product_name=%s AND month BETWEEN %s AND %s AND price IS NOT NULL ORDER BY month ASC",
+     ("Rice", "2020-01-01", "2020-12-31"), "historical_prices_monthly", ("product_name", "month")),
+    ("read replica sync (daily)",
+     "SELECT product_name, date, price FROM historical_prices WHERE date >= %s",
+     ("2024-09-01",), "historical_prices", ("date",)),
+    ("read replica sync (monthly)",
+     "SELECT product_name, month, price FROM historical_prices_monthly WHERE month >= %s",
+     ("2024-09-01",), "historical_prices_monthly", ("month",)),
+    ("product list",
+     "SELECT DISTINCT product_name FROM historical_prices ORDER BY product_name ASC",
+     (), "historical_prices", ("product_name",)),
+    ("alerts by user",
+     "SELECT id, product_name, alert_price FROM price_alerts WHERE user_id = %s",
+     (1,), "price_alerts", ("user_id",)),
+    ("alert by user and product",
+     "SELECT id FROM price_alerts WHERE user_id = %s AND product_name = %s",
+     (1, "Rice"), "price_alerts", ("user_id", "product_name")),
+    ("user by email",
+     "SELECT id, email, password, username FROM users WHERE email=%s",
+     ("user@example.com",), "users", ("email",)),
+    ("admin by email",
+     "SELECT id, email, password FROM admin_users WHERE email = %s",
+     ("admin@example.com",), "admin_users", ("email",)),
+]
+
+# EXPLAIN notes for lookups the optimizer answered from the index before reading any row
+CONST_NO_MATCH = ("no matching row in const table", "impossible where noticed after reading const tables")
+
+
+# ---------------- SCHEMA INSPECTION (used by .py migrations) ----------------
+def table_exists(cursor, table):
+    cursor.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s", (table,))
+    return cursor.fetchone()[0] > 0
+
+
+def column_info(cursor, table):
+    """{column: {"type", "nullable", "collation", "length"}} for a table in the current database."""
+    cursor.execute(
+        "SELECT column_name, column_type, is_nullable, collation_name, character_maximum_length "
+        "FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s", (table,))
+    return {name: {"type": column_type, "nullable": nullable == "YES", "collation": collation, "length": length}
+            for name, column_type, nullable, collation, length in cursor.fetchall()}
+
+
+def index_columns(cursor, table):
+    """{index name: (unique, (column, ...))} for a table, columns in index order."""
+    cursor.execute(
+        "SELECT index_name, non_unique, column_name FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s ORDER BY index_name, seq_in_index", (table,))
+    indexes = {}
+    for name, non_unique, column in cursor.fetchall():
+        unique, columns = indexes.get(name, (not int(non_unique), ()))
+        indexes[name] = (unique, columns + (column,))
+    return indexes
+
+
+def has_index(cursor, table, columns, unique=False):
+    """True if some index of `table` starts with `columns` (and is unique with exactly them, if `unique`)."""
+    columns = tuple(columns)
+    for is_unique, indexed in index_columns(cursor, table).values():
+        if unique and is_unique and indexed == columns:
+            return True
+        if not unique and indexed[:len(columns)] == columns:
+            return True
+    return False
+
+
+# ---------------- MIGRATIONS ----------------
+def available_migrations(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] of the migration files, in version order."""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in '{directory}'.")
+    return migrations
+
+
+def sql_statements(text):
+    """Splits a .sql migration into statements, dropping '--' comment lines."""
+    lines = [line for line in text.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INT PRIMARY KEY, name VARCHAR(255) NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)")
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply_migration(conn, version, name, path):
+    cursor = conn.cursor()
+    try:
+        if path.endswith(".sql"):
+            with open(path, encoding="utf-8") as file:
+                for statement in sql_statements(file.read()):
+                    cursor.execute(statement)
+        else:
+            spec = importlib.util.spec_from_file_location(f"migration_{version:04d}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            module.upgrade(cursor)
+        cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        conn.commit()
+    except Exception:
+        # MySQL commits DDL implicitly, so statements before the failing one stay applied; migrations are
+        # written to be safe to re-run (IF NOT EXISTS, checks before ALTER).
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def migrate(conn, directory=MIGRATIONS_DIR):
+    """Applies every pending migration in order; returns the versions applied."""
+    cursor = conn.cursor()
+    ensure_migrations_table(cursor)
+    done = applied_versions(cursor)
+    cursor.close()
+    applied = []
+    for version, name, path in available_migrations(directory):
+        if version in done:
+            continue
+        started = time.perf_counter()
+        apply_migration(conn, version, name, path)
+        logging.info("✅ Applied migration %04d_%s in %.2fs.", version, name, time.perf_counter() - started)
+        applied.append(version)
+    if not applied:
+        logging.info("✅ Schema is up to date.")
+    return applied
+
+
+# ---------------- EXPLAIN CHECK ----------------
+def explain(cursor, query, params):
+    cursor.execute("EXPLAIN " + query, params)
+    columns = [column[0].lower() for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def check_query(cursor, query, params, table, columns):
+    """Returns (ok, detail) for one hot query from its EXPLAIN plan."""
+    indexes = index_columns(cursor, table)
+    expected = {name for name, (_, indexed) in indexes.items() if indexed[:len(columns)] == tuple(columns)}
+    if not expected:
+        return False, f"{table} has no index on ({', '.join(columns)})"
+    for row in explain(cursor, query, params):
+        key, extra = row.get("key"), (row.get("extra") or "").lower()
+        if key in expected:
+            return True, f"key={key} type={row.get('type')} rows={row.get('rows')} {row.get('extra') or ''}".strip()
+        if any(note in extra for note in CONST_NO_MATCH) and expected & set((row.get("possible_keys") or "").split(",")):
+            return True, f"answered from index ({row.get('extra')})"
+        if row.get("table") == table:
+            return False, f"key={key} type={row.get('type')} rows={row.get('rows')} (expected one of {', '.join(sorted(expected))})"
+    return False, "table not in plan"
+
+
+def check(conn):
+    """EXPLAINs every hot query; returns True if all of them use their index."""
+    cursor = conn.cursor()
+    all_ok = True
+    try:
+        for name, query, params, table, columns in HOT_QUERIES:
+            if not table_exists(cursor, table):
+                print(f"-  {name:28s} skipped: {table} does not exist")
+                continue
+            ok, detail = check_query(cursor, query, params, table, columns)
+            all_ok &= ok
+            print(f"{'✅' if ok else '❌'} {name:28s} {detail}")
+    finally:
+        cursor.close()
+    return all_ok
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Apply schema migrations and check index use.")
+    parser.add_argument("command", nargs="?", choices=("up", "status", "check"), default="up")
+    args = parser.parse_args()
+
+    import mysql.connector
+    from db_pool import connect_args_from_env
+
+    conn = mysql.connector.connect(**connect_args_from_env(query_timeouts=False)) # ALTERs on big tables run long
+    try:
+        if args.command == "up":
+            migrate(conn)
+        elif args.command == "status":
+            cursor = conn.cursor()
+            ensure_migrations_table(cursor)
+            done = applied_versions(cursor)
+            cursor.close()
+            for version, name, _ in available_migrations():
+                print(f"{'applied' if version in done else 'pending'}  {version:04d}_{name}")
+        elif not check(conn):
+            sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+-- Every table app.py queries, with the indexes its hot queries need.
+-- Tables default to utf8mb4_general_ci, so product_name and email comparisons are case-insensitive
+-- through the index itself; queries compare columns directly instead of wrapping them in LOWER().
+
+-- Users Table (login looks users up by email)
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(100) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    UNIQUE KEY uq_users_username (username),
+    UNIQUE KEY uq_users_email (email)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Admin Users Table (admin login looks admins up by email)
+CREATE TABLE IF NOT EXISTS admin_users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    email VARCHAR(255) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    UNIQUE KEY uq_admin_users_email (email)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Price Alerts Table: at most one alert per user and product.
+-- The unique key also serves "alerts of a user" (leading user_id) and the ON DELETE CASCADE from users.
+CREATE TABLE IF NOT EXISTS price_alerts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    product_name VARCHAR(100) NOT NULL,
+    alert_price DECIMAL(10, 2) NOT NULL,
+    UNIQUE KEY uq_price_alerts_user_product (user_id, product_name),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Daily Historical Prices Table (HISTORICAL_PRICES_STORAGE=daily)
+-- (product_name, date, price) covers the /price_trend range scan and SELECT DISTINCT product_name.
+CREATE TABLE IF NOT EXISTS historical_prices (
+    product_name VARCHAR(100) NOT NULL,
+    date DATE NOT NULL,
+    price DECIMAL(10, 2),
+    KEY idx_historical_prices_product_date (product_name, date, price)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Monthly Historical Prices Table (HISTORICAL_PRICES_STORAGE=monthly)
+-- One row per product per month, dated the 1st; the app expands it to daily points per request.
+CREATE TABLE IF NOT EXISTS historical_prices_monthly (
+    product_name VARCHAR(100) NOT NULL,
+    month DATE NOT NULL,
+    price DECIMAL(10, 2),
+    PRIMARY KEY (product_name, month)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Price Predictions Table (written in batches by the write-behind queue)
+CREATE TABLE IF NOT EXISTS price_predictions (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    product_name VARCHAR(100) NOT NULL,
+    predicted_price DECIMAL(10, 2),
+    prediction_date DATE,
+    KEY idx_price_predictions_product_date (product_name, prediction_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,66 @@
+"""Brings tables created by hand (or by database.sql / database.py) in line with 0001_core_tables.sql.
+
+CREATE TABLE IF NOT EXISTS leaves existing tables alone, so this renames the old price_alerts
+columns (product, price_threshold), switches the looked-up text columns to a case-insensitive
+collation, widens password columns for modern hashes and adds whichever hot-query index is missing.
+On a database created by 0001 it changes nothing.
+"""
+from migrate import column_info, has_index, table_exists
+
+COLLATION = "utf8mb4_general_ci"
+
+# (table, columns, unique, index name)
+INDEXES = [
+    ("users", ("email",), True, "uq_users_email"),
+    ("admin_users", ("email",), True, "uq_admin_users_email"),
+    ("price_alerts", ("user_id", "product_name"), True, "uq_price_alerts_user_product"),
+    ("historical_prices", ("product_name", "date", "price"), False, "idx_historical_prices_product_date"),
+    ("price_predictions", ("product_name", "prediction_date"), False, "idx_price_predictions_product_date"),
+]
+
+# Columns compared in WHERE clauses, which must compare case-insensitively
+CASE_INSENSITIVE_COLUMNS = [
+    ("users", "email"),
+    ("admin_users", "email"),
+    ("price_alerts", "product_name"),
+    ("historical_prices", "product_name"),
+    ("historical_prices_monthly", "product_name"),
+    ("price_predictions", "product_name"),
+]
+
+
+def modify_column(cursor, table, column, info, column_type=None, collation=None):
+    """Re-declares a column with a new type and/or collation, keeping its nullability."""
+    column_type = column_type or info["type"]
+    collate = f" CHARACTER SET utf8mb4 COLLATE {collation}" if collation else ""
+    null = "NULL" if info["nullable"] else "NOT NULL"
+    cursor.execute(f"ALTER TABLE {table} MODIFY `{column}` {column_type}{collate} {null}")
+
+
+def upgrade(cursor):
+    if table_exists(cursor, "price_alerts"):
+        columns = column_info(cursor, "price_alerts")
+        if "product" in columns and "product_name" not in columns:
+            cursor.execute("ALTER TABLE price_alerts CHANGE product product_name VARCHAR(100) NOT NULL")
+        if "price_threshold" in columns and "alert_price" not in columns:
+            cursor.execute("ALTER TABLE price_alerts CHANGE price_threshold alert_price DECIMAL(10, 2) NOT NULL")
+
+    for table, column in CASE_INSENSITIVE_COLUMNS:
+        info = column_info(cursor, table).get(column) if table_exists(cursor, table) else None
+        if info and info["collation"] and not info["collation"].endswith("_ci"):
+            modify_column(cursor, table, column, info, collation=COLLATION)
+
+    for table in ("users", "admin_users"):
+        info = column_info(cursor, table).get("password") if table_exists(cursor, table) else None
+        if info and info["length"] is not None and info["length"] < 255:
+            modify_column(cursor, table, "password", info, column_type="VARCHAR(255)")
+
+    if table_exists(cursor, "price_alerts") and not has_index(cursor, "price_alerts", ("user_id", "product_name"), unique=True):
+        # Keep the newest alert of each (user, product) pair so the unique key can be added.
+        cursor.execute("DELETE older FROM price_alerts older JOIN price_alerts newer "
+                       "ON older.user_id = newer.user_id AND older.product_name = newer.product_name AND older.id < newer.id")
+
+    for table, columns, unique, name in INDEXES:
+        if table_exists(cursor, table) and not has_index(cursor, table, columns, unique=unique):
+            kind = "UNIQUE KEY" if unique else "KEY"
+            cursor.execute(f"ALTER TABLE {table} ADD {kind} {name} ({', '.join(columns)})")
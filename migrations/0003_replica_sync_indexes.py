@@ -0,0 +1,18 @@
+"""Indexes for the read replica's incremental sync (replica.py), which selects rows by date alone.
+
+The (product_name, date) indexes cannot serve `WHERE date >= %s`, so without these every sync
+would scan the whole table.
+"""
+from migrate import has_index, table_exists
+
+# (table, column, index name)
+INDEXES = [
+    ("historical_prices", "date", "idx_historical_prices_date"),
+    ("historical_prices_monthly", "month", "idx_historical_prices_monthly_month"),
+]
+
+
+def upgrade(cursor):
+    for table, column, name in INDEXES:
+        if table_exists(cursor, table) and not has_index(cursor, table, (column,)):
+            cursor.execute(f"ALTER TABLE {table} ADD KEY {name} ({column})")
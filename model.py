@@ -1,77 +1,234 @@
-import pandas as pd
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from sklearn.linear_model import LinearRegression
 import joblib
 import numpy as np
 
-# ✅ Load the dataset
-# Ensure 'commodity_price.csv' is in the same directory as this script,
-# or provide the full path to the file.
-try:
-    df = pd.read_csv("commodity_price.csv")
-except FileNotFoundError:
-    raise FileNotFoundError("❌ 'commodity_price.csv' not found. Please ensure the CSV file is in the correct directory.")
-
-# ✅ Clean column names (remove leading/trailing spaces)
-df.columns = df.columns.str.strip()
-
-# ✅ Check for 'Commodities' column, which is expected to identify each product
-if 'Commodities' not in df.columns:
-    raise ValueError("❌ 'Commodities' column not found in CSV! This column is essential for identifying products.")
-
-# ✅ Identify price columns: all columns except the 'Commodities' column
-price_columns = [col for col in df.columns if col != 'Commodities']
-
-# ✅ Ensure there's enough price data to train a model (at least 2 months)
-if len(price_columns) < 2:
-    raise ValueError("❌ Need at least 2 months of price data (columns) in the CSV to train the model.")
-
-# ✅ Ensure price columns are numeric. Coerce non-numeric values to NaN (Not a Number).
-# This prevents errors during numerical operations if there are non-numeric entries.
-df[price_columns] = df[price_columns].apply(pd.to_numeric, errors='coerce')
-
-# ✅ Initialize an empty dictionary to store the trained models
-models = {}
-
-# ✅ Iterate through each unique commodity to train a separate model
-for commodity in df['Commodities'].unique():
-    # Create a copy of the DataFrame for the current commodity to avoid SettingWithCopyWarning
-    commodity_df = df[df['Commodities'] == commodity].copy()
-
-    # ✅ Select available price columns for the current commodity.
-    # We remove columns where all values are NaN for this specific commodity,
-    # as they contain no useful data for training.
-    valid_price_cols = [col for col in price_columns if not commodity_df[col].isnull().all()]
-
-    # ✅ Check if there are at least two valid price columns for the current commodity
-    if len(valid_price_cols) >= 2:
-        # ✅ Use the last two valid price columns for training.
-        # This approach assumes a time-series dependency where the current price
-        # is predicted based on the previous price.
-        last_price_col = valid_price_cols[-1]
-        second_last_price_col = valid_price_cols[-2]
-
-        # ✅ Prepare the features (X) and target (y) for the model.
-        # X will be the second-to-last valid price, and y will be the last valid price.
-        # Drop NaN values from the 'second_last_price_col' to ensure valid training data.
-        not_nan_second_last = commodity_df[second_last_price_col].dropna()
-        X = not_nan_second_last.values.reshape(-1, 1) # Reshape for sklearn (requires 2D array)
-        y = commodity_df.loc[not_nan_second_last.index, last_price_col].dropna().values
-
-        # ✅ Final check to ensure there's enough aligned data points for training.
-        # Both X and y must have data and be of the same length.
-        if len(X) > 0 and len(y) > 0 and len(X) == len(y):
-            # ✅ Train a Linear Regression model for this commodity
-            model = LinearRegression()
-            model.fit(X, y)
-            models[commodity] = model # Store the trained model in the dictionary
-            print(f"✅ Model trained for '{commodity}' with {len(X)} data points.")
+from artifacts import replace_atomically, save_compact_models
+from data_version import bump
+from price_store import load_prices as load_price_matrix
+
+# Order of the per-commodity sufficient statistics accumulated from (previous month, this month) pairs
+STAT_FIELDS = ("n", "sum_x", "sum_y", "sum_xx", "sum_xy")
+
+
+def load_prices(csv_path, store_path=None):
+    """Loads the commodity prices (from the price store when it is current) and checks they have what training needs."""
+    # ✅ Load the dataset
+    # Ensure 'commodity_price.csv' is in the same directory as this script,
+    # or provide the full path to the file.
+    try:
+        return load_price_matrix(csv_path, store_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"❌ '{csv_path}' not found. Please ensure the CSV file is in the correct directory.")
+    except ValueError as e:
+        # ✅ Check for 'Commodities' column, which is expected to identify each product
+        raise ValueError(f"❌ {e} This column is essential for identifying products.")
+
+
+def lag_statistics(names, matrix):
+    """Accumulates normal-equation sums for price[t] ~ price[t-1], one row per unique commodity.
+
+    Every two consecutive months where both prices are known give one sample, previous month's
+    price (x) -> this month's price (y). CSV rows sharing a commodity name are pooled, as the
+    per-commodity loop used to do. Returns (commodities, stats) with stats shaped (commodities, 5)
+    in STAT_FIELDS order.
+    """
+    commodities, first_seen, row_group = np.unique(np.asarray(names, dtype=object), return_index=True, return_inverse=True)
+    # Keep first-seen CSV order rather than alphabetical order for the saved models.
+    order = np.argsort(first_seen, kind="stable")
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    commodities, row_group = commodities[order], remap[row_group]
+
+    x, y = matrix[:, :-1], matrix[:, 1:]
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+    per_row = np.stack([valid.sum(axis=1), x.sum(axis=1), y.sum(axis=1),
+                        (x * x).sum(axis=1), (x * y).sum(axis=1)], axis=1).astype(np.float64)
+    stats = np.zeros((len(commodities), len(STAT_FIELDS)))
+    np.add.at(stats, row_group, per_row)
+    return [str(name) for name in commodities], stats
+
+
+def solve_normal_equations(stats):
+    """Solves every commodity's 2x2 normal equations in one batched call.
+
+    Returns (slope, intercept, solvable); rows whose system is singular (fewer than two pairs or
+    a constant previous-month price) are flagged unsolvable and left at zero.
+    """
+    n, sum_x, sum_y, sum_xx, sum_xy = stats.T
+    # Centered variance of x; zero (or numerically zero) means the system is singular.
+    var_x = sum_xx - np.divide(sum_x * sum_x, n, out=np.zeros_like(n), where=n > 0)
+    solvable = (n >= 2) & (var_x > 1e-12 * np.maximum(sum_xx, 1.0))
+
+    lhs = np.zeros((len(stats), 2, 2))
+    lhs[:, 0, 0], lhs[:, 0, 1], lhs[:, 1, 0], lhs[:, 1, 1] = sum_xx, sum_x, sum_x, n
+    rhs = np.stack([sum_xy, sum_y], axis=1)
+    solution = np.zeros((len(stats), 2))
+    if solvable.any():
+        solution[solvable] = np.linalg.solve(lhs[solvable], rhs[solvable][..., None])[..., 0]
+    return solution[:, 0], solution[:, 1], solvable
+
+
+def training_state(prices):
+    """What an incremental update (incremental_update.py) needs to continue from these prices.
+
+    Per-commodity sufficient statistics in STAT_FIELDS order, plus each CSV row's price in the last
+    month, the previous-month side of the next month's pairs.
+    """
+    matrix = prices.values()
+    commodities, stats = lag_statistics(prices.names, matrix)
+    return {
+        "commodities": commodities,
+        "stats": stats,
+        "row_names": list(prices.names),
+        "last_month": int(prices.months[-1]),
+        "last_prices": matrix[:, -1].copy(),
+    }
+
+
+def save_training_state(path, state):
+    replace_atomically(path, lambda file: np.savez(
+        file, commodities=np.array(state["commodities"], dtype=str), stats=state["stats"],
+        row_names=np.array(state["row_names"], dtype=str), last_month=np.int64(state["last_month"]),
+        last_prices=state["last_prices"]))
+
+
+def load_training_state(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {
+            "commodities": [str(name) for name in data["commodities"]],
+            "stats": data["stats"].astype(np.float64),
+            "row_names": [str(name) for name in data["row_names"]],
+            "last_month": int(data["last_month"]),
+            "last_prices": data["last_prices"].astype(np.float64),
+        }
+
+
+def linear_model(slope, intercept):
+    """Builds a fitted LinearRegression from known coefficients, compatible with app.py's models.pkl use."""
+    model = LinearRegression()
+    model.coef_ = np.array([slope], dtype=np.float64)
+    model.intercept_ = float(intercept)
+    model.n_features_in_ = 1
+    model.rank_ = 1
+    model.singular_ = np.array([1.0])
+    return model
+
+
+def commodity_pairs(names, matrix, commodity):
+    """Training pairs (X, y) for one commodity, pooled over its CSV rows."""
+    rows = matrix[[i for i, name in enumerate(names) if name == commodity]]
+    previous_prices, next_prices = rows[:, :-1].ravel(), rows[:, 1:].ravel()
+    both_known = ~np.isnan(previous_prices) & ~np.isnan(next_prices)
+    return previous_prices[both_known].reshape(-1, 1), next_prices[both_known]
+
+
+def fit_one(pairs):
+    """Fits one sklearn model on a process-pool worker (for systems the batched solve cannot handle)."""
+    X, y = pairs
+    model = LinearRegression()
+    model.fit(X, y)
+    return model
+
+
+def train(prices, workers=None):
+    """Trains one model per commodity from a price_store.PriceMatrix; returns (models, stats_by_commodity, timings)."""
+    timings = {}
+    started = time.perf_counter()
+    # ✅ Work on the (commodity x month) matrix; every later step works on arrays.
+    names, months, matrix = prices.names, prices.months, prices.values()
+    # ✅ Ensure there's enough price data to train a model (at least 2 months)
+    if len(months) < 2:
+        raise ValueError("❌ Need at least 2 months of price data (columns) in the CSV to train the model.")
+    timings["reshape"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    commodities, stats = lag_statistics(names, matrix)
+    slope, intercept, solvable = solve_normal_equations(stats)
+    timings["batched_solve"] = time.perf_counter() - started
+
+    models = {}
+    for i in np.flatnonzero(solvable):
+        models[commodities[i]] = linear_model(slope[i], intercept[i])
+        print(f"✅ Model trained for '{commodities[i]}' with {int(stats[i, 0])} data points.")
+
+    # ✅ Degenerate systems (too few pairs or constant prices) are fitted individually with sklearn,
+    # spread over a process pool so a large dataset does not serialize on them.
+    started = time.perf_counter()
+    leftovers = []
+    for i in np.flatnonzero(~solvable):
+        if stats[i, 0] == 0:
+            print(f"⚠️ No two consecutive months with known prices for '{commodities[i]}'. Skipping model training for this commodity.")
         else:
-            print(f"⚠️ Insufficient consecutive non-NaN data points to train model for '{commodity}'. Skipping.")
-    else:
-        print(f"⚠️ Less than 2 valid (non-NaN) price points found for '{commodity}'. Skipping model training for this commodity.")
-
-# ✅ Save all the trained models to a file named "models.pkl".
-# This file can then be loaded by your Flask application for predictions.
-joblib.dump(models, "models.pkl")
-print(f"✅ All model training processes completed. Trained models saved to 'models.pkl'.")
-print("   Please ensure 'models.pkl' is included in your deployment package (e.g., GitHub repository for Render).")
+            leftovers.append(commodities[i])
+    if leftovers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            fitted = pool.map(fit_one, [commodity_pairs(names, matrix, c) for c in leftovers])
+            for commodity, model in zip(leftovers, fitted):
+                models[commodity] = model
+                print(f"✅ Model trained for '{commodity}' (individual fit).")
+    timings["individual_fits"] = time.perf_counter() - started
+
+    stats_by_commodity = {commodities[i]: stats[i] for i in range(len(commodities))}
+    return models, stats_by_commodity, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train one price model per commodity and save them to models.pkl.")
+    parser.add_argument("--csv", default="commodity_price.csv")
+    parser.add_argument("--price-store", default=os.environ.get("PRICE_STORE", "commodity_price.bin"),
+                        help="Memory-mapped price store to read instead of the CSV when it is current (see price_store.py).")
+    parser.add_argument("--output", default="models.pkl")
+    parser.add_argument("--compact-output", default="models.npz",
+                        help="Also save the sklearn-free coefficient format the app prefers (empty to skip).")
+    parser.add_argument("--state-output", default="model_state.npz",
+                        help="Also save the sufficient statistics incremental_update.py continues from (empty to skip).")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size for individual fits (default: CPU count).")
+    parser.add_argument("--report", help="Also write the timing report as JSON to this path.")
+    args = parser.parse_args()
+
+    total_started = time.perf_counter()
+    started = time.perf_counter()
+    prices = load_prices(args.csv, args.price_store)
+    load_time = time.perf_counter() - started
+
+    models, _, timings = train(prices, workers=args.workers)
+    timings = {"load_csv": load_time, **timings}
+
+    # ✅ Save all the trained models to a file named "models.pkl".
+    # This file can then be loaded by your Flask application for predictions.
+    started = time.perf_counter()
+    # Written to a temporary file and renamed, so running workers never reload a half-written file.
+    replace_atomically(args.output, lambda file: joblib.dump(models, file))
+    if args.compact_output:
+        try:
+            save_compact_models(args.compact_output, models)
+        except ValueError as e:
+            # A stale compact file would shadow the new models.pkl, so remove it and let the app use the pickle.
+            print(f"⚠️ Not writing '{args.compact_output}': {e}")
+            if os.path.exists(args.compact_output):
+                os.remove(args.compact_output)
+    if args.state_output:
+        save_training_state(args.state_output, training_state(prices))
+    bump("models")
+    timings["save"] = time.perf_counter() - started
+    timings["total"] = time.perf_counter() - total_started
+
+    print(f"✅ All model training processes completed. {len(models)} trained models saved to '{args.output}'.")
+    print(f"   Please ensure '{os.path.basename(args.output)}' is included in your deployment package (e.g., GitHub repository for Render).")
+    print("⏱ Timing report:")
+    for phase, seconds in timings.items():
+        print(f"   {phase:16s} {seconds * 1000:10.2f} ms")
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump({"models": len(models), "timings_seconds": timings}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import hashlib
+import hmac
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when every hashing slot is taken, so the request can fail fast instead of queueing."""
+
+
+class PasswordHasher:
+    """Runs password hashing on a small bounded thread pool.
+
+    At most `workers` hashes run at once in this process (werkzeug's scrypt and pbkdf2 release
+    the GIL while hashing), and at most `max_pending` more wait for a slot; beyond that hash() and
+    verify() raise HasherBusy. `method` is a werkzeug method string with its work factors, e.g.
+    "scrypt:32768:8:1" or "pbkdf2:sha256:600000". Hashes run on an `executor_class` pool; app_async.py
+    swaps in gevent's, whose threads are real OS threads even after monkey patching.
+    """
+
+    executor_class = ThreadPoolExecutor
+
+    def __init__(self, method="scrypt", workers=2, max_pending=32, wait_timeout=5.0):
+        self.method = method
+        self._prefix = None
+        self.wait_timeout = wait_timeout
+        self._executor = self.executor_class(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise HasherBusy("Too many password hashes in progress.")
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    @property
+    def prefix(self):
+        """The method prefix stored hashes carry, e.g. "scrypt:32768:8:1" for method "scrypt"."""
+        if self._prefix is None:
+            # werkzeug expands short names to their full parameters in the stored hash; hash once
+            # (on first use rather than at startup) to learn the exact prefix.
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, stored_hash):
+        """True if the stored hash was made with a different method or work factors than configured."""
+        return stored_hash.split("$", 1)[0] != self.prefix
+
+    def rehash_later(self, password, store):
+        """Hashes `password` with the configured method in the background and passes the result to `store`."""
+        if not self._slots.acquire(blocking=False):
+            return  # busy: the next successful login will try again
+
+        def task():
+            try:
+                # store() runs here rather than on the hashing pool, so it may use the database
+                # (and gevent's cooperative sockets when served by app_async.py).
+                store(self._executor.submit(generate_password_hash, password, self.method).result())
+            except Exception as e:
+                logging.error("❌ Password rehash failed: %s", e)
+            finally:
+                self._slots.release()
+
+        threading.Thread(target=task, name="password-rehash", daemon=True).start()
+
+
+class FailedLoginCache:
+    """Remembers recent login failures so repeats skip the database lookup and the hash check.
+
+    Two kinds of failure are cached per (scope, email) for `ttl` seconds: the email not existing,
+    and a specific wrong password. Passwords are only kept as an HMAC under a random per-process
+    key. `cache` is any object with get/put/discard, such as response_cache.ResponseCache.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._key = os.urandom(32)
+
+    def _fingerprint(self, password):
+        return hmac.new(self._key, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def is_unknown(self, scope, email):
+        return self.cache.get((scope, email.casefold(), None)) is not None
+
+    def is_wrong_password(self, scope, email, password):
+        return self.cache.get((scope, email.casefold(), self._fingerprint(password))) is not None
+
+    def unknown(self, scope, email):
+        self.cache.put((scope, email.casefold(), None), True)
+
+    def wrong_password(self, scope, email, password):
+        self.cache.put((scope, email.casefold(), self._fingerprint(password)), True)
+
+    def forget_unknown(self, scope, email):
+        """Called when the email is registered, so its next login is checked for real."""
+        self.cache.discard((scope, email.casefold(), None))
@@ -0,0 +1,95 @@
+import numpy as np
+
+
+def month_columns(columns):
+    """Returns the 'Mon-YY' price columns of the commodity CSV, in file order."""
+    return [col for col in columns if '-' in col and len(col.split('-')[1]) == 2]
+
+
+class PredictionTable:
+    """Startup-built lookup of product -> (latest price, slope, intercept) for /predict.
+
+    Everything /predict used to recompute per request (the case-insensitive CSV filter, the
+    month-column scan and sklearn's input validation) is done once here. A prediction is then a
+    dict lookup plus one multiply-add, giving the same float64 result as LinearRegression.predict
+    on the latest CSV price. Models without linear coefficients fall back to model.predict.
+    """
+
+    def __init__(self, names, latest, slope, intercept, in_csv, fallback_models=None,
+                 csv_loaded=True, has_price_columns=True):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.latest = np.asarray(latest, dtype=np.float64)
+        self.slope = np.asarray(slope, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.in_csv = np.asarray(in_csv, dtype=bool)
+        self.fallback_models = fallback_models or {}
+        self.csv_loaded = csv_loaded
+        self.has_price_columns = has_price_columns
+
+    @classmethod
+    def build(cls, models, prices):
+        """Builds the table from the models dict and the commodity prices (a price_store.PriceMatrix, or None)."""
+        csv_loaded = prices is not None and len(prices) > 0
+        has_price_columns = csv_loaded and len(prices.months) > 0
+
+        # First CSV row for each case-folded commodity name, matching the old `.iloc[0]` lookup.
+        csv_rows = prices.first_rows() if csv_loaded else {}
+        latest_prices = prices.values(-1) if has_price_columns else None
+
+        names = list(models)
+        latest = np.full(len(names), np.nan)
+        slope = np.zeros(len(names))
+        intercept = np.zeros(len(names))
+        in_csv = np.zeros(len(names), dtype=bool)
+        fallback_models = {}
+        for i, name in enumerate(names):
+            position = csv_rows.get(name.lower())
+            if position is not None:
+                in_csv[i] = True
+                if latest_prices is not None:
+                    latest[i] = latest_prices[position]
+
+            model = models[name]
+            coef = getattr(model, "coef_", None)
+            if coef is not None and np.size(coef) == 1:
+                slope[i] = np.ravel(coef)[0]
+                intercept[i] = np.ravel(model.intercept_)[0]
+            else:
+                fallback_models[name] = model
+
+        return cls(names, latest, slope, intercept, in_csv, fallback_models,
+                   csv_loaded=csv_loaded, has_price_columns=has_price_columns)
+
+    def __contains__(self, product):
+        return product in self.index
+
+    def __len__(self):
+        return len(self.names)
+
+    def latest_price(self, product):
+        """Latest CSV price for a product (NaN if the CSV has no price for it)."""
+        return self.latest[self.index[product]]
+
+    def unavailable_reason(self, product):
+        """Returns why a product cannot be predicted, or None if it can."""
+        row = self.index.get(product)
+        if row is None:
+            return f"No prediction model found for product: {product}."
+        if not self.csv_loaded:
+            return "Commodity data CSV not loaded properly."
+        if not self.in_csv[row]:
+            return "No historical data found in CSV for this product."
+        if not self.has_price_columns:
+            return "Not enough price data columns in the CSV for prediction."
+        if np.isnan(self.latest[row]):
+            return f"Latest price data not available in CSV for {product}."
+        return None
+
+    def predict(self, product):
+        """Predicts the next price for a product from its latest CSV price."""
+        i = self.index[product]
+        model = self.fallback_models.get(product)
+        if model is not None:
+            return model.predict([[self.latest[i]]])[0]
+        return self.latest[i] * self.slope[i] + self.intercept[i]
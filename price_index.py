@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from datetime import date
+
+import numpy as np
+
+# Day ordinals are stored as int32; this converts them to numpy's days-since-1970 representation.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def product_key(product_name):
+    """Case-folded lookup key, so 'Rice', 'rice' and ' RICE ' share one series."""
+    return product_name.strip().casefold()
+
+
+def ordinals_to_iso(ordinals):
+    """Converts an array of day ordinals to 'YYYY-MM-DD' strings in one vectorized step."""
+    return (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype("datetime64[D]").astype(str)
+
+
+def series_to_records(dates, prices):
+    """Builds the /price_trend JSON records ([{"date", "price"}, ...]) from a series slice."""
+    # float32 cannot represent prices like 27.23 exactly; round back to the 2 decimals they were stored with.
+    price_list = np.round(prices.astype(np.float64), 2).tolist()
+    return [{"date": d, "price": p} for d, p in zip(ordinals_to_iso(dates).tolist(), price_list)]
+
+
+def expand_monthly(months, prices, from_date=None, to_date=None):
+    """Expands monthly prices (each dated the 1st of its month) to one point per day.
+
+    Only days within [from_date, to_date] are generated, so a short window over a long history
+    stays cheap. Returns (int32 day ordinals, float32 prices) in month order.
+    """
+    starts = np.array(months, dtype="datetime64[D]")
+    ends = (starts.astype("datetime64[M]") + 1).astype("datetime64[D]") - 1
+    if from_date is not None:
+        starts = np.maximum(starts, np.datetime64(from_date, "D"))
+    if to_date is not None:
+        ends = np.minimum(ends, np.datetime64(to_date, "D"))
+    days = np.maximum((ends - starts).astype(np.int64) + 1, 0)
+    offsets = np.arange(days.sum()) - np.repeat(np.cumsum(days) - days, days)
+    dates = np.repeat(starts, days) + offsets.astype("timedelta64[D]")
+    ordinals = (dates.astype(np.int64) + EPOCH_ORDINAL).astype(np.int32)
+    return ordinals, np.repeat(np.asarray(prices, dtype=np.float32), days)
+
+
+# Supported /price_trend bucket sizes and per-bucket aggregations
+RESOLUTIONS = ("day", "week", "month")
+AGGREGATIONS = ("mean", "min", "max", "last")
+
+
+def bucket_starts(dates, resolution):
+    """Maps day ordinals to the ordinal of their bucket's first day (Monday for weeks, the 1st for months)."""
+    dates = np.asarray(dates, dtype=np.int64)
+    if resolution == "day":
+        return dates
+    if resolution == "week":
+        # Ordinal 1 (0001-01-01) is a Monday
+        return dates - (dates - 1) % 7
+    months = (dates - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]")
+    return months.astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+
+
+def downsample(dates, prices, resolution="day", aggregation="mean"):
+    """Aggregates a date-sorted series into one point per day, week or month.
+
+    Each bucket is labelled with its first calendar day. Returns (int64 ordinals, float64 prices).
+    """
+    starts = bucket_starts(dates, resolution)
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(starts) == 0:
+        return starts, prices
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    if aggregation == "mean":
+        counts = np.diff(np.r_[first, len(prices)])
+        values = np.add.reduceat(prices, first) / counts
+    elif aggregation == "min":
+        values = np.minimum.reduceat(prices, first)
+    elif aggregation == "max":
+        values = np.maximum.reduceat(prices, first)
+    else:
+        values = prices[np.r_[first[1:], len(prices)] - 1]
+    return starts[first], values
+
+
+def page_after(dates, prices, after=None, limit=None):
+    """Keyset pagination: points dated after `after` (an ordinal), at most `limit` of them.
+
+    Returns (dates, prices, next_after) where next_after is the ordinal to pass as the next
+    page's `after`, or None on the last page.
+    """
+    if after is not None:
+        begin = np.searchsorted(dates, after, side="right")
+        dates, prices = dates[begin:], prices[begin:]
+    if limit is None or len(dates) <= limit:
+        return dates, prices, None
+    return dates[:limit], prices[:limit], int(dates[limit - 1])
+
+
+def series_to_columns(dates, prices):
+    """Builds the columnar /price_trend shape ({"dates": [...], "prices": [...]})."""
+    return {"dates": ordinals_to_iso(dates).tolist(),
+            "prices": np.round(np.asarray(prices, dtype=np.float64), 2).tolist()}
+
+
+class PriceSeries:
+    """One product's price history as parallel, date-sorted arrays."""
+
+    __slots__ = ("dates", "prices")
+
+    def __init__(self, dates, prices):
+        order = np.argsort(dates, kind="stable")
+        self.dates = np.ascontiguousarray(dates[order], dtype=np.int32)
+        self.prices = np.ascontiguousarray(prices[order], dtype=np.float32)
+
+    def between(self, from_ordinal, to_ordinal):
+        """Returns (dates, prices) views for from_ordinal <= date <= to_ordinal."""
+        lo = np.searchsorted(self.dates, from_ordinal, side="left")
+        hi = np.searchsorted(self.dates, to_ordinal, side="right")
+        return self.dates[lo:hi], self.prices[lo:hi]
+
+
+class PriceIndex:
+    """In-memory index of historical_prices, answering /price_trend range queries without MySQL.
+
+    `load_rows` is a callable returning an iterable of (product_name, date, price) rows; with
+    `monthly=True` each row is a month (dated the 1st) and is expanded to daily points. The index
+    is loaded on first use and rebuilt by refresh(), either explicitly (e.g. after a bulk load) or
+    automatically once it is older than `refresh_interval` seconds. A rebuild swaps in a complete
+    new mapping, so concurrent queries always see either the old or the new data.
+    """
+
+    def __init__(self, load_rows, refresh_interval=None, monthly=False):
+        self.load_rows = load_rows
+        self.monthly = monthly
+        self.refresh_interval = refresh_interval
+        self._series = None
+        self._loaded_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self):
+        """Reloads every product's series from `load_rows` and swaps the new index in."""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            dates_by_key = {}
+            prices_by_key = {}
+            row_count = 0
+            for product_name, day, price in self.load_rows():
+                if price is None:
+                    continue
+                key = product_key(product_name)
+                dates_by_key.setdefault(key, []).append(day.toordinal())
+                prices_by_key.setdefault(key, []).append(price)
+                row_count += 1
+
+            series = {}
+            for key in dates_by_key:
+                dates = np.array(dates_by_key[key], dtype=np.int32)
+                prices = np.array(prices_by_key[key], dtype=np.float32)
+                if self.monthly:
+                    order = np.argsort(dates, kind="stable")
+                    month_starts = (dates[order].astype(np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+                    dates, prices = expand_monthly(month_starts, prices[order])
+                series[key] = PriceSeries(dates, prices)
+            self._series = series
+            self._loaded_at = time.monotonic()
+            logging.info("✅ Price index loaded: %d rows for %d products in %.3fs.",
+                         row_count, len(series), time.perf_counter() - started)
+
+    def _current(self):
+        if self._series is None:
+            self.refresh()
+        elif self.refresh_interval and time.monotonic() - self._loaded_at > self.refresh_interval:
+            # Only one request pays for the reload; the rest keep serving the previous index.
+            if not self._refresh_lock.locked():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logging.error("❌ Price index refresh failed, serving previous data: %s", e)
+        return self._series
+
+    def query(self, product_name, from_date, to_date):
+        """Returns (dates, prices) arrays for a product between two dates (inclusive)."""
+        series = self._current().get(product_key(product_name))
+        if series is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        return series.between(from_date.toordinal(), to_date.toordinal())
+
+    def products(self):
+        """Returns the case-folded keys of every indexed product."""
+        return sorted(self._current())
@@ -0,0 +1,178 @@
+"""Compact binary, memory-mapped copy of commodity_price.csv.
+
+The CSV is parsed once by the build step:
+    python price_store.py build [commodity_price.csv] [commodity_price.bin]
+and workers open the result with np.memmap (read-only) instead of re-parsing text with pandas, so
+every worker shares one physical copy in the page cache and opening it takes microseconds.
+
+File layout: 8-byte magic, 4-byte little-endian header length, a JSON header (products, months,
+shape, SHA-1 of the source CSV), zero padding to a 64-byte boundary, then the float32
+commodity x month price matrix in C order with NaN for missing prices.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"AGRIPRC1"
+ALIGNMENT = 64
+# Prices in the CSV have at most 2 decimals; rounding float32 values back to them recovers the exact CSV numbers.
+PRICE_DECIMALS = 2
+
+
+class PriceMatrix:
+    """Commodity x month prices: the shape every consumer of the commodity CSV works with.
+
+    `names` has one entry per CSV row (in file order, possibly repeated), `months` the absolute month
+    number (year * 12 + month - 1) of each matrix column in ascending order, and `matrix` the prices,
+    NaN where missing. Built from a DataFrame the matrix is float64; opened from a store it is a
+    read-only float32 memmap.
+    """
+
+    def __init__(self, names, months, matrix, path=None, source_sha1=None):
+        self.names = list(names)
+        self.months = np.asarray(months, dtype=np.int32)
+        self.matrix = matrix
+        self.path = path
+        self.source_sha1 = source_sha1
+        self._rows = None
+
+    @classmethod
+    def from_frame(cls, df):
+        """From the commodity CSV's DataFrame; trailing unnamed columns and non 'Mon-YY' columns are ignored."""
+        from forecasting import monthly_matrix
+
+        names, months, matrix = monthly_matrix(df)
+        return cls(names, months, matrix)
+
+    def __len__(self):
+        return len(self.names)
+
+    def values(self, columns=slice(None)):
+        """float64 copy of (a column slice of) the matrix, identical to the numbers parsed from the CSV."""
+        values = np.asarray(self.matrix[:, columns], dtype=np.float64)
+        return np.round(values, PRICE_DECIMALS) if self.matrix.dtype == np.float32 else values
+
+    def first_rows(self):
+        """{case-folded product: first CSV row} - repeated names resolve to their first row, as before."""
+        if self._rows is None:
+            rows = {}
+            for position, name in enumerate(self.names):
+                rows.setdefault(name.lower(), position)
+            self._rows = rows
+        return self._rows
+
+    def series(self, product):
+        """(month start dates as datetime64[D], float32 prices) of a product's observed months."""
+        row = self.first_rows().get(product.strip().lower())
+        if row is None:
+            return np.empty(0, dtype="datetime64[D]"), np.empty(0, dtype=np.float32)
+        prices = np.asarray(self.matrix[row], dtype=np.float32)
+        observed = ~np.isnan(prices)
+        starts = (self.months[observed].astype(np.int64) - 1970 * 12).astype("datetime64[M]").astype("datetime64[D]")
+        return starts, prices[observed]
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_csv(path):
+    """Parses the commodity CSV with pandas (imported here) into a float64 PriceMatrix."""
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip() # Clean column names
+    if "Commodities" not in df.columns:
+        raise ValueError(f"'Commodities' column not found in '{path}'. Please check the CSV structure.")
+    return PriceMatrix.from_frame(df)
+
+
+def write_store(path, prices, source_sha1=None):
+    """Writes a PriceMatrix as a price store (atomically: readers never see a partial file)."""
+    from artifacts import replace_atomically
+
+    matrix = np.ascontiguousarray(prices.matrix, dtype=np.float32)
+    header = json.dumps({
+        "products": prices.names,
+        "months": prices.months.tolist(),
+        "shape": list(matrix.shape),
+        "dtype": "<f4",
+        "source_sha1": source_sha1,
+    }).encode()
+    offset = len(MAGIC) + 4 + len(header)
+    padding = -offset % ALIGNMENT
+
+    def write(file):
+        file.write(MAGIC + struct.pack("<I", len(header)) + header + b"\0" * padding)
+        file.write(matrix.astype("<f4", copy=False).tobytes())
+
+    replace_atomically(path, write)
+
+
+def read_header(path):
+    """Returns (header dict, byte offset of the matrix)."""
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' is not a price store.")
+        (length,) = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(length))
+    offset = len(MAGIC) + 4 + length
+    return header, offset + (-offset % ALIGNMENT)
+
+
+def open_store(path):
+    """Memory-maps a price store read-only; pages are read from the shared page cache on first touch."""
+    header, offset = read_header(path)
+    shape = tuple(header["shape"])
+    matrix = (np.memmap(path, dtype=header["dtype"], mode="r", offset=offset, shape=shape)
+              if shape[0] and shape[1] else np.empty(shape, dtype=np.float32))
+    return PriceMatrix(header["products"], header["months"], matrix, path, header.get("source_sha1"))
+
+
+def load_prices(csv_path, store_path=None):
+    """The price store if it exists and was built from csv_path's current contents, else the parsed CSV.
+
+    A store whose recorded CSV hash no longer matches is skipped with a warning (rebuild it with
+    python price_store.py build). Without a CSV next to it, the store is used as is.
+    """
+    if store_path and os.path.exists(store_path):
+        prices = open_store(store_path)
+        if prices.source_sha1 and os.path.exists(csv_path) and file_sha1(csv_path) != prices.source_sha1:
+            logging.warning("⚠ Price store '%s' is older than '%s'; reading the CSV. Rebuild it with: python price_store.py build",
+                            store_path, csv_path)
+        else:
+            return prices
+    return read_csv(csv_path)
+
+
+def build(csv_path, store_path):
+    prices = read_csv(csv_path)
+    write_store(store_path, prices, source_sha1=file_sha1(csv_path))
+    return prices
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Commodity price store tools.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    convert = subcommands.add_parser("build", help="Convert the commodity CSV into a memory-mappable price store.")
+    convert.add_argument("source", nargs="?", default="commodity_price.csv")
+    convert.add_argument("target", nargs="?", default="commodity_price.bin")
+    args = parser.parse_args()
+
+    prices = build(args.source, args.target)
+    print(f"✅ Wrote {len(prices)} products x {len(prices.months)} months to '{args.target}' "
+          f"({os.path.getsize(args.target)} bytes, CSV was {os.path.getsize(args.source)} bytes).")
+
+
+if __name__ == "__main__":
+    main()
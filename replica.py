@@ -0,0 +1,303 @@
+"""Local read replica of the historical prices, in an embedded SQLite file.
+
+The historical prices table (historical_prices, or historical_prices_monthly with
+HISTORICAL_PRICES_STORAGE=monthly) is copied from MySQL into one SQLite file per host, indexed for
+the /price_trend range query and the product list, so those reads stay on the machine instead of
+crossing the WAN. Writes (users, alerts, predictions) keep going to MySQL.
+
+A sync copies only the rows dated on or after the replica's high-water mark (the latest date it
+holds). The high-water date itself is replaced rather than appended to, since the loader may have
+been part-way through it. Rows revised further back are picked up by a full copy (--full).
+    python replica.py sync [--path replica.sqlite3] [--storage daily|monthly] [--full]
+    python replica.py status [--path replica.sqlite3]
+In the app (PRICE_TREND_ENGINE=replica), each worker syncs on startup and then every
+REPLICA_SYNC_INTERVAL_SECONDS. A sync takes SQLite's write lock, so workers sharing a file take
+turns, and readers keep reading the previous data meanwhile (WAL journal). If MySQL is unreachable
+the replica keeps serving what it has, and its staleness grows.
+"""
+import argparse
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import numpy as np
+
+from price_index import EPOCH_ORDINAL, expand_monthly
+
+# Source table and date column for each HISTORICAL_PRICES_STORAGE layout
+SOURCES = {"daily": ("historical_prices", "date"), "monthly": ("historical_prices_monthly", "month")}
+
+# Dates are stored as day ordinals (date.toordinal(), months as their 1st), the representation /price_trend works in.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (product_name TEXT NOT NULL COLLATE NOCASE, day INTEGER NOT NULL, price REAL);
+CREATE INDEX IF NOT EXISTS idx_prices_product_day ON prices (product_name, day, price);
+CREATE INDEX IF NOT EXISTS idx_prices_day ON prices (day);
+CREATE TABLE IF NOT EXISTS sync_state (source TEXT PRIMARY KEY, high_water INTEGER, row_count INTEGER NOT NULL,
+                                       synced_at REAL NOT NULL);
+"""
+
+
+class ReplicaUnavailable(ConnectionError):
+    """Raised when the replica has never been synced and the first sync did not succeed."""
+
+
+def source_rows(conn, table, column, since=None, batch_size=10000):
+    """Streams (product_name, date, price) rows of a MySQL table, only those dated on/after `since` if given."""
+    cursor = conn.cursor()
+    try:
+        query = f"SELECT product_name, {column}, price FROM {table}"
+        if since is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query + f" WHERE {column} >= %s", (since,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
+class ReadReplica:
+    """SQLite copy of the historical prices table, synced from MySQL by high-water mark.
+
+    `load_rows(since)` returns an iterable of (product_name, date, price) source rows dated on or
+    after `since` (a date, or None for every row). `storage` is "daily" or "monthly", as
+    HISTORICAL_PRICES_STORAGE. With an `interval`, a background thread started on first use (or by
+    start()) syncs immediately and then every `interval` seconds, or as soon as `trigger()` (e.g.
+    the shared "prices" data version) changes.
+    """
+
+    def __init__(self, path, load_rows, storage="daily", interval=None, trigger=lambda: None, first_sync_timeout=30.0):
+        self.path = path
+        self.load_rows = load_rows
+        self.storage = storage
+        self.source = SOURCES[storage][0]
+        self.interval = interval
+        self.trigger = trigger
+        self.first_sync_timeout = first_sync_timeout
+        self._readers = queue.LifoQueue()
+        self._state = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._first_attempt = threading.Event()
+        self.syncs = 0
+        self.failed_syncs = 0
+        self.last_error = None
+
+    # ---------------- SYNC ----------------
+    def sync(self, full=False):
+        """Copies new rows from the source; returns the number copied, or None if another process is syncing."""
+        started = time.perf_counter()
+        conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+        try:
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                logging.debug("ℹ️ Replica sync skipped, another process is syncing '%s'.", self.path)
+                self._state = self._read_state()
+                return None
+            try:
+                for statement in SCHEMA.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+                state = conn.execute("SELECT high_water, row_count FROM sync_state WHERE source = ?", (self.source,)).fetchone()
+                if full or state is None or state[0] is None:
+                    conn.execute("DELETE FROM prices")
+                    conn.execute("DELETE FROM sync_state")
+                    since, row_count = None, 0
+                else:
+                    since = date.fromordinal(state[0])
+                    row_count = state[1] - conn.execute("DELETE FROM prices WHERE day >= ?", (state[0],)).rowcount
+
+                copied = 0
+
+                def converted():
+                    nonlocal copied
+                    for product_name, day, price in self.load_rows(since):
+                        copied += 1
+                        yield product_name, day.toordinal(), None if price is None else float(price)
+
+                conn.executemany("INSERT INTO prices (product_name, day, price) VALUES (?, ?, ?)", converted())
+                high_water = conn.execute("SELECT MAX(day) FROM prices").fetchone()[0]
+                conn.execute("INSERT OR REPLACE INTO sync_state (source, high_water, row_count, synced_at) VALUES (?, ?, ?, ?)",
+                             (self.source, high_water, row_count + copied, time.time()))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        self._state = self._read_state()
+        logging.info("✅ Replica synced: %d rows copied from %s (since %s) in %.2fs.",
+                     copied, self.source, since or "the beginning", time.perf_counter() - started)
+        return copied
+
+    def _read_state(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with self._reader() as conn:
+                row = conn.execute("SELECT high_water, row_count, synced_at FROM sync_state WHERE source = ?", (self.source,)).fetchone()
+        except sqlite3.OperationalError:
+            return None  # created but not initialized yet
+        return None if row is None else {"high_water": row[0], "row_count": row[1], "synced_at": row[2]}
+
+    # ---------------- BACKGROUND SYNC ----------------
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _sync_logged(self):
+        try:
+            self.sync()
+            self.syncs += 1
+            self.last_error = None
+        except Exception as e:
+            self.failed_syncs += 1
+            self.last_error = str(e)
+            logging.error("❌ Replica sync failed, serving the existing copy: %s", e)
+            try:
+                self._state = self._read_state()  # another worker may have synced it meanwhile
+            except sqlite3.Error:
+                pass
+        finally:
+            self._first_attempt.set()
+
+    def _run(self):
+        trigger = self.trigger()
+        self._sync_logged()
+        next_sync = time.monotonic() + self.interval
+        while not self._stopping.wait(1.0):
+            current = self.trigger()
+            if current != trigger or time.monotonic() >= next_sync:
+                trigger = current
+                self._sync_logged()
+                next_sync = time.monotonic() + self.interval
+
+    def ensure_started(self):
+        """Starts the sync thread in this process unless it is running (or there is no interval)."""
+        if self.interval and (self._thread is None or not self._thread.is_alive()):
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self.start()
+
+    def _ensure_ready(self):
+        """Starts syncing on first use and waits for the first copy of a replica that has none yet."""
+        self.ensure_started()
+        if self._state is None:
+            self._state = self._read_state()
+        if self._state is None:
+            if self.interval:
+                self._first_attempt.wait(self.first_sync_timeout)
+            else:
+                self._sync_logged()
+            if self._state is None:
+                raise ReplicaUnavailable(f"Read replica '{self.path}' has not been synced yet: {self.last_error}")
+
+    # ---------------- READS ----------------
+    @contextmanager
+    def _reader(self):
+        """A read-only connection from the idle ones, opened on demand and kept for reuse."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def query(self, product_name, from_date, to_date, limit=None):
+        """(int32 day ordinals, prices) for a product between two dates (inclusive), like the MySQL query."""
+        self._ensure_ready()
+        from_day = from_date.replace(day=1) if self.storage == "monthly" else from_date
+        query = "SELECT day, price FROM prices WHERE product_name = ? AND day BETWEEN ? AND ? AND price IS NOT NULL ORDER BY day"
+        if limit is not None and self.storage == "daily":
+            query += f" LIMIT {int(limit)}"
+        with self._reader() as conn:
+            rows = conn.execute(query, (product_name, from_day.toordinal(), to_date.toordinal())).fetchall()
+        days = np.array([row[0] for row in rows], dtype=np.int32)
+        prices = np.array([row[1] for row in rows], dtype=np.float64)
+        if self.storage == "monthly":
+            return expand_monthly((days.astype(np.int64) - EPOCH_ORDINAL).astype("datetime64[D]"), prices, from_date, to_date)
+        return days, prices
+
+    def products(self):
+        """Distinct product names in the replica, sorted."""
+        self._ensure_ready()
+        with self._reader() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT product_name FROM prices ORDER BY product_name")]
+
+    def version(self):
+        """Changes whenever a sync brought new or different rows; used to key caches."""
+        state = self._state
+        return None if state is None else (state["high_water"], state["row_count"])
+
+    def status(self):
+        """High-water date, rows, last successful sync and its age in seconds (None before the first sync)."""
+        state = self._state
+        if state is None and os.path.exists(self.path):
+            state = self._state = self._read_state()
+        synced_at = state["synced_at"] if state else None
+        return {
+            "source": self.source,
+            "high_water": date.fromordinal(state["high_water"]).isoformat() if state and state["high_water"] else None,
+            "rows": state["row_count"] if state else 0,
+            "synced_at": synced_at,
+            "staleness_seconds": round(time.time() - synced_at, 1) if synced_at else None,
+            "syncs": self.syncs,
+            "failed_syncs": self.failed_syncs,
+            "last_error": self.last_error,
+        }
+
+
+# ---------------- CLI ----------------
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Sync the local read replica of the historical prices.")
+    parser.add_argument("command", choices=("sync", "status"))
+    parser.add_argument("--path", default=os.environ.get("READ_REPLICA_PATH", "replica.sqlite3"))
+    parser.add_argument("--storage", choices=sorted(SOURCES), default=os.environ.get("HISTORICAL_PRICES_STORAGE", "daily").lower())
+    parser.add_argument("--full", action="store_true", help="Copy every row again instead of only the new ones.")
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        import mysql.connector
+        from db_pool import connect_args_from_env
+
+        table, column = SOURCES[args.storage]
+        conn = mysql.connector.connect(**connect_args_from_env())
+        try:
+            replica = ReadReplica(args.path, lambda since: source_rows(conn, table, column, since), args.storage)
+            if replica.sync(full=args.full) is None:
+                raise SystemExit("❌ Another process is syncing the replica; try again later.")
+        finally:
+            conn.close()
+    else:
+        replica = ReadReplica(args.path, None, args.storage)
+    status = replica.status()
+    if status["synced_at"]:
+        status["synced_at"] = datetime.fromtimestamp(status["synced_at"]).isoformat(timespec="seconds")
+    for name, value in status.items():
+        print(f"{name:18s} {value}")
+
+
+if __name__ == "__main__":
+    main()
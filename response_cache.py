@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CachedResponse:
+    """A finished response body, stored so repeat requests skip the database and serialization."""
+
+    __slots__ = ("body", "mimetype", "headers", "etag")
+
+    def __init__(self, body, mimetype, headers, etag):
+        self.body = body
+        self.mimetype = mimetype
+        self.headers = headers
+        self.etag = etag
+
+
+class ResponseCache:
+    """Size-bounded LRU cache whose entries also expire `ttl` seconds after they were stored.
+
+    `version` returns the current data version; when it changes every entry is dropped, so a
+    bulk load or a retrain invalidates cached responses in every worker on their next request.
+    Hits, misses, evictions (LRU) and expirations (TTL) are counted for stats().
+    """
+
+    def __init__(self, max_entries=1024, ttl=300.0, version=lambda: None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _check_version(self):
+        version = self.version()
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._check_version()
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -1,67 +1,223 @@
+"""Streams commodity_price.csv into historical_prices as one row per product per day.
+
+Each monthly price is expanded to every day of its month with vectorized date ranges, a chunk
+of product-months at a time, so memory stays bounded however many years the CSV covers.
+With --storage monthly, rows go unexpanded into historical_prices_monthly instead (one row per
+product-month); the app expands them to days at query time (HISTORICAL_PRICES_STORAGE=monthly).
+Output modes:
+    sql    multi-row INSERT statements written to a .sql file (default: insert_queries.sql)
+    tsv    a tab-separated file for LOAD DATA LOCAL INFILE (the statement is printed)
+    mysql  parameterized executemany INSERTs straight into MySQL, one transaction per batch
+Rows/sec is printed when the load finishes.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
 
-# Load your CSV file (replace 'commodity_data.csv' with the actual filename if different)
-try:
-    df = pd.read_csv("commodity_data.csv")
-except FileNotFoundError:
-    print("Error: commodity_data.csv not found. Please make sure the file is in the correct directory.")
-    exit()
+# Target table and column list for each storage layout
+STORAGE = {
+    "daily": ("historical_prices", "(product_name, price, date)"),
+    "monthly": ("historical_prices_monthly", "(product_name, price, month)"),
+}
+
+
+def monthly_chunks(csv_path, months_per_chunk=1000, start=None, end=None, csv_rows_per_read=100):
+    """Yields melted (product, month start, price) frames of at most `months_per_chunk` product-months."""
+    for wide in pd.read_csv(csv_path, chunksize=csv_rows_per_read):
+        # Clean up columns: remove leading/trailing whitespace
+        wide.columns = wide.columns.str.strip()
+        # The first column identifies the product (e.g. "Commodities")
+        wide = wide.rename(columns={wide.columns[0]: "Product Name"})
+
+        # Keep only valid month columns ("Mon-YY" like "Jan-14"); trailing empty columns are dropped here
+        months = pd.to_datetime(pd.Series(wide.columns[1:]), format="%b-%y", errors="coerce")
+        month_cols = [col for col, month in zip(wide.columns[1:], months) if not pd.isna(month)]
+        if not month_cols:
+            print("Error: No 'Mon-YY' month columns found in the CSV.", file=sys.stderr)
+            return
+
+        melted = wide[["Product Name"] + month_cols].melt(id_vars=["Product Name"], var_name="Month", value_name="Price")
+        melted["Month"] = pd.to_datetime(melted["Month"], format="%b-%y")
+        melted["Price"] = pd.to_numeric(melted["Price"], errors="coerce")
+        if start is not None:
+            melted = melted[melted["Month"] >= start]
+        if end is not None:
+            melted = melted[melted["Month"] <= end]
+        for begin in range(0, len(melted), months_per_chunk):
+            yield melted.iloc[begin:begin + months_per_chunk]
+
+
+def expand_to_days(melted):
+    """Expands product-month rows to one row per day of the month, without a per-day Python loop.
+
+    Returns (products, dates as 'YYYY-MM-DD' strings, prices as float64 with NaN for unknown).
+    """
+    month_start = melted["Month"].to_numpy(dtype="datetime64[D]")
+    days = melted["Month"].dt.days_in_month.to_numpy()
+    total = int(days.sum())
+    # Day offset within each month: 0..days-1, built from one arange and the repeated month offsets.
+    group_start = np.repeat(np.cumsum(days) - days, days)
+    offsets = np.arange(total) - group_start
+    dates = np.repeat(month_start, days) + offsets.astype("timedelta64[D]")
+    products = np.repeat(melted["Product Name"].to_numpy(dtype=object), days)
+    prices = np.repeat(melted["Price"].to_numpy(dtype=np.float64), days)
+    return products, dates.astype(str), prices
+
+
+def month_rows(melted):
+    """One row per product-month, dated the first of the month (the monthly storage layout)."""
+    months = melted["Month"].to_numpy(dtype="datetime64[D]").astype(str)
+    return melted["Product Name"].to_numpy(dtype=object), months, melted["Price"].to_numpy(dtype=np.float64)
+
+
+def format_prices(prices, null):
+    """Formats prices with 2 decimals, writing `null` for unknown prices."""
+    formatted = np.char.mod("%.2f", np.nan_to_num(prices))
+    return np.where(np.isnan(prices), null, formatted)
+
+
+def sql_literal(values):
+    """Quotes strings as SQL literals (escaping backslashes and single quotes)."""
+    return ["'" + value.replace("\\", "\\\\").replace("'", "''") + "'" for value in values]
+
+
+def batches(products, dates, prices, batch_size):
+    for begin in range(0, len(dates), batch_size):
+        yield products[begin:begin + batch_size], dates[begin:begin + batch_size], prices[begin:begin + batch_size]
+
+
+class SqlFileWriter:
+    """Writes multi-row INSERT statements, `batch_size` rows per statement."""
+
+    def __init__(self, path, batch_size, table, columns):
+        self.file = open(path, "w")
+        self.batch_size = batch_size
+        self.path = path
+        self.table, self.columns = table, columns
+
+    def write(self, products, dates, prices):
+        for batch_products, batch_dates, batch_prices in batches(products, dates, prices, self.batch_size):
+            values = ",\n".join(
+                f"({product}, {price}, '{day}')"
+                for product, price, day in zip(sql_literal(batch_products), format_prices(batch_prices, "NULL"), batch_dates)
+            )
+            self.file.write(f"INSERT INTO {self.table} {self.columns} VALUES\n{values};\n")
+
+    def close(self):
+        self.file.close()
+        print(f"Saved INSERT statements to '{self.path}'")
 
-# Clean up columns: remove leading/trailing whitespace
-df.columns = df.columns.str.strip()
 
-# Rename the first column to "Product Name" (assuming it's the product identifier)
-if df.columns[0] != "Product Name":
-    df = df.rename(columns={df.columns[0]: "Product Name"})
+class TsvWriter:
+    """Writes rows in LOAD DATA LOCAL INFILE's default format (tab-separated, \\N for NULL)."""
+
+    def __init__(self, path, batch_size, table, columns):
+        self.file = open(path, "w", newline="\n")
+        self.path = path
+        self.table, self.columns = table, columns
+
+    def write(self, products, dates, prices):
+        names = [product.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n") for product in products]
+        lines = (f"{name}\t{price}\t{day}" for name, price, day in zip(names, format_prices(prices, "\\N"), dates))
+        self.file.write("\n".join(lines) + "\n")
+
+    def close(self):
+        self.file.close()
+        print(f"Saved rows to '{self.path}'. Load them with:")
+        print(f"  LOAD DATA LOCAL INFILE '{self.path}' INTO TABLE {self.table} "
+              f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' {self.columns};")
+
+
+class MySqlWriter:
+    """Inserts rows with parameterized executemany (sent as multi-row INSERTs), committing per batch."""
+
+    def __init__(self, path, batch_size, table, columns):
+        import mysql.connector
+        from db_pool import connect_args_from_env
+
+        self.conn = mysql.connector.connect(**connect_args_from_env(query_timeouts=False)) # Large batches may run long
+        self.cursor = self.conn.cursor()
+        self.batch_size = batch_size
+        self.table, self.columns = table, columns
+
+    def write(self, products, dates, prices):
+        query = f"INSERT INTO {self.table} {self.columns} VALUES (%s, %s, %s)"
+        for batch_products, batch_dates, batch_prices in batches(products, dates, prices, self.batch_size):
+            price_values = [None if np.isnan(price) else round(price, 2) for price in batch_prices.tolist()]
+            try:
+                self.cursor.executemany(query, list(zip(batch_products.tolist(), price_values, batch_dates.tolist())))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def close(self):
+        self.cursor.close()
+        self.conn.close()
+        print(f"Inserted rows into {self.table}.")
+
+
+WRITERS = {"sql": SqlFileWriter, "tsv": TsvWriter, "mysql": MySqlWriter}
+DEFAULT_OUTPUT = {"sql": "insert_queries.sql", "tsv": "historical_prices.tsv", "mysql": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expand commodity_price.csv to daily historical_prices rows.")
+    parser.add_argument("--csv", default="commodity_price.csv")
+    parser.add_argument("--mode", choices=sorted(WRITERS), default="sql")
+    parser.add_argument("--storage", choices=sorted(STORAGE), default="daily",
+                        help="daily: one historical_prices row per day; monthly: one historical_prices_monthly row per month.")
+    parser.add_argument("--output", help="Output file for sql/tsv modes.")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT statement / transaction.")
+    parser.add_argument("--chunk-months", type=int, default=1000,
+                        help="Product-months expanded to daily rows at a time (bounds memory).")
+    parser.add_argument("--start", help="First month to load (YYYY-MM-DD).")
+    parser.add_argument("--end", help="Last month to load (YYYY-MM-DD).")
+    parser.add_argument("--evaluate-alerts", action="store_true",
+                        help="After loading, fire price alerts crossed by the latest month's prices.")
+    args = parser.parse_args()
+
+    start = pd.Timestamp(args.start) if args.start else None
+    end = pd.Timestamp(args.end) if args.end else None
 
-# Identify valid month columns (assuming format "Mon-YY" like "Jan-14")
-valid_months = []
-for col in df.columns[1:]:
     try:
-        pd.to_datetime(col, format="%b-%y")
-        valid_months.append(col)
-    except ValueError:
-        print(f"Warning: Skipping invalid month column '{col}'. Expected format 'Mon-YY'.")
-        continue
-
-# Create a cleaned DataFrame with only the product name and valid month columns
-df_cleaned = df[["Product Name"] + valid_months]
-
-# Melt the DataFrame from wide to long format
-melted_df = df_cleaned.melt(id_vars=["Product Name"], var_name="Month", value_name="Price")
-
-# Convert the "Month" column to datetime objects
-try:
-    melted_df["Month"] = pd.to_datetime(melted_df["Month"], format="%b-%y")
-except ValueError:
-    print("Error: Could not convert 'Month' column to datetime. Ensure the format is 'Mon-YY'.")
-    exit()
-
-# Filter data within the required date range
-start_date = datetime(2014, 1, 1)
-end_date = datetime(2024, 9, 30)
-melted_df = melted_df[(melted_df["Month"] >= start_date) & (melted_df["Month"] <= end_date)].copy()
-
-# Generate INSERT statements
-insert_queries = []
-for _, row in melted_df.iterrows():
-    current_date = row["Month"].date()
-    end_of_month = (row["Month"] + pd.offsets.MonthEnd(0)).date()
-    product_name = row["Product Name"].replace("'", "''") # Escape single quotes in product name
-
-    while current_date <= end_of_month:
-        price = "NULL" if pd.isna(row["Price"]) else f"{row['Price']:.2f}"
-        query = (
-            f"INSERT INTO historical_prices (product_name, price, date) "
-            f"VALUES ('{product_name}', {price}, '{current_date}');"
-        )
-        insert_queries.append(query)
-        current_date += timedelta(days=1)
-
-# Save the INSERT queries to an SQL file
-output_filename = "insert_queries.sql"
-with open(output_filename, "w") as file:
-    file.write("\n".join(insert_queries))
-
-print(f"Saved {len(insert_queries)} INSERT queries to '{output_filename}'")
+        table, columns = STORAGE[args.storage]
+        writer = WRITERS[args.mode](args.output or DEFAULT_OUTPUT[args.mode], args.batch_size, table, columns)
+    except Exception as e:
+        print(f"Error: Could not open output for mode '{args.mode}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    total_rows = 0
+    try:
+        for melted in monthly_chunks(args.csv, args.chunk_months, start, end):
+            products, dates, prices = expand_to_days(melted) if args.storage == "daily" else month_rows(melted)
+            writer.write(products, dates, prices)
+            total_rows += len(dates)
+    except FileNotFoundError:
+        print(f"Error: {args.csv} not found. Please make sure the file is in the correct directory.", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {total_rows} rows in {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:,.0f} rows/sec)")
+
+    if args.mode == "mysql":
+        # Tell running app workers their cached product lists and price responses are stale.
+        from data_version import bump
+        print(f"Price data version is now {bump('prices')}.")
+
+    if args.evaluate_alerts:
+        import os
+        from alerts import reevaluate, sink_from_spec
+
+        fired = reevaluate(args.csv, sink_from_spec(os.environ.get("ALERT_SINK", "log")))
+        print(f"Fired {len(fired)} price alerts.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+
+class WriteBehindQueue:
+    """Queues rows for a background thread that writes them in batches, off the request thread.
+
+    Rows are flushed with one `write_rows(rows)` call once `batch_size` are waiting or `interval`
+    seconds have passed since the first one arrived. Each row is submitted with a dedupe key; a key
+    repeated within one batch, or among the last `dedupe_window` keys written, is skipped. When the
+    queue holds `max_queue` rows, `when_full` decides what submit() does:
+        block   wait up to `block_timeout` seconds for room, then drop the row
+        inline  write the row on the caller's thread (slower, but nothing is lost)
+        drop    drop the row at once
+    Pending rows are flushed by stop(), which runs at interpreter exit and from gunicorn's
+    worker_exit hook (see gunicorn.conf.py).
+    """
+
+    def __init__(self, write_rows, batch_size=500, interval=1.0, max_queue=10000,
+                 when_full="block", block_timeout=0.5, dedupe_window=10000, name="write-behind"):
+        if when_full not in ("block", "inline", "drop"):
+            raise ValueError(f"when_full must be block, inline or drop, not {when_full!r}")
+        self.write_rows = write_rows
+        self.batch_size = batch_size
+        self.interval = interval
+        self.when_full = when_full
+        self.block_timeout = block_timeout
+        self.dedupe_window = dedupe_window
+        self.name = name
+        self._rows = queue.Queue(maxsize=max_queue)
+        self._recent = OrderedDict()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._registered_atexit = False
+        self.submitted = self.written = self.deduplicated = self.dropped = self.failed = self.batches = 0
+
+    def submit(self, key, row):
+        """Queues one row; returns False if it was dropped because the queue is full."""
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self.start()
+        self.submitted += 1
+        try:
+            if self.when_full == "block":
+                self._rows.put((key, row), timeout=self.block_timeout)
+            else:
+                self._rows.put_nowait((key, row))
+            return True
+        except queue.Full:
+            if self.when_full == "inline":
+                self._write([(key, row)])
+                return True
+            self.dropped += 1
+            logging.warning("⚠ %s queue full, dropping row %s.", self.name, key)
+            return False
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        if not self._registered_atexit:
+            atexit.register(self.stop)
+            self._registered_atexit = True
+
+    def stop(self):
+        """Stops the worker thread and writes every row still queued."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+        self.flush()
+
+    def flush(self):
+        """Writes every queued row now, on the caller's thread."""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._rows.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def _drain(self):
+        try:
+            batch = [self._rows.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._rows.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self._write_lock:
+            rows = OrderedDict()
+            for key, row in batch:
+                if key in rows or key in self._recent:
+                    self.deduplicated += 1
+                else:
+                    rows[key] = row
+            if not rows:
+                return
+            try:
+                self.write_rows(list(rows.values()))
+            except Exception as e:
+                self.failed += len(rows)
+                logging.error("❌ %s: Could not write %d rows: %s", self.name, len(rows), e)
+                return
+            self.written += len(rows)
+            self.batches += 1
+            for key in rows:
+                self._recent[key] = None
+            while len(self._recent) > self.dedupe_window:
+                self._recent.popitem(last=False)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._drain()
+            if batch:
+                self._write(batch)
+
+    def stats(self):
+        return {
+            "queued": self._rows.qsize(),
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }